@@ -0,0 +1,95 @@
+from fastapi import HTTPException
+import asyncio
+import math
+import time
+
+
+class RateLimitExceeded(HTTPException):
+    def __init__(self, retry_after: float):
+        retry_after = max(math.ceil(retry_after), 1)
+        super().__init__(
+            status_code=429,
+            detail=f"Spotify esta limitando las peticiones, intenta de nuevo en {retry_after} segundos.",
+            headers={'Retry-After': str(retry_after)}
+        )
+
+
+# Token bucket global para todas las peticiones hacia Spotify. Cuando Spotify responde 429 se bloquea
+# el bucket hasta que pase el Retry-After y las peticiones esperan en fila en lugar de reintentar de golpe.
+class RateLimiter:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiting = 0
+        self.rejected = 0
+        self.throttled = 0
+        self._lock = asyncio.Lock()
+
+
+    def _refill(self, now: float):
+        if now <= self.updated:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+    def _wait_time(self, now: float, queued: int = 0):
+        self._refill(now)
+        wait = max(self.blocked_until - now, 0.0)
+        missing = queued + 1 - self.tokens
+        if missing > 0:
+            wait = max(wait, missing / self.rate)
+        return wait
+
+
+    async def acquire(self, deadline: float):
+        now = time.monotonic()
+        estimated = self._wait_time(now, queued=self.waiting)
+        if now + estimated > deadline:
+            self.rejected += 1
+            raise RateLimitExceeded(estimated)
+
+        self.waiting += 1
+        try:
+            try:
+                await asyncio.wait_for(self._lock.acquire(), timeout=max(deadline - now, 0))
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise RateLimitExceeded(self._wait_time(time.monotonic()))
+
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(now)
+                    if wait <= 0:
+                        self.tokens -= 1
+                        return
+                    if now + wait > deadline:
+                        self.rejected += 1
+                        raise RateLimitExceeded(wait)
+                    await asyncio.sleep(wait)
+            finally:
+                self._lock.release()
+        finally:
+            self.waiting -= 1
+
+
+    def throttle(self, retry_after: float):
+        self.throttled += 1
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        # El bucket vuelve a llenarse hasta que termina el bloqueo, para no soltar una rafaga justo despues.
+        self.tokens = 0.0
+        self.updated = self.blocked_until
+
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'waiting': self.waiting,
+            'throttled': self.throttled,
+            'rejected': self.rejected,
+            'blocked_for': round(max(self.blocked_until - now, 0.0), 3)
+        }
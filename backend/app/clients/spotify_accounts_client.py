@@ -0,0 +1,42 @@
+from app.core.config import settings
+import httpx
+
+
+class SpotifyAccountsClient:
+    def __init__(self):
+        self.base_url = settings.SPOTIFY_ACCOUNTS_BASE_URL
+        self._client = None
+
+
+    # Cliente con pool de conexiones para el intercambio de tokens, separado del de la API por ser otro host.
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=settings.SPOTIFY_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.SPOTIFY_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.SPOTIFY_HTTP_KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(
+                    settings.SPOTIFY_HTTP_TIMEOUT,
+                    connect=settings.SPOTIFY_HTTP_CONNECT_TIMEOUT,
+                    pool=settings.SPOTIFY_HTTP_POOL_TIMEOUT
+                )
+            )
+
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+    async def request_token(self, data: dict, headers: dict):
+        if self._client is None:
+            await self.start()
+
+        return await self._client.post('/api/token', headers=headers, data=data)
+
+
+spotify_accounts_client = SpotifyAccountsClient()
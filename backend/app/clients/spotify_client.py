@@ -1,31 +1,300 @@
 from fastapi import HTTPException
+from app.core.config import settings
+from app.clients.rate_limiter import RateLimiter, RateLimitExceeded
+from app.utils.cache import TTLCache, record_dependency
+from app.utils.singleflight import SingleFlight
+from app.utils.metrics import registry, cache_collector, spotify_request_duration, spotify_requests_in_flight, spotify_rate_limit_wait, spotify_retries
+import asyncio
+import hashlib
 import httpx
+import random
+import re
+import time
 
 
-class SpotifyClient:
-    def __init__(self):
-        self.base_url = "https://api.spotify.com/v1"
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+# Los comandos del reproductor responden 204 sin body (algunos dispositivos 200 o 202).
+COMMAND_STATUS = (200, 202, 204)
+# Los IDs en el path se reemplazan para que las métricas sean por endpoint y no por recurso.
+SPOTIFY_ID = re.compile(r'(/(?:albums|artists|tracks|playlists|shows|episodes))/[^/]+')
 
 
-    async def get_user_info(self, token: str):
-        url_final = f'{self.base_url}/me'
+class SpotifyClient:
+    def __init__(self):
+        self.base_url = settings.SPOTIFY_API_BASE_URL
+        self._client = None
+        self.rate_limiter = RateLimiter(rate=settings.SPOTIFY_RATE_LIMIT_PER_SECOND, burst=settings.SPOTIFY_RATE_LIMIT_BURST)
+        # GETs identicos en curso comparten una sola llamada a Spotify.
+        self._flight = SingleFlight()
+
+        # Cache por usuario para los endpoints de solo lectura. Las llaves son (userID, endpoint, *parametros).
+        self.user_cache = TTLCache(
+            ttl=settings.CACHE_TTL_TOP_ITEMS,
+            maxsize=settings.USER_CACHE_MAX_ENTRIES,
+            max_bytes=settings.USER_CACHE_MAX_BYTES
+        )
+        self.user_cache_ttls = {
+            'me': settings.CACHE_TTL_USER_INFO,
+            'top': settings.CACHE_TTL_TOP_ITEMS,
+            'following': settings.CACHE_TTL_FOLLOWED_ARTISTS
+        }
+        self.user_cache_stats = {endpoint: {'hits': 0, 'misses': 0} for endpoint in self.user_cache_ttls}
+        # El access token cambia cada hora, asi que guardamos a que usuario pertenece para no perder el cache.
+        self._token_users = TTLCache(ttl=settings.TOKEN_USER_CACHE_TTL, maxsize=settings.USER_CACHE_MAX_ENTRIES)
+
+        # Cache de catalogo (albumes y sus canciones) compartido entre usuarios. Las entradas vencidas se
+        # conservan con su ETag para revalidarlas con If-None-Match y recibir un 304 en lugar del body completo.
+        self.catalog_cache = TTLCache(
+            ttl=settings.CATALOG_CACHE_TTL,
+            maxsize=settings.CATALOG_CACHE_MAX_ENTRIES,
+            max_bytes=settings.CATALOG_CACHE_MAX_BYTES
+        )
+        self.catalog_cache_stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+
+
+    # Se crea un solo cliente con pool de conexiones para toda la app, asi evitamos un handshake TCP+TLS por petición.
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=settings.SPOTIFY_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=settings.SPOTIFY_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.SPOTIFY_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.SPOTIFY_HTTP_KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(
+                    settings.SPOTIFY_HTTP_TIMEOUT,
+                    connect=settings.SPOTIFY_HTTP_CONNECT_TIMEOUT,
+                    pool=settings.SPOTIFY_HTTP_POOL_TIMEOUT
+                )
+            )
+
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+    async def _request(self, method: str, path: str, token: str, params: dict = None, data: dict = None, json: dict = None, headers: dict = None, allowed_status: tuple = (200,)):
+        if self._client is None:
+            await self.start()
+
+        if method == 'GET':
+            # Lo que cuelga de /me depende del usuario, asi que la llave incluye el token; el catalogo es igual para todos.
+            scope = self._token_key(token) if path == '/me' or path.startswith('/me/') else None
+            key = (
+                path,
+                tuple(sorted((params or {}).items())),
+                tuple(sorted((headers or {}).items())),
+                allowed_status,
+                scope
+            )
+            leader = False
+
+            def send():
+                nonlocal leader
+                leader = True
+                return self._send(method, path, token, params, data, json, headers, allowed_status)
+
+            try:
+                return await self._flight.do(key, send)
+            except HTTPException as e:
+                # Un 401/403 es del token de quien hizo la llamada compartida, no del recurso; los demás reintentan con el suyo.
+                if leader or e.status_code not in (401, 403):
+                    raise
+
+        return await self._send(method, path, token, params, data, json, headers, allowed_status)
+
+
+    async def _send(self, method: str, path: str, token: str, params: dict = None, data: dict = None, json: dict = None, headers: dict = None, allowed_status: tuple = (200,)):
         headers = {
+            **(headers or {}),
             'Authorization': f'Bearer {token}'
         }
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url=url_final, headers=headers)
+        deadline = time.monotonic() + settings.SPOTIFY_QUEUE_DEADLINE
+        endpoint = SPOTIFY_ID.sub(r'\1/{id}', path)
+        attempt = 0
+
+        while True:
+            queued_at = time.monotonic()
+            await self.rate_limiter.acquire(deadline)
+            started = time.monotonic()
+            spotify_rate_limit_wait.observe(started - queued_at, endpoint)
+
+            spotify_requests_in_flight.inc()
+            try:
+                response = await self._client.request(method, path, headers=headers, params=params, data=data, json=json)
+            except httpx.HTTPError as e:
+                spotify_request_duration.observe(time.monotonic() - started, method, endpoint, type(e).__name__)
+                raise
+            finally:
+                spotify_requests_in_flight.dec()
+            spotify_request_duration.observe(time.monotonic() - started, method, endpoint, str(response.status_code))
+
+            if response.status_code in allowed_status:
+                return response
+
+            if response.status_code not in RETRYABLE_STATUS:
+                raise HTTPException(status_code=response.status_code, detail=response.text)
+
+            retry_after = self._retry_after(response)
+            if response.status_code == 429:
+                self.rate_limiter.throttle(retry_after if retry_after is not None else self._backoff(attempt))
+
+            # Solo los GET son idempotentes, el resto de los comandos no se reintentan.
+            attempt += 1
+            if method != 'GET' or attempt > settings.SPOTIFY_MAX_RETRIES:
+                if response.status_code == 429:
+                    raise RateLimitExceeded(retry_after if retry_after is not None else self._backoff(attempt))
+                raise HTTPException(status_code=response.status_code, detail=response.text)
+
+            delay = self._backoff(attempt)
+            if time.monotonic() + delay > deadline:
+                if response.status_code == 429:
+                    raise RateLimitExceeded(max(retry_after or 0, delay))
+                raise HTTPException(status_code=response.status_code, detail=response.text)
+            spotify_retries.inc(endpoint, str(response.status_code))
+            await asyncio.sleep(delay)
+
+
+    # Backoff exponencial con jitter completo para que los reintentos no lleguen todos al mismo tiempo.
+    def _backoff(self, attempt: int):
+        cap = min(settings.SPOTIFY_RETRY_BACKOFF_MAX, settings.SPOTIFY_RETRY_BACKOFF_BASE * (2 ** attempt))
+        return random.uniform(0, cap)
+
+
+    def _retry_after(self, response: httpx.Response):
+        value = response.headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            return None
+
+
+    async def _cached_get(self, key: tuple, path: str, token: str, params: dict = None):
+        endpoint = key[1]
+        data = self.user_cache.get(key)
+        if data is not None:
+            self.user_cache_stats[endpoint]['hits'] += 1
+            record_dependency(self.user_cache, key)
+            return data
+
+        self.user_cache_stats[endpoint]['misses'] += 1
+        response = await self._request('GET', path, token, params=params)
+        data = response.json()
+        self.user_cache.set(key, data, ttl=self.user_cache_ttls[endpoint], size=len(response.content))
+        record_dependency(self.user_cache, key)
+        return data
+
+
+    async def _catalog_get(self, key: tuple, path: str, token: str, params: dict = None):
+        entry = self.catalog_cache.peek(key)
+        headers = None
+        if entry is not None:
+            cached, fresh = entry
+            if fresh:
+                self.catalog_cache_stats['hits'] += 1
+                record_dependency(self.catalog_cache, key)
+                return cached['data']
+            if cached['etag']:
+                headers = {'If-None-Match': cached['etag']}
+
+        response = await self._request('GET', path, token, params=params, headers=headers, allowed_status=(200, 304))
+
+        if response.status_code == 304:
+            self.catalog_cache_stats['revalidated'] += 1
+            self.catalog_cache.touch(key)
+            record_dependency(self.catalog_cache, key)
+            return cached['data']
+
+        self.catalog_cache_stats['misses'] += 1
+        cached = {
+            'data': response.json(),
+            'etag': response.headers.get('ETag'),
+            'size': len(response.content)
+        }
+        self.catalog_cache.set(key, cached, size=cached['size'])
+        record_dependency(self.catalog_cache, key)
+        return cached['data']
+
+
+    def get_catalog_cache_stats(self):
+        cache_stats = self.catalog_cache.stats()
+        return {
+            'entries': cache_stats['entries'],
+            'bytes': cache_stats['bytes'],
+            'evictions': cache_stats['evictions'],
+            **self.catalog_cache_stats
+        }
 
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
 
-        return response.json()
+    def get_coalesced_stats(self):
+        return {'coalesced': self._flight.coalesced, 'in_flight': self._flight.in_flight()}
 
 
-    async def get_user_top_items(self, type:str, time_range:str, limit:int, offset:int, token:str):
-        url_final = f'{self.base_url}/me/top/{type}'
-        headers = {
-            'Authorization': f'Bearer {token}'
+    def collect_metrics(self):
+        yield from cache_collector({'user': self.user_cache, 'token_users': self._token_users, 'catalog': self.get_catalog_cache_stats})()
+        yield 'spotify_requests_coalesced_total', 'counter', 'GETs que esperaron una llamada identica que ya estaba en curso.', [({}, self._flight.coalesced)]
+        yield 'spotify_catalog_revalidated_total', 'counter', 'Entradas del catalogo revalidadas con 304.', [({}, self.catalog_cache_stats['revalidated'])]
+        limiter = self.rate_limiter.stats()
+        yield 'spotify_rate_limit_waiting', 'gauge', 'Peticiones esperando turno en el limitador.', [({}, limiter['waiting'])]
+        yield 'spotify_rate_limit_throttled_total', 'counter', 'Respuestas 429 de Spotify que bloquearon el limitador.', [({}, limiter['throttled'])]
+        yield 'spotify_rate_limit_rejected_total', 'counter', 'Peticiones rechazadas por no alcanzar turno antes del limite.', [({}, limiter['rejected'])]
+
+
+    def _token_key(self, token: str):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+
+    async def resolve_user_id(self, token: str):
+        user_id = self._token_users.get(self._token_key(token))
+        if user_id is None:
+            user = await self.get_user_info(token)
+            user_id = user['id']
+        return user_id
+
+
+    # Sin llamar a Spotify, solo si el token ya se resolvio antes.
+    def known_user_id(self, token: str):
+        return self._token_users.get(self._token_key(token))
+
+
+    def invalidate_user_cache(self, user_id: str, endpoint: str = None):
+        return self.user_cache.delete_where(
+            lambda key: key[0] == user_id and (endpoint is None or key[1] == endpoint)
+        )
+
+
+    def get_user_cache_stats(self):
+        return {
+            **self.user_cache.stats(),
+            'endpoints': {
+                endpoint: {**counters, 'ttl': self.user_cache_ttls[endpoint]}
+                for endpoint, counters in self.user_cache_stats.items()
+            }
         }
+
+
+    async def get_user_info(self, token: str):
+        token_key = self._token_key(token)
+        user_id = self._token_users.get(token_key)
+        if user_id is not None:
+            return await self._cached_get((user_id, 'me'), '/me', token)
+
+        self.user_cache_stats['me']['misses'] += 1
+        response = await self._request('GET', '/me', token)
+        data = response.json()
+        self._token_users.set(token_key, data['id'])
+        self.user_cache.set((data['id'], 'me'), data, ttl=self.user_cache_ttls['me'], size=len(response.content))
+        record_dependency(self.user_cache, (data['id'], 'me'))
+        return data
+
+
+    async def get_user_top_items(self, type:str, time_range:str, limit:int, offset:int, token:str):
         params = {
             'type': type,
             'time_range': time_range,
@@ -33,95 +302,58 @@ class SpotifyClient:
             'offset': offset
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url_final, headers=headers, params=params)
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-
-        return response.json()
+        user_id = await self.resolve_user_id(token)
+        key = (user_id, 'top', type, time_range, limit, offset)
+        return await self._cached_get(key, f'/me/top/{type}', token, params=params)
 
 
     async def get_followed_artists(self, token: str, after: str = None, limit: int = 10):
-        url_final = f'{self.base_url}/me/following'
-        headers = {
-            'Authorization': f'Bearer {token}'
-        }
         params = {
             'type': 'artist',
             'after': after,
             'limit': limit
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url_final, headers=headers, params=params)
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-
-        return response.json()
+        user_id = await self.resolve_user_id(token)
+        key = (user_id, 'following', after, limit)
+        return await self._cached_get(key, '/me/following', token, params=params)
 
 
     async def get_albums_save_user(self, limit:int, offset:int, token:str):
-        url_final = f'{self.base_url}/me/albums'
-        headers = {
-            'Authorization': f'Bearer {token}'
-        }
         params = {
             'limit': limit,
             'offset': offset
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url_final, headers=headers, params=params)
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-
+        response = await self._request('GET', '/me/albums', token, params=params)
         return response.json()
 
 
     async def get_album(self, albumID: str, token:str):
-        url_final = f'{self.base_url}/albums/{albumID}'
-        headers = {
-            'Authorization': f'Bearer {token}'
-        }
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url_final, headers=headers)
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-
-        return response.json()
-
-
+        return await self._catalog_get(('album', albumID), f'/albums/{albumID}', token)
 
 
     async def get_tracks_album(self, albumID: str, offset: int, limit: int, token: str):
-        url_final = f'{self.base_url}/albums/{albumID}/tracks'
-        headers = {
-            'Authorization': f'Bearer {token}'
-        }
         params = {
             'limit': limit,
             'offset': offset
         }
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url_final, headers=headers, params=params)
 
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
+        key = ('album_tracks', albumID, offset, limit)
+        return await self._catalog_get(key, f'/albums/{albumID}/tracks', token, params=params)
 
-        return response.json()
 
+    # Endpoint de varios artistas a la vez, Spotify acepta hasta 50 IDs por petición.
+    async def get_several_artists(self, ids: list, token: str):
+        params = {
+            'ids': ','.join(ids)
+        }
+
+        response = await self._request('GET', '/artists', token, params=params)
+        return response.json()
 
 
     async def get_recently_played(self, limit: int, after: str, before: str, token: str):
-        url = f'{self.base_url}/me/player/recently-played'
-        headers = {
-            'Authorization': f'Bearer {token}'
-        }
         params = {
             'limit': limit
         }
@@ -131,39 +363,19 @@ class SpotifyClient:
         elif before:
             params['before'] = before
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, params=params)
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-
+        response = await self._request('GET', '/me/player/recently-played', token, params=params)
         return response.json()
 
 
     async def pause_playback(self, device_id: str, token: str):
-        url = f'{self.base_url}/me/player/pause'
-        headers = {
-            'Authorization': f'Bearer {token}'
-        }
         params = {
             'device_id': device_id
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.put(url, headers=headers, params=params)
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-
-        return response.json()
-
+        await self._request('PUT', '/me/player/pause', token, params=params, allowed_status=COMMAND_STATUS)
 
 
     async def start_resume_playback(self, device_id: str, context_uri: str, position: int, position_ms: int, token: str):
-        url = f'{self.base_url}/me/player/play'
-        headers = {
-            'Authorization': f'Bearer {token}'
-        }
         params = {
             'device_id': device_id
         }
@@ -171,70 +383,36 @@ class SpotifyClient:
         body = {}
         if context_uri:
             body['context_uri'] = context_uri
-        if position:
+        if position_ms is not None:
             body['position_ms'] = position_ms
-        if position:
+        if position is not None:
             body['offset'] = {}
             body['offset']['position'] = position
 
-
-
-        async with httpx.AsyncClient() as client:
-            response = await client.put(url, headers=headers, params=params, data=body)
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-
-        return response.json()
-
+        await self._request('PUT', '/me/player/play', token, params=params, json=body or None, allowed_status=COMMAND_STATUS)
 
 
     async def get_playback_state(self, token: str):
-        url = f'{self.base_url}/me/player'
-        headers = {
-            'Authorization': f'Bearer {token}'
-        }
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-
+        response = await self._request('GET', '/me/player', token)
         return response.json()
-    
 
 
     async def skip_to_next(self, token, device_id):
-        url = f'{self.base_url}/me/player/next'
-        headers = {
-            'Authorization': f'Bearer {token}'
-        }
-
         params = {
             'device_id': device_id
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, params=params)
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-
+        await self._request('POST', '/me/player/next', token, params=params, allowed_status=COMMAND_STATUS)
 
 
     async def skip_to_previous(self, token, device_id):
-        url = f'{self.base_url}/me/player/previous'
-        headers = {
-            'Authorization': f'Bearer {token}'
-        }
-
         params = {
             'device_id': device_id
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, params=params)
+        await self._request('POST', '/me/player/previous', token, params=params, allowed_status=COMMAND_STATUS)
+
 
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
+# Instancia compartida por SpotifyService, AlbumService y PlayerService. Su ciclo de vida lo maneja el lifespan de app/main.py
+spotify_client = SpotifyClient()
+registry.register_collector(spotify_client.collect_metrics)
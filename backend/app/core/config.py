@@ -1,12 +1,112 @@
 from pydantic_settings import BaseSettings
+from typing import Optional
 
 class Settings(BaseSettings):
-    #MONGODB_CONNECTION_STRING: str
+    MONGODB_CONNECTION_STRING: Optional[str] = None  # Sin esto la app funciona, pero sin snapshots en MongoDB
     JWT_KEY: str
     SPOTIFY_CLIENT_ID: str
     SPOTIFY_CLIENT_SECRET: str
     SPOTIFY_REDIRECT_URI: str
 
+    # Hosts de Spotify, se pueden apuntar al servidor falso de benchmarks/fake_spotify.py para pruebas de carga
+    SPOTIFY_API_BASE_URL: str = "https://api.spotify.com/v1"
+    SPOTIFY_ACCOUNTS_BASE_URL: str = "https://accounts.spotify.com"
+
+    # Cliente HTTP compartido hacia api.spotify.com (pool de conexiones y timeouts en segundos)
+    SPOTIFY_HTTP2: bool = False  # Requiere instalar httpx[http2]
+    SPOTIFY_HTTP_MAX_CONNECTIONS: int = 100
+    SPOTIFY_HTTP_MAX_KEEPALIVE: int = 20
+    SPOTIFY_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    SPOTIFY_HTTP_TIMEOUT: float = 10.0
+    SPOTIFY_HTTP_CONNECT_TIMEOUT: float = 5.0
+    SPOTIFY_HTTP_POOL_TIMEOUT: float = 5.0
+
+    # Limite global de peticiones hacia Spotify, reintentos de GET con backoff y tiempo maximo en fila (segundos)
+    SPOTIFY_RATE_LIMIT_PER_SECOND: float = 10.0
+    SPOTIFY_RATE_LIMIT_BURST: int = 20
+    SPOTIFY_MAX_RETRIES: int = 3
+    SPOTIFY_RETRY_BACKOFF_BASE: float = 0.25
+    SPOTIFY_RETRY_BACKOFF_MAX: float = 4.0
+    SPOTIFY_QUEUE_DEADLINE: float = 10.0
+
+    # Tokens recien refrescados se reutilizan por unos segundos para las rafagas justo despues de que vencen
+    REFRESHED_TOKEN_CACHE_TTL: float = 60.0
+    REFRESHED_TOKEN_CACHE_SIZE: int = 10000
+
+    # Cache por usuario de endpoints de solo lectura (TTL en segundos, limite de memoria en bytes del body)
+    CACHE_TTL_TOP_ITEMS: float = 3600.0
+    CACHE_TTL_USER_INFO: float = 600.0
+    CACHE_TTL_FOLLOWED_ARTISTS: float = 600.0
+    TOKEN_USER_CACHE_TTL: float = 3600.0
+    USER_CACHE_MAX_ENTRIES: int = 5000
+    USER_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # /api/spotify/cache/stats muestra contadores de todo el proceso, solo se expone para depurar
+    CACHE_STATS_ENABLED: bool = False
+
+    # Ranking completo del top de los 3 rangos (Spotify permite maximo 50 por pagina)
+    TOP_ITEMS_PAGE_SIZE: int = 50
+
+    # Cache de catalogo compartido entre usuarios (albumes y canciones de albumes), revalidado con ETag al vencer
+    CATALOG_CACHE_TTL: float = 3600.0
+    CATALOG_CACHE_MAX_ENTRIES: int = 10000
+    CATALOG_CACHE_MAX_BYTES: int = 128 * 1024 * 1024
+    # Paginas de canciones de un album que no vienen dentro de /albums/{id} (Spotify permite maximo 50 por pagina)
+    ALBUM_TRACKS_PAGE_SIZE: int = 50
+
+    # Cache de respuestas ya serializadas (bytes JSON) por usuario + ruta + query params. El TTL se define en cada ruta
+    OUTPUT_CACHE_ENABLED: bool = True
+    OUTPUT_CACHE_MAX_ENTRIES: int = 5000
+    OUTPUT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Cache-Control de las respuestas con ETag. Lo del usuario es private (un CDN no debe compartirlo entre
+    # cookies); el catalogo de albumes es igual para todos y cambia muy poco, puede guardarse en el CDN.
+    CACHE_CONTROL_USER: str = "private, max-age=60"
+    CACHE_CONTROL_TOP_ITEMS: str = "private, max-age=300"
+    CACHE_CONTROL_LIBRARY: str = "private, no-cache"
+    CACHE_CONTROL_CATALOG: str = "public, max-age=3600, stale-while-revalidate=86400"
+
+    # Cache compartido de artistas completos (genres, popularity, followers, image) y ventana para juntar lotes
+    ARTIST_CACHE_TTL: float = 24 * 3600.0
+    ARTIST_CACHE_MAX_ENTRIES: int = 50000
+    ARTIST_BATCH_WINDOW: float = 0.005
+
+    # Timeout por sección del dashboard (segundos), una sección lenta se regresa vacia en lugar de bloquear
+    DASHBOARD_SECTION_TIMEOUT: float = 3.0
+
+    # Paginacion completa de la biblioteca (Spotify permite maximo 50 por pagina)
+    LIBRARY_PAGE_SIZE: int = 50
+    LIBRARY_PAGE_CONCURRENCY: int = 4
+    LIBRARY_SYNC_BATCH_SIZE: int = 500
+    # Segundos antes de que la copia en MongoDB se vuelva a sincronizar al leerla con snapshot=true
+    LIBRARY_SNAPSHOT_MAX_AGE: float = 15 * 60.0
+    # Cada cuanto una sync se hace completa aunque la incremental cuadre (albumes quitados fuera de la primera pagina)
+    LIBRARY_FULL_SYNC_INTERVAL: float = 24 * 3600.0
+
+    # Ingesta en segundo plano de recently-played (intervalos en segundos). Spotify solo guarda las ultimas
+    # 50 reproducciones, el intervalo de cada usuario se ajusta para no dejar que se llene ese buffer.
+    HISTORY_INGESTION_ENABLED: bool = False
+    HISTORY_SCHEDULER_TICK: float = 30.0
+    HISTORY_POLL_MIN_INTERVAL: float = 300.0
+    HISTORY_POLL_MAX_INTERVAL: float = 6 * 3600.0
+    HISTORY_POLL_BATCH: int = 100
+    HISTORY_POLL_CONCURRENCY: int = 5
+    HISTORY_MAX_PAGES_PER_POLL: int = 4
+    # Rango maximo (en dias) que aceptan las estadisticas sobre el historial guardado
+    STATS_MAX_RANGE_DAYS: int = 366
+
+    # Stream del estado del reproductor (SSE): un solo poller por usuario compartido por todas sus conexiones.
+    # Mientras se reproduce el intervalo se ajusta a lo que falta de la canción, dentro de [MIN, MAX].
+    PLAYBACK_POLL_MIN_INTERVAL: float = 1.0
+    PLAYBACK_POLL_MAX_INTERVAL: float = 5.0
+    PLAYBACK_POLL_PAUSED_INTERVAL: float = 10.0
+    PLAYBACK_POLL_IDLE_INTERVAL: float = 20.0
+    PLAYBACK_STREAM_HEARTBEAT: float = 15.0
+
+    # Comandos del reproductor: se juntan los que llegan con menos de DEBOUNCE segundos entre si, sin esperar
+    # mas de MAX_DELAY desde el primero
+    PLAYER_COMMAND_DEBOUNCE: float = 0.3
+    PLAYER_COMMAND_MAX_DELAY: float = 1.0
+
     class Config:
         env_file = ".env"  # Permite cargar desde archivo .env
 
@@ -1,10 +1,29 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
 from app.core.config import settings
 
 client = None
 
 async def get_database():
     global client
+    if not settings.MONGODB_CONNECTION_STRING:
+        raise HTTPException(status_code=503, detail="La base de datos no esta configurada.")
     if client is None:
         client = AsyncIOMotorClient(settings.MONGODB_CONNECTION_STRING)
     return client["SpotifyStats"]
+
+
+async def close_database():
+    global client
+    if client is not None:
+        client.close()
+        client = None
+
+
+async def ensure_indexes():
+    db = await get_database()
+    await db.saved_albums.create_index([("user_id", ASCENDING), ("added_at", DESCENDING)])
+    await db.linked_users.create_index([("next_poll_at", ASCENDING)])
+    await db.play_history.create_index([("user_id", ASCENDING), ("played_at", DESCENDING)])
+    await db.play_rollups.create_index([("user_id", ASCENDING), ("kind", ASCENDING), ("period", ASCENDING), ("period_start", ASCENDING)])
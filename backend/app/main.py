@@ -1,11 +1,38 @@
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
-from app.routers import spotify_statistics, spotify_album, spotify_player
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
+from app.clients.spotify_client import spotify_client
+from app.clients.spotify_accounts_client import spotify_accounts_client
+from app.core.config import settings
+from app.db.connection import ensure_indexes, close_database
+from app.services.history_ingestion_service import history_ingestion_service
+from app.routers import spotify_statistics, spotify_album, spotify_player, dashboard
 from app.routers import auth
+from app.middlewares.auth_middleware import AuthMiddleware
+from app.middlewares.metrics_middleware import MetricsMiddleware
+from app.utils.metrics import registry
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await spotify_client.start()
+    await spotify_accounts_client.start()
+    if settings.MONGODB_CONNECTION_STRING:
+        await ensure_indexes()
+        if settings.HISTORY_INGESTION_ENABLED:
+            history_ingestion_service.start()
+    yield
+    await history_ingestion_service.stop()
+    await spotify_client.close()
+    await spotify_accounts_client.close()
+    await close_database()
 
+
+app = FastAPI(lifespan=lifespan)
+
+# El ultimo en agregarse es el de afuera: métricas -> CORS -> autenticación, asi los 403 también llevan headers de CORS.
+app.add_middleware(AuthMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["https://spotify-stats-three-kappa.vercel.app", "https://spotifystats-5prz.onrender.com"],
@@ -13,11 +40,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
 async def root():
     return {"message": "Bienvenido a Spotify Stats"}
 
+# Formato de texto de Prometheus
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/success-vinculation")
 async def success_vinculation():
     return {"message": "Felicidades, te haz vinculado correctamente!"}
@@ -26,4 +59,5 @@ async def success_vinculation():
 app.include_router(auth.router, prefix="/api")
 app.include_router(spotify_statistics.router, prefix="/api")
 app.include_router(spotify_album.router,prefix="/api")
-app.include_router(spotify_player.router,prefix="/api")
\ No newline at end of file
+app.include_router(spotify_player.router,prefix="/api")
+app.include_router(dashboard.router,prefix="/api")
\ No newline at end of file
@@ -1,32 +1,76 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request, HTTPException
-from app.utils.cookies import get_tokens_from_cookies, set_tokens_in_cookies
+from fastapi import HTTPException, Response
+from fastapi.responses import JSONResponse
+from starlette.requests import cookie_parser
+from app.utils.cookies import set_tokens_in_cookies
 from app.services.auth_service import AuthService
+from app.utils.metrics import auth_token_refreshes
 
-class AuthMiddleware(BaseHTTPMiddleware):
 
-    def __init__(self, app):
-        super().__init__(app)
+# Rutas que no necesitan sesión de Spotify (login, documentación, métricas) y prefijos de rutas exentas.
+EXEMPT_PATHS = ("/", "/api/auth", "/docs", "/redoc", "/openapi.json", "/metrics", "/success-vinculation")
+EXEMPT_PREFIXES = ("/api/auth/", "/docs/")
+
+
+# Middleware ASGI: lee la cookie una sola vez y deja (access_token, refresh_token) en scope['auth_tokens'] para
+# los routers (app.utils.cookies.get_tokens). Si el access token ya vencio lo refresca y agrega las cookies nuevas
+# a los headers de la respuesta sin tocar el body, asi tambien funciona con StreamingResponse.
+class AuthMiddleware:
+    def __init__(self, app, exempt_paths: tuple = EXEMPT_PATHS, exempt_prefixes: tuple = EXEMPT_PREFIXES):
+        self.app = app
+        self.exempt_paths = frozenset(exempt_paths)
+        self.exempt_prefixes = exempt_prefixes
         self.auth_service = AuthService()
 
 
-    async def dispatch(self, request:Request, call_next):
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] == 'OPTIONS' or self._is_exempt(scope['path']):
+            return await self.app(scope, receive, send)
+
+        access_token, refresh_token = self._read_cookies(scope)
+
+        if access_token:
+            scope['auth_tokens'] = (access_token, refresh_token)
+            return await self.app(scope, receive, send)
+
+        if not refresh_token:
+            response = JSONResponse(status_code=403, content={"detail": "Por favor vuelve a iniciar sesión."})
+            return await response(scope, receive, send)
+
         try:
-            access_token, refresh_token = get_tokens_from_cookies(request)
-
-            if not access_token:
-                if refresh_token:
-                    tokens = self.auth_service.refresh_token(refresh_token=refresh_token)
-                    response = await call_next(request)
-                    set_tokens_in_cookies(response=response, tokens=tokens)
-                    return response
-                else:
-                    raise HTTPException(status_code=403,detail="Por favor vuelve a iniciar sesión.")
-
-            response = await call_next(request)
-            return response
-
-        except HTTPException:
-            raise
-        except Exception as e:
-            print("Ocurrio un error tratando de validar la autenticación del usuario.")
\ No newline at end of file
+            tokens = await self.auth_service.refresh_token(refresh_token=refresh_token)
+        except HTTPException as e:
+            auth_token_refreshes.inc('error')
+            response = JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+            return await response(scope, receive, send)
+        auth_token_refreshes.inc('ok')
+
+        scope['auth_tokens'] = (tokens['access_token'], tokens.get('refresh_token') or refresh_token)
+        cookies = self._set_cookie_headers(tokens)
+
+        # Una respuesta con las cookies de sesión nunca debe quedar en un cache compartido (CDN), aunque la ruta sea public.
+        async def send_with_cookies(message):
+            if message['type'] == 'http.response.start':
+                headers = [(name, value) for name, value in message.get('headers', []) if name.lower() != b'cache-control']
+                message['headers'] = headers + [(b'cache-control', b'private, no-store')] + cookies
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookies)
+
+
+    def _is_exempt(self, path: str):
+        return path in self.exempt_paths or path.startswith(self.exempt_prefixes)
+
+
+    def _read_cookies(self, scope):
+        for name, value in scope['headers']:
+            if name == b'cookie':
+                cookies = cookie_parser(value.decode('latin-1'))
+                return cookies.get('access_token'), cookies.get('refresh_token')
+        return None, None
+
+
+    # Se reutiliza set_tokens_in_cookies para que las cookies tengan exactamente los mismos atributos.
+    def _set_cookie_headers(self, tokens: dict):
+        response = Response()
+        set_tokens_in_cookies(response=response, tokens=tokens)
+        return [(name, value) for name, value in response.raw_headers if name == b'set-cookie']
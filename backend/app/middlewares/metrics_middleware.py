@@ -0,0 +1,36 @@
+from app.utils.metrics import http_request_duration, http_requests_in_flight
+import time
+
+
+# Middleware ASGI (sin BaseHTTPMiddleware para no agregar una tarea y una copia del body por petición). La ruta
+# se toma de la plantilla que resolvio FastAPI (/api/album/{album_id}) para no tener una serie por cada ID.
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        status = 500
+        started = time.monotonic()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get('route')
+            http_request_duration.observe(
+                time.monotonic() - started,
+                scope['method'],
+                route.path if route is not None else 'unmatched',
+                str(status)
+            )
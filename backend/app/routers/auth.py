@@ -32,7 +32,7 @@ async def callback(code: str, state:str):
         if not code or not state:
             raise HTTPException(status_code=500, detail="Lo sentimos, no se encontro el code o state en la URL.")
         auth_service = AuthService()
-        response = auth_service.handle_spotify_callback(code=code, state=state)
+        response = await auth_service.handle_spotify_callback(code=code, state=state)
         print(f"response: {response}")
         return response
     except HTTPException:
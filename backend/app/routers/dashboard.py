@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Request, HTTPException
+from app.schemas.dashboard import Dashboard
+from app.services.dashboard_service import DashboardService
+from app.utils.cookies import get_tokens
+
+router = APIRouter(
+    prefix="/dashboard",
+    tags=["Dashboard"]
+)
+
+dashboard_service = DashboardService()
+
+
+
+# Una sola llamada para la pagina de inicio: usuario, tops, reproducidas recientemente y estado del reproductor.
+@router.get("", response_model=Dashboard)
+async def get_dashboard(request: Request, time_range: str = "medium_term", limit: int = 10):
+    try:
+        access_token,_ =get_tokens(request)
+        response = await dashboard_service.get_dashboard(token=access_token, time_range=time_range, limit=limit)
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Ocurrio un error al tratar de obtener el dashboard: {e}")
@@ -1,8 +1,14 @@
 from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from app.schemas.library import SavedAlbumsByUser, Album, AlbumTracks
 #from app.schemas.spotify_album import SavedAlbumsByUser, Album, AlbumTracks
 from app.services.spotify_album_service import AlbumService
-from app.utils.cookies import get_tokens_from_cookies
+from app.services.library_sync_service import LibrarySyncService
+from app.utils.cookies import get_tokens
+from app.utils.responses import model_response
+from app.utils.output_cache import cached_response, etag_response
+from app.core.config import settings
+import orjson
 
 router = APIRouter(
     prefix="/album",
@@ -10,26 +16,72 @@ router = APIRouter(
 )
 
 album_service = AlbumService()
+library_sync_service = LibrarySyncService()
 
 
 @router.get('/saved_by_user', response_model=SavedAlbumsByUser)
-async def albums_saved_by_user(request: Request, limit: int = 10, offset: int = 0):
+@etag_response(cache_control=settings.CACHE_CONTROL_LIBRARY)
+async def albums_saved_by_user(request: Request, limit: int = 10, offset: int = 0, snapshot: bool = False, enrich_artists: bool = False):
     try:
-        access_token,_ =get_tokens_from_cookies(request)
-        response = await album_service.get_albums_saved_user(limit=limit, offset=offset,token=access_token)
+        access_token,_ =get_tokens(request)
+        if snapshot:
+            response = await library_sync_service.get_saved_albums_snapshot(limit=limit, offset=offset, token=access_token)
+        else:
+            response = await album_service.get_albums_saved_user(limit=limit, offset=offset,token=access_token, enrich_artists=enrich_artists)
+        return model_response(response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Ocurrio un error al tratar de obtener los albumes guardados por el usuario: {e}")
+
+
+
+# Actualiza la copia de la biblioteca del usuario en MongoDB, solo pide las paginas con albumes nuevos.
+@router.post('/saved_by_user/sync')
+async def sync_albums_saved_by_user(request: Request):
+    try:
+        access_token,_ =get_tokens(request)
+        response = await library_sync_service.sync_saved_albums(token=access_token)
         return response
     except HTTPException:
         raise
+    except Exception as e:
+        print(f"Ocurrio un error al tratar de sincronizar los albumes guardados por el usuario: {e}")
+
+
+
+# Regresa toda la biblioteca como NDJSON (un AlbumSaved por linea) conforme llegan las paginas de Spotify. Si una
+# pagina falla a la mitad, la ultima linea es {"error": ..., "status": ...} en lugar de un album.
+@router.get('/saved_by_user/all')
+async def all_albums_saved_by_user(request: Request):
+    try:
+        access_token,_ =get_tokens(request)
+        albums = await album_service.stream_albums_saved_user(token=access_token)
+
+        async def ndjson():
+            try:
+                async for album in albums:
+                    yield album.model_dump_json() + "\n"
+            except Exception as e:
+                print(f"Ocurrio un error al tratar de enviar la biblioteca del usuario: {e}")
+                # El status 200 ya se envio; una ultima linea con error le indica al cliente que la biblioteca quedo incompleta.
+                status = e.status_code if isinstance(e, HTTPException) else 500
+                yield orjson.dumps({'error': "No se pudo obtener la biblioteca completa.", 'status': status}).decode() + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Ocurrio un error al tratar de obtener los albumes guardados por el usuario: {e}")
 
 
 
 @router.get("/{album_id}", response_model=Album)
-async def get_album(request: Request, album_id: str):
+@cached_response(ttl=settings.CATALOG_CACHE_TTL, cache_control=settings.CACHE_CONTROL_CATALOG)
+async def get_album(request: Request, album_id: str, enrich_artists: bool = False):
     try:
-        access_token,_ =get_tokens_from_cookies(request)
-        response = await album_service.get_album(albumID=album_id, token=access_token)
+        access_token,_ =get_tokens(request)
+        response = await album_service.get_album(albumID=album_id, token=access_token, enrich_artists=enrich_artists)
         return response
     except HTTPException:
         raise
@@ -40,11 +92,12 @@ async def get_album(request: Request, album_id: str):
 
 
 @router.get("/{album_id}/tracks", response_model=AlbumTracks)
-async def tracks_in_album(request: Request, album_id: str, limit: int = 50, offset: int = 0):
+@cached_response(ttl=settings.CATALOG_CACHE_TTL, cache_control=settings.CACHE_CONTROL_CATALOG)
+async def tracks_in_album(request: Request, album_id: str, limit: int = 50, offset: int = 0, enrich_artists: bool = False):
     try:
-        access_token,_ =get_tokens_from_cookies(request)
-        response = await album_service.get_tracks_album(albumID=album_id, limit=limit, offset=offset, token=access_token)
-        return response
+        access_token,_ =get_tokens(request)
+        response = await album_service.get_tracks_album(albumID=album_id, limit=limit, offset=offset, token=access_token, enrich_artists=enrich_artists)
+        return model_response(response)
     except HTTPException:
         raise
     except Exception as e:
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Request, HTTPException, Response
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 #from app.schemas.spotify_player import TracksRecentlyPlayed
-from app.schemas.player import TracksRecentlyPlayed
+from app.schemas.player import TracksRecentlyPlayed, CommandAccepted
 from app.services.spotify_player_service import PlayerService
-from app.utils.cookies import get_tokens_from_cookies
+from app.services.history_ingestion_service import history_ingestion_service
+from app.services.playback_stream_service import playback_stream_service
+from app.core.config import settings
+from datetime import datetime
+from app.utils.cookies import get_tokens
+from app.utils.responses import model_response
+import asyncio
+import orjson
 
 router = APIRouter(
     prefix="/player",
@@ -17,7 +25,7 @@ player_service = PlayerService()
 @router.get("/playback_state")
 async def playback_state(request: Request):
     try:
-        access_token,_ =get_tokens_from_cookies(request)
+        access_token,_ =get_tokens(request)
         response = await player_service.playback_state(token=access_token)
         return response
     except HTTPException:
@@ -27,12 +35,45 @@ async def playback_state(request: Request):
 
 
 
+# Server-Sent Events con el estado del reproductor: primero un evento snapshot con el estado completo (o null si no
+# se reproduce nada) y despues eventos diff solo con los campos que cambiaron. Todas las pestañas de un usuario
+# comparten la misma consulta a Spotify. Si el token vence se manda un evento close y se cierra la conexión.
+@router.get("/playback_state/stream")
+async def playback_state_stream(request: Request):
+    try:
+        access_token,_ =get_tokens(request)
+        user_id = await playback_stream_service.spotifyclient.resolve_user_id(access_token)
+
+        async def events():
+            poller, queue = playback_stream_service.subscribe(user_id=user_id, token=access_token)
+            try:
+                while True:
+                    try:
+                        event, data = await asyncio.wait_for(queue.get(), timeout=settings.PLAYBACK_STREAM_HEARTBEAT)
+                    except asyncio.TimeoutError:
+                        yield ": ping\n\n"
+                        continue
+                    yield f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+                    # close: el token ya no sirve, se termina el stream para que EventSource se reconecte.
+                    if event == 'close':
+                        return
+            finally:
+                playback_stream_service.unsubscribe(poller, queue)
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Ocurrio un error al tratar de abrir el stream del reproductor: {e}")
+
+
+
 @router.get('/recently_played', response_model=TracksRecentlyPlayed)
-async def get_recently_played(request: Request, limit: int = 10, after: int = None, before: int = None):
+async def get_recently_played(request: Request, limit: int = 10, after: int = None, before: int = None, enrich_artists: bool = False):
     try:
-        access_token,_ =get_tokens_from_cookies(request)
-        response = await player_service.get_recently_player(after=after, before=before, limit=limit, token=access_token)
-        return response
+        access_token,_ =get_tokens(request)
+        response = await player_service.get_recently_player(after=after, before=before, limit=limit, token=access_token, enrich_artists=enrich_artists)
+        return model_response(response)
     except HTTPException:
         raise
     except Exception as e:
@@ -40,31 +81,50 @@ async def get_recently_played(request: Request, limit: int = 10, after: int = No
 
 
 
-@router.put("/{device_id}/pause_playback")
-async def pause_playback(request: Request, device_id: str):
+# Historial completo guardado por la ingesta en segundo plano, del mas reciente al mas antiguo. Se pagina con before
+# (el played_at del ultimo de la pagina anterior), maximo 200 por pagina.
+@router.get('/history')
+async def get_history(request: Request, limit: int = Query(50, ge=1, le=200), before: datetime = None):
     try:
-        access_token,_ =get_tokens_from_cookies(request)
-        response = await player_service.pause_playback(device_id=device_id, token=access_token)
+        access_token,_ =get_tokens(request)
+        response = await history_ingestion_service.get_history(token=access_token, limit=limit, before=before)
         return response
     except HTTPException:
         raise
+    except Exception as e:
+        print(f"Ocurrio un error a la hora de obtener el historial de reproducción: {e}")
+
+
+
+# Los comandos se encolan por dispositivo y se responde 202 de inmediato: los clics seguidos se juntan (los saltos en
+# un conteo neto, pausa + reanudar se cancelan) antes de mandarlos a Spotify. El body es CommandAccepted con lo que sigue
+# pendiente; el resultado llega por el stream del reproductor y los errores de Spotify ya no llegan en esta respuesta.
+@router.put("/{device_id}/pause_playback", status_code=202, response_model=CommandAccepted)
+async def pause_playback(request: Request, device_id: str):
+    try:
+        access_token,_ =get_tokens(request)
+        pending = player_service.enqueue_command('pause', device_id=device_id, token=access_token)
+        return JSONResponse(status_code=202, content={'accepted': 'pause', 'pending': pending})
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Ocurrio un error al tratar de pausar la musica: {e}")
 
 
 
-@router.put("/{device_id}/play_resume_playback")
+@router.put("/{device_id}/play_resume_playback", status_code=202, response_model=CommandAccepted)
 async def play_resume_playback(request: Request, device_id: str, context_uri: str = None, position: int = None, position_ms: int = None, token: str = None):
     try:
-        access_token,_ =get_tokens_from_cookies(request)
-        response = await player_service.play_resume_playback(
+        access_token,_ =get_tokens(request)
+        pending = player_service.enqueue_command(
+            'play',
             device_id=device_id,
+            token=access_token,
             context_uri=context_uri,
             position=position,
-            position_ms=position_ms,
-            token=access_token
+            position_ms=position_ms
         )
-        return response
+        return JSONResponse(status_code=202, content={'accepted': 'play', 'pending': pending})
     except HTTPException:
         raise
     except Exception as e:
@@ -72,12 +132,12 @@ async def play_resume_playback(request: Request, device_id: str, context_uri: st
 
 
 
-@router.get("/{device_id}/skip_to_next")
+@router.get("/{device_id}/skip_to_next", status_code=202, response_model=CommandAccepted)
 async def skip_to_next(request: Request, device_id: str):
     try:
-        access_token,_ =get_tokens_from_cookies(request)
-        response = await player_service.skip_to_next(device_id=device_id, token=access_token)
-        return Response(status_code=200)
+        access_token,_ =get_tokens(request)
+        pending = player_service.enqueue_command('next', device_id=device_id, token=access_token)
+        return JSONResponse(status_code=202, content={'accepted': 'next', 'pending': pending})
     except HTTPException:
         raise
     except Exception as e:
@@ -85,15 +145,14 @@ async def skip_to_next(request: Request, device_id: str):
 
 
 
-@router.get("/{device_id}/skip_to_previous")
+@router.get("/{device_id}/skip_to_previous", status_code=202, response_model=CommandAccepted)
 async def skip_to_previous(request: Request, device_id: str):
     try:
-        access_token,_ =get_tokens_from_cookies(request)
-        response = await player_service.skip_to_previous(device_id=device_id, token=access_token)
-        return Response(status_code=200)
+        access_token,_ =get_tokens(request)
+        pending = player_service.enqueue_command('previous', device_id=device_id, token=access_token)
+        return JSONResponse(status_code=202, content={'accepted': 'previous', 'pending': pending})
     except HTTPException:
         raise
     except Exception as e:
         print(f"Ocurrio un error al tratar de devolver a la anterior canción: {e}")
 
-        
\ No newline at end of file
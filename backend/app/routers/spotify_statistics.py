@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Request, HTTPException
-from app.utils.cookies import get_tokens_from_cookies
+from fastapi import APIRouter, Request, HTTPException, Query
+from app.utils.cookies import get_tokens
+from app.utils.responses import model_response
+from app.utils.output_cache import cached_response
+from app.core.config import settings
 #from app.schemas.spotify_statistics import TopArtist, TopTracks, UserInfo, ArtistsFollowByUser
 from app.schemas.base.user import User
 from app.schemas.library import ArtistsFollowByUser
-from app.schemas.top import TopArtist, TopTracks
+from app.schemas.top import TopArtist, TopTracks, TopMovement
+from app.schemas.stats import ListeningByDay, TopListened
+from app.schemas.genres import GenreStats
 from app.services.spotify_statistics_service import SpotifyService
+from app.services.listening_stats_service import listening_stats_service
+from app.services.genre_service import genre_service
+from datetime import date
 
 router = APIRouter(
     prefix="/spotify",
@@ -16,9 +24,10 @@ spotify_service = SpotifyService()
 
 
 @router.get("/me", response_model=User)
+@cached_response(ttl=settings.CACHE_TTL_USER_INFO, cache_control=settings.CACHE_CONTROL_USER)
 async def get_user_info(request: Request):
     try:
-        access_token,_ =get_tokens_from_cookies(request)
+        access_token,_ =get_tokens(request)
         response = await spotify_service.get_user_info(access_token)
         return response
     except HTTPException:
@@ -29,11 +38,12 @@ async def get_user_info(request: Request):
 
 
 @router.get("/top-artist-user", response_model=TopArtist)
+@cached_response(ttl=settings.CACHE_TTL_TOP_ITEMS, cache_control=settings.CACHE_CONTROL_TOP_ITEMS)
 async def top_artist_user(request: Request, time_range: str = "medium_term", limit: int = 20, offset: int = 0):
     try:
-        access_token,_ =get_tokens_from_cookies(request)
+        access_token,_ =get_tokens(request)
         data = await spotify_service.get_top_artist(limit=limit,offset=offset,time_range=time_range,token=access_token)
-        return data
+        return model_response(data)
 
     except HTTPException:
         raise
@@ -43,11 +53,12 @@ async def top_artist_user(request: Request, time_range: str = "medium_term", lim
 
 
 @router.get("/top-tracks-user", response_model=TopTracks)
-async def top_track_user(request: Request, time_range: str = "medium_term", limit: int = 20, offset: int = 0):
+@cached_response(ttl=settings.CACHE_TTL_TOP_ITEMS, cache_control=settings.CACHE_CONTROL_TOP_ITEMS)
+async def top_track_user(request: Request, time_range: str = "medium_term", limit: int = 20, offset: int = 0, enrich_artists: bool = False):
     try:
-        access_token,_ =get_tokens_from_cookies(request)
-        data = await spotify_service.get_top_tracks(limit=limit,offset=offset,time_range=time_range,token=access_token)
-        return data
+        access_token,_ =get_tokens(request)
+        data = await spotify_service.get_top_tracks(limit=limit,offset=offset,time_range=time_range,token=access_token,enrich_artists=enrich_artists)
+        return model_response(data)
 
     except HTTPException:
         raise
@@ -56,14 +67,125 @@ async def top_track_user(request: Request, time_range: str = "medium_term", limi
 
 
 
+# Ranking completo de los 3 rangos con el cambio de posición entre ellos (type: artists o tracks)
+@router.get("/top-movement", response_model=TopMovement)
+@cached_response(ttl=settings.CACHE_TTL_TOP_ITEMS, cache_control=settings.CACHE_CONTROL_TOP_ITEMS)
+async def top_movement(request: Request, type: str = "artists"):
+    try:
+        access_token,_ =get_tokens(request)
+        response = await spotify_service.get_top_movement(type=type, token=access_token)
+        return model_response(response)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Ocurrio un error tratando de obtener el cambio del top del usuario entre rangos.")
+
+
+
+# Distribución de generos del top de artistas por rango; con compare_from y compare_to tambien el cambio entre ambos
+@router.get("/genres", response_model=GenreStats)
+@cached_response(ttl=settings.CACHE_TTL_TOP_ITEMS, cache_control=settings.CACHE_CONTROL_TOP_ITEMS)
+async def genres(request: Request, limit: int = 20, compare_from: str = None, compare_to: str = None):
+    try:
+        access_token,_ =get_tokens(request)
+        response = await genre_service.get_genres(token=access_token, limit=limit, compare_from=compare_from, compare_to=compare_to)
+        return model_response(response)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Ocurrio un error tratando de obtener la distribución de generos del usuario.")
+
+
+
 # Ruta para Obtener artistas que sigue el usuario
 @router.get("/artist-follow-user", response_model=ArtistsFollowByUser)
+@cached_response(ttl=settings.CACHE_TTL_FOLLOWED_ARTISTS, cache_control=settings.CACHE_CONTROL_USER)
 async def artist_folow_by_user(request: Request, after: str = None, limit: int = 10):
     try:
-        access_token,_ =get_tokens_from_cookies(request)
+        access_token,_ =get_tokens(request)
         response = await spotify_service.get_followed_artists(after=after, limit=limit, token=access_token)
+        return model_response(response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Ocurrio un error tratando de obtener los artistas seguidos por el usuario.")
+
+
+# Contadores de hit/miss por endpoint para ajustar los TTL del cache. Son de todo el proceso (no del usuario),
+# por eso solo existen con CACHE_STATS_ENABLED.
+@router.get("/cache/stats", include_in_schema=False)
+async def cache_stats():
+    if not settings.CACHE_STATS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return spotify_service.get_cache_stats()
+
+
+
+# Solo borra las entradas del usuario que hace la petición (las de Spotify y sus respuestas ya serializadas).
+@router.delete("/cache")
+async def invalidate_cache(request: Request):
+    try:
+        access_token,_ =get_tokens(request)
+        response = await spotify_service.invalidate_cache(token=access_token)
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Ocurrio un error tratando de limpiar el cache del usuario.")
+
+
+
+
+# Estadisticas sobre el historial guardado. Los rangos son [start, end), por defecto los ultimos 30 dias y maximo
+# STATS_MAX_RANGE_DAYS.
+@router.get("/stats/minutes-per-day", response_model=ListeningByDay)
+async def minutes_per_day(request: Request, start: date = None, end: date = None):
+    try:
+        access_token,_ =get_tokens(request)
+        response = await listening_stats_service.get_minutes_per_day(token=access_token, start=start, end=end)
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Ocurrio un error tratando de obtener los minutos escuchados por dia.")
+
+
+
+@router.get("/stats/top-artists", response_model=TopListened)
+async def stats_top_artists(request: Request, start: date = None, end: date = None, limit: int = Query(10, ge=1, le=50)):
+    try:
+        access_token,_ =get_tokens(request)
+        response = await listening_stats_service.get_top_listened(kind='artist', token=access_token, start=start, end=end, limit=limit)
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Ocurrio un error tratando de obtener los artistas mas escuchados en el rango.")
+
+
+
+@router.get("/stats/top-tracks", response_model=TopListened)
+async def stats_top_tracks(request: Request, start: date = None, end: date = None, limit: int = Query(10, ge=1, le=50)):
+    try:
+        access_token,_ =get_tokens(request)
+        response = await listening_stats_service.get_top_listened(kind='track', token=access_token, start=start, end=end, limit=limit)
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Ocurrio un error tratando de obtener las canciones mas escuchadas en el rango.")
+
+
+
+@router.post("/stats/rebuild")
+async def rebuild_stats(request: Request):
+    try:
+        access_token,_ =get_tokens(request)
+        response = await listening_stats_service.rebuild(token=access_token)
         return response
     except HTTPException:
         raise
     except Exception as e:
-        print("Ocurrio un error tratando de obtener los artistas seguidos por el usuario.")
\ No newline at end of file
+        print("Ocurrio un error tratando de recalcular las estadisticas del usuario.")
\ No newline at end of file
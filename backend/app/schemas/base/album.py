@@ -1,14 +1,21 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, AliasChoices, AliasPath, model_validator
 from typing import List, Optional
 from .image import Image
 from .artist import Artist
+from app.utils.interning import intern_model
 
 class Album(BaseModel):
-    id_album: str
+    id_album: str = Field(validation_alias=AliasChoices('id_album', 'id'))
     name: str
     album_type: str
     total_tracks: Optional[int] = None
     release_date: str
-    cover: Image
+    # Algunos albumes (sobre todo locales o retirados) llegan con images: [], sin portada.
+    cover: Optional[Image] = Field(default=None, validation_alias=AliasChoices(AliasPath('images', 0), 'cover'))
     genres: Optional[List[str]] = []
-    artist: List[Artist]
+    artist: List[Artist] = Field(validation_alias=AliasChoices('artist', 'artists'))
+
+    @model_validator(mode='wrap')
+    @classmethod
+    def _intern(cls, data, handler):
+        return intern_model(cls, data.get('id') if isinstance(data, dict) else None, data, handler)
@@ -1,12 +1,19 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, AliasChoices, AliasPath, model_validator
 from typing import List, Optional
 from .image import Image
+from app.utils.interning import intern_model
 
+# Los validation_alias permiten validar directo el JSON de Spotify ademas de los nombres propios del esquema.
 class Artist(BaseModel):
     id: str
     name: str
     genres: Optional[List[str]] = None
     uri: Optional[str] = None
     popularity: Optional[int] = None
-    followers: Optional[int] = None
-    image: Optional[Image] = None
+    followers: Optional[int] = Field(default=None, validation_alias=AliasChoices(AliasPath('followers', 'total'), 'followers'))
+    image: Optional[Image] = Field(default=None, validation_alias=AliasChoices(AliasPath('images', 0), 'image'))
+
+    @model_validator(mode='wrap')
+    @classmethod
+    def _intern(cls, data, handler):
+        return intern_model(cls, data.get('id') if isinstance(data, dict) else None, data, handler)
@@ -1,7 +1,13 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
+from app.utils.interning import intern_model
 
 
 class Image(BaseModel):
     url: str
     height: int
-    width: int
\ No newline at end of file
+    width: int
+
+    @model_validator(mode='wrap')
+    @classmethod
+    def _intern(cls, data, handler):
+        return intern_model(cls, data.get('url') if isinstance(data, dict) else None, data, handler)
\ No newline at end of file
@@ -1,16 +1,22 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, AliasChoices, model_validator
 from typing import List, Optional
 from .artist import Artist
 from .album import Album
+from app.utils.interning import intern_model
 
 
 
 class Track(BaseModel):
-    trackID: str
+    trackID: str = Field(validation_alias=AliasChoices('trackID', 'id'))
     name: str
     duration_ms: int
     explicit: bool
     artists: List[Artist]
     disc_number: int
     track_number: int
-    album: Optional[Album] = None
\ No newline at end of file
+    album: Optional[Album] = None
+
+    @model_validator(mode='wrap')
+    @classmethod
+    def _intern(cls, data, handler):
+        return intern_model(cls, data.get('id') if isinstance(data, dict) else None, data, handler)
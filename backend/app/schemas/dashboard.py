@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+from .base.user import User
+from .top import TopArtist, TopTracks
+from .player import TracksRecentlyPlayed, PlaybackState
+
+
+class Dashboard(BaseModel):
+    user: Optional[User] = None
+    top_artists: Optional[TopArtist] = None
+    top_tracks: Optional[TopTracks] = None
+    recently_played: Optional[TracksRecentlyPlayed] = None
+    playback_state: Optional[PlaybackState] = None
+    errors: Dict[str, str] = {}
@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+
+# weight es la fracción (0 a 1) del peso total del rango, artists cuantos artistas del top tienen el genero.
+class GenreWeight(BaseModel):
+    genre: str
+    weight: float
+    artists: int
+
+
+class GenreDistribution(BaseModel):
+    genres: List[GenreWeight]
+    artists: int
+
+
+class GenreShift(BaseModel):
+    genre: str
+    before: float
+    after: float
+    delta: float
+
+
+class GenreStats(BaseModel):
+    ranges: Dict[str, GenreDistribution]
+    compare_from: Optional[str] = None
+    compare_to: Optional[str] = None
+    shift: Optional[List[GenreShift]] = None
@@ -39,4 +39,20 @@ class PlaybackState(BaseModel):
     progress_ms: int
     is_playing: bool
     currently_playing_type:str
-    actions: Optional[PlaybackActions] = None
\ No newline at end of file
+    actions: Optional[PlaybackActions] = None
+
+
+# Respuesta 202 de los comandos del reproductor: lo que sigue pendiente de mandar a Spotify para ese dispositivo,
+# ya combinado (skip lleva el conteo neto de saltos, positivo hacia adelante).
+class PendingCommand(BaseModel):
+    command: str
+    count: Optional[int] = None
+    context_uri: Optional[str] = None
+    position: Optional[int] = None
+    position_ms: Optional[int] = None
+
+
+
+class CommandAccepted(BaseModel):
+    accepted: str
+    pending: List[PendingCommand]
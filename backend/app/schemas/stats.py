@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import List
+from datetime import date
+
+
+class DailyListening(BaseModel):
+    day: date
+    plays: int
+    minutes: float
+
+
+class ListeningByDay(BaseModel):
+    days: List[DailyListening]
+    start: date
+    end: date
+
+
+class RankedItem(BaseModel):
+    id: str
+    name: str
+    plays: int
+    minutes: float
+
+
+class TopListened(BaseModel):
+    items: List[RankedItem]
+    start: date
+    end: date
+    total_plays: int
+    total_minutes: float
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional
 from .base.track import Track
 from .base.artist import Artist
 
@@ -16,3 +16,26 @@ class TopArtist(BaseModel):
     limit: int
     offset: int
     total: int
+
+
+# Posiciones (1 = primero) de un artista o canción en cada rango; None si no aparece en ese rango. delta compara
+# cada rango con el anterior mas largo (medium_term contra long_term, short_term contra medium_term), positivo
+# si subio de posición.
+class RankedTopItem(BaseModel):
+    id: str
+    name: str
+    artists: List[str] = []
+    ranks: Dict[str, Optional[int]]
+    delta: Dict[str, Optional[int]]
+
+
+class RangeChanges(BaseModel):
+    entered: List[str]
+    dropped: List[str]
+
+
+class TopMovement(BaseModel):
+    type: str
+    items: List[RankedTopItem]
+    totals: Dict[str, int]
+    changes: Dict[str, RangeChanges]
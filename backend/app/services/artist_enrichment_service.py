@@ -0,0 +1,159 @@
+from app.clients.spotify_client import spotify_client
+from app.core.config import settings
+from app.utils.cache import TTLCache, record_dependency
+from app.utils.metrics import registry, cache_collector
+from app.utils.parsers import parse_artist
+from fastapi import HTTPException
+import asyncio
+
+
+# Los artistas que vienen dentro de canciones y albumes son simplificados (sin genres, popularity, followers
+# ni image). Este servicio junta los IDs que necesita cada respuesta, quita duplicados y los resuelve con
+# /artists?ids= en lotes de 50. Las peticiones concurrentes que piden los mismos IDs comparten la misma
+# consulta (estilo DataLoader) y lo obtenido queda en un cache compartido entre usuarios.
+class ArtistEnrichmentService():
+    def __init__(self):
+        self.spotifyclient = spotify_client
+        self.cache = TTLCache(ttl=settings.ARTIST_CACHE_TTL, maxsize=settings.ARTIST_CACHE_MAX_ENTRIES)
+        self.batch_size = 50
+        self._pending = {}
+        self._queue = []
+        # Tokens de quienes esperan cada ID pendiente, para reintentar con el suyo si falla el de otro usuario.
+        self._tokens = {}
+        self._flush_task = None
+
+
+    async def load_many(self, ids: list, token: str):
+        artists = {}
+        waiting = {}
+
+        for artist_id in dict.fromkeys(ids):
+            cached = self.cache.get(artist_id)
+            if cached is not None:
+                artists[artist_id] = cached
+                continue
+
+            future = self._pending.get(artist_id)
+            if future is None:
+                future = asyncio.get_running_loop().create_future()
+                self._pending[artist_id] = future
+                self._queue.append(artist_id)
+            self._tokens.setdefault(artist_id, {})[token] = None
+            waiting[artist_id] = future
+
+        if self._queue and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+
+        if waiting:
+            # shield evita que una petición cancelada cancele la consulta que comparten las demás.
+            results = await asyncio.gather(*[asyncio.shield(future) for future in waiting.values()], return_exceptions=True)
+            for artist_id, result in zip(waiting, results):
+                if result is not None and not isinstance(result, BaseException):
+                    artists[artist_id] = result
+
+        for artist_id in artists:
+            record_dependency(self.cache, artist_id)
+
+        return artists
+
+
+    async def _flush(self):
+        # Una ventana corta para que las peticiones que llegan casi al mismo tiempo entren en el mismo lote.
+        await asyncio.sleep(settings.ARTIST_BATCH_WINDOW)
+        queue = self._queue
+        self._queue, self._flush_task = [], None
+
+        chunks = [queue[start:start + self.batch_size] for start in range(0, len(queue), self.batch_size)]
+        await asyncio.gather(*[self._load_chunk(chunk) for chunk in chunks])
+
+
+    # El lote completo se pide con el token del primero que espera (los artistas son iguales para todos). Un 401/403
+    # es de ese token y no de los artistas, asi que los IDs que quedan se vuelven a pedir con el token de cada quien.
+    async def _load_chunk(self, ids: list):
+        remaining = ids
+        tried = set()
+        error = None
+
+        while remaining:
+            token = next((token for artist_id in remaining for token in self._tokens.get(artist_id, ()) if token not in tried), None)
+            if token is None:
+                break
+            batch = remaining if not tried else [artist_id for artist_id in remaining if token in self._tokens.get(artist_id, ())]
+            tried.add(token)
+
+            try:
+                data = await self.spotifyclient.get_several_artists(ids=batch, token=token)
+            except HTTPException as e:
+                error = e
+                if e.status_code in (401, 403):
+                    continue
+                break
+            except Exception as e:
+                error = e
+                break
+
+            found = {}
+            for artist in data.get('artists', []):
+                if artist:
+                    parsed = parse_artist(artist)
+                    if parsed is not None:
+                        found[artist['id']] = parsed
+                        self.cache.set(artist['id'], parsed)
+
+            for artist_id in batch:
+                self._resolve(artist_id, result=found.get(artist_id))
+            resolved = set(batch)
+            remaining = [artist_id for artist_id in remaining if artist_id not in resolved]
+
+        if remaining:
+            print(f"Ocurrio un error al tratar de obtener la información completa de los artistas: {error}")
+            for artist_id in remaining:
+                self._resolve(artist_id, error=error)
+
+
+    def _resolve(self, artist_id: str, result=None, error: Exception = None):
+        self._tokens.pop(artist_id, None)
+        future = self._pending.pop(artist_id, None)
+        if future is None or future.done():
+            return
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+            future.exception()
+
+
+    def _artists_in(self, item):
+        if item is None:
+            return
+        for artist in getattr(item, 'artists', None) or []:
+            yield artist
+        for artist in getattr(item, 'artist', None) or []:
+            yield artist
+        album = getattr(item, 'album', None)
+        if album is not None:
+            yield from self._artists_in(album)
+
+
+    # Completa en su lugar los artistas de las canciones o albumes recibidos. Si Spotify falla, los artistas
+    # se quedan como venian, el enriquecimiento es opcional.
+    async def enrich(self, items: list, token: str):
+        artists = [artist for item in items for artist in self._artists_in(item)]
+        if not artists:
+            return items
+
+        full_artists = await self.load_many([artist.id for artist in artists], token=token)
+
+        for artist in artists:
+            full = full_artists.get(artist.id)
+            if full is not None:
+                artist.genres = full.genres
+                artist.popularity = full.popularity
+                artist.followers = full.followers
+                artist.image = full.image
+
+        return items
+
+
+artist_enrichment_service = ArtistEnrichmentService()
+registry.register_collector(cache_collector({'artists': artist_enrichment_service.cache}))
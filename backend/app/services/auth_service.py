@@ -1,21 +1,44 @@
 from app.core.config import settings
 from fastapi.responses import JSONResponse
 from fastapi import HTTPException
+from app.clients.spotify_accounts_client import spotify_accounts_client
+from app.clients.spotify_client import spotify_client
+from app.db.connection import get_database
 from app.utils.cookies import set_tokens_in_cookies
-import requests
+from app.utils.cache import TTLCache
+from app.utils.metrics import registry, cache_collector
+from app.utils.singleflight import SingleFlight
+from datetime import datetime, timedelta, timezone
+import hashlib
 import base64
+import time
+
+
+# Compartidos entre todas las instancias de AuthService (middleware, routers), para que las peticiones
+# paralelas de un mismo navegador con el access_token vencido hagan un solo refresh.
+_refresh_flight = SingleFlight()
+_refreshed_tokens = TTLCache(ttl=settings.REFRESHED_TOKEN_CACHE_TTL, maxsize=settings.REFRESHED_TOKEN_CACHE_SIZE)
+
+
+def _collect_metrics():
+    yield from cache_collector({'refreshed_tokens': _refreshed_tokens})()
+    yield 'auth_token_refresh_coalesced_total', 'counter', 'Refresh que esperaron uno igual que ya estaba en curso.', [({}, _refresh_flight.coalesced)]
+
+
+registry.register_collector(_collect_metrics)
+
 
 class AuthService():
     def __init__(self):
         self.spotify_client_id = settings.SPOTIFY_CLIENT_ID
         self.spotify_secret = settings.SPOTIFY_CLIENT_SECRET
         self.redirect_uri = settings.SPOTIFY_REDIRECT_URI
+        self.accounts_client = spotify_accounts_client
 
 
 
-    def handle_spotify_callback(self, code: str, state: str):
+    async def handle_spotify_callback(self, code: str, state: str):
         try:
-            url = 'https://accounts.spotify.com/api/token'
             data = {
                 "code": code,
                 "redirect_uri": self.redirect_uri,
@@ -30,7 +53,7 @@ class AuthService():
                 'Authorization': f'Basic {encoded_credentials}'
             }
 
-            response = requests.post(url=url, headers=headers, data=data)
+            response = await self.accounts_client.request_token(data=data, headers=headers)
             if response.status_code == 200:
                 response_data = response.json()
 
@@ -39,7 +62,8 @@ class AuthService():
                     content={"message": "Autenticación exitosa", "success": True}
                 )
                 set_tokens_in_cookies(response=json_response, tokens=response_data)
-                
+                await self._link_user(tokens=response_data)
+
                 return json_response
             else:
                 raise HTTPException(status_code=response.status_code, detail="Ocurrio un error al obtener los tokens con Spotify.")
@@ -51,10 +75,56 @@ class AuthService():
             raise HTTPException(status_code=500, detail="Ocurrio un error al intentar obtener los tokens de la cuenta de spotify.")
 
 
+    # Guarda al usuario vinculado para que los procesos en segundo plano (historial de reproducción) puedan usar su cuenta.
+    async def _link_user(self, tokens: dict):
+        if not settings.MONGODB_CONNECTION_STRING:
+            return
+
+        try:
+            db = await get_database()
+            user_id = await spotify_client.resolve_user_id(tokens['access_token'])
+            now = datetime.now(timezone.utc)
+            await db.linked_users.update_one(
+                {'_id': user_id},
+                {
+                    '$set': {
+                        'refresh_token': tokens['refresh_token'],
+                        'access_token': tokens['access_token'],
+                        'access_token_expires_at': now + timedelta(seconds=tokens.get('expires_in', 3600)),
+                        'linked_at': now
+                    },
+                    '$setOnInsert': {
+                        'next_poll_at': now,
+                        'poll_interval': settings.HISTORY_POLL_MIN_INTERVAL
+                    }
+                },
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Ocurrio un error al tratar de guardar al usuario vinculado: {e}")
+
+
     # Esta función la utilizare para el middlewarwe, cambiare el refresh token por un access token.
-    def refresh_token(self, refresh_token):
+    async def refresh_token(self, refresh_token):
+        key = hashlib.sha256(refresh_token.encode()).hexdigest()
+
+        cached = _refreshed_tokens.get(key)
+        if cached is not None:
+            return self._with_remaining_expiry(cached)
+
+        tokens = await _refresh_flight.do(key, lambda: self._refresh_and_cache(key, refresh_token))
+        return self._with_remaining_expiry(tokens)
+
+
+    async def _refresh_and_cache(self, key: str, refresh_token: str):
+        tokens = await self._request_refresh(refresh_token)
+        tokens['_issued_at'] = time.monotonic()
+        _refreshed_tokens.set(key, tokens)
+        return tokens
+
+
+    async def _request_refresh(self, refresh_token):
         try:
-            url = 'https://accounts.spotify.com/api/token'
             data = {
                 'grant_type': 'refresh_token',
                 'refresh_token': refresh_token,
@@ -65,7 +135,7 @@ class AuthService():
             }
 
 
-            response = requests.post(url=url, headers=headers, data=data)
+            response = await self.accounts_client.request_token(data=data, headers=headers)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -78,3 +148,13 @@ class AuthService():
             print(f"Ocurrio un error en refresh_token: {e}")
             raise HTTPException(status_code=500, detail="Ocurrio un error tratando de refrescar el token")
 
+
+    # Los tokens salen del cache un poco despues de emitidos, asi que la cookie debe vencer cuando venza el token.
+    def _with_remaining_expiry(self, tokens: dict):
+        tokens = dict(tokens)
+        issued_at = tokens.pop('_issued_at', None)
+        expires_in = tokens.get('expires_in')
+        if issued_at is not None and expires_in is not None:
+            tokens['expires_in'] = max(int(expires_in - (time.monotonic() - issued_at)), 0)
+        return tokens
+
@@ -0,0 +1,54 @@
+from app.core.config import settings
+from app.schemas.dashboard import Dashboard
+from app.services.spotify_statistics_service import SpotifyService
+from app.services.spotify_player_service import PlayerService
+from fastapi import HTTPException
+import asyncio
+
+
+# Junta en una sola respuesta lo que necesita la pagina de inicio. Las secciones se piden en paralelo y
+# cada una tiene su propio timeout, si una falla o tarda de mas se regresa vacia y se reporta en errors.
+class DashboardService():
+    def __init__(self):
+        self.spotify_service = SpotifyService()
+        self.player_service = PlayerService()
+
+
+    async def _section(self, name: str, coroutine):
+        try:
+            return await asyncio.wait_for(coroutine, timeout=settings.DASHBOARD_SECTION_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"La sección {name} tardo demasiado en responder.")
+
+
+    async def get_dashboard(self, token: str, time_range: str = "medium_term", limit: int = 10):
+        sections = {
+            'user': self.spotify_service.get_user_info(token=token),
+            'top_artists': self.spotify_service.get_top_artist(time_range=time_range, limit=limit, offset=0, token=token),
+            'top_tracks': self.spotify_service.get_top_tracks(time_range=time_range, limit=limit, offset=0, token=token),
+            'recently_played': self.player_service.get_recently_player(limit=limit, before=None, after=None, token=token),
+            'playback_state': self.player_service.playback_state(token=token)
+        }
+
+        results = await asyncio.gather(
+            *[self._section(name, coroutine) for name, coroutine in sections.items()],
+            return_exceptions=True
+        )
+
+        data = {}
+        errors = {}
+        for name, result in zip(sections, results):
+            if isinstance(result, HTTPException):
+                # Spotify responde 204 cuando no se esta reproduciendo nada, no es un error.
+                if result.status_code != 204:
+                    errors[name] = str(result.detail)
+            elif isinstance(result, Exception):
+                print(f"Ocurrio un error al tratar de obtener la sección {name} del dashboard: {result}")
+                errors[name] = "Ocurrio un error al obtener esta sección."
+            elif result is None and name != 'playback_state':
+                # Los servicios imprimen el error y regresan None; solo playback_state puede venir vacio sin error.
+                errors[name] = "Ocurrio un error al obtener esta sección."
+            else:
+                data[name] = result
+
+        return Dashboard(**data, errors=errors)
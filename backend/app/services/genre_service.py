@@ -0,0 +1,129 @@
+from app.services.spotify_statistics_service import SpotifyService, TIME_RANGES
+from app.schemas.genres import GenreStats
+from fastapi import HTTPException
+from array import array
+import heapq
+import math
+
+
+# Vocabulario de generos de una sola respuesta: cada genero del top del usuario recibe un indice, asi los conteos de
+# cada rango son arreglos de floats del mismo tamaño (array('d')) en lugar de diccionarios por genero, y comparar
+# dos rangos es recorrer dos arreglos alineados. Solo tiene los generos de este usuario (unos cientos a lo mucho).
+class GenreVocabulary():
+    def __init__(self):
+        self.index = {}
+        self.names = []
+
+
+    def encode(self, genres: list):
+        encoded = array('I')
+        for genre in genres:
+            position = self.index.get(genre)
+            if position is None:
+                position = self.index[genre] = len(self.names)
+                self.names.append(genre)
+            encoded.append(position)
+        return encoded
+
+
+    def __len__(self):
+        return len(self.names)
+
+
+# Distribución de generos del top de artistas de cada rango. Cada artista aporta un peso que baja con su
+# posición (1 / log2(posición + 1)) y sube con su popularidad, repartido entre sus generos para que un artista
+# con muchos generos no pese mas que uno con uno solo.
+class GenreService():
+    def __init__(self):
+        self.spotify_service = SpotifyService()
+
+
+    # Codifica los 3 rangos antes de contar para que todos los arreglos tengan el tamaño final del vocabulario. Un
+    # artista que aparece en varios rangos se codifica una sola vez.
+    def _encode(self, items: dict, vocabulary: GenreVocabulary):
+        by_artist = {}
+        encoded = {}
+        for time_range in TIME_RANGES:
+            encoded[time_range] = []
+            for rank, artist in enumerate(items[time_range], start=1):
+                genres = by_artist.get(artist['id'])
+                if genres is None:
+                    genres = by_artist[artist['id']] = vocabulary.encode(artist.get('genres') or [])
+                encoded[time_range].append((rank, artist.get('popularity') or 0, genres))
+        return encoded
+
+
+    def _weights(self, encoded: list, size: int):
+        weights = array('d', bytes(8 * size))
+        counts = array('I', bytes(4 * size))
+        for rank, popularity, genres in encoded:
+            if not genres:
+                continue
+            share = (0.5 + popularity / 200) / math.log2(rank + 1) / len(genres)
+            for position in genres:
+                weights[position] += share
+                counts[position] += 1
+
+        total = sum(weights)
+        if total:
+            weights = array('d', [weight / total for weight in weights])
+        return weights, counts
+
+
+    def _top(self, weights: array, counts: array, vocabulary: GenreVocabulary, limit: int):
+        positions = heapq.nlargest(limit, (position for position in range(len(weights)) if weights[position]), key=weights.__getitem__)
+        return [
+            {'genre': vocabulary.names[position], 'weight': round(weights[position], 6), 'artists': counts[position]}
+            for position in positions
+        ]
+
+
+    def _shift(self, before: array, after: array, vocabulary: GenreVocabulary, limit: int):
+        deltas = [(after[position] - before[position], position) for position in range(len(vocabulary)) if before[position] or after[position]]
+        return [
+            {
+                'genre': vocabulary.names[position],
+                'before': round(before[position], 6),
+                'after': round(after[position], 6),
+                'delta': round(delta, 6)
+            }
+            for delta, position in heapq.nlargest(limit, deltas, key=lambda delta: abs(delta[0]))
+        ]
+
+
+    async def get_genres(self, token: str, limit: int = 20, compare_from: str = None, compare_to: str = None):
+        try:
+            if (compare_from is None) != (compare_to is None):
+                raise HTTPException(status_code=400, detail="Para comparar se necesitan compare_from y compare_to.")
+            for time_range in (compare_from, compare_to):
+                if time_range is not None and time_range not in TIME_RANGES:
+                    raise HTTPException(status_code=400, detail="Por favor ingrese un rango de tiempo válido.")
+
+            items, _ = await self.spotify_service.get_all_top_items(type="artists", token=token)
+
+            vocabulary = GenreVocabulary()
+            encoded = self._encode(items, vocabulary)
+
+            ranges = {}
+            weights = {}
+            for time_range in TIME_RANGES:
+                weights[time_range], counts = self._weights(encoded[time_range], size=len(vocabulary))
+                ranges[time_range] = {
+                    'genres': self._top(weights[time_range], counts, vocabulary, limit),
+                    'artists': len(items[time_range])
+                }
+
+            shift = None
+            if compare_from is not None:
+                shift = self._shift(weights[compare_from], weights[compare_to], vocabulary, limit)
+
+            return GenreStats(ranges=ranges, compare_from=compare_from, compare_to=compare_to, shift=shift)
+
+        except HTTPException:
+            raise
+
+        except Exception as e:
+            print(f"Ocurrio un error al tratar de obtener la distribución de generos del usuario: {e}")
+
+
+genre_service = GenreService()
@@ -0,0 +1,211 @@
+from app.clients.spotify_client import spotify_client
+from app.core.config import settings
+from app.db.connection import get_database
+from app.services.auth_service import AuthService
+from app.services.listening_stats_service import listening_stats_service
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from datetime import datetime, timedelta, timezone
+import asyncio
+
+
+# Spotify solo deja ver las ultimas 50 reproducciones, asi que este servicio las va copiando a MongoDB
+# para cada usuario vinculado y arma un historial sin limite.
+class HistoryIngestionService():
+    def __init__(self):
+        self.spotifyclient = spotify_client
+        self.auth_service = AuthService()
+        self._task = None
+
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_due_users()
+            except Exception as e:
+                print(f"Ocurrio un error en la ingesta del historial de reproducción: {e}")
+            await asyncio.sleep(settings.HISTORY_SCHEDULER_TICK)
+
+
+
+    async def poll_due_users(self):
+        db = await get_database()
+        now = datetime.now(timezone.utc)
+        cursor = db.linked_users.find({'next_poll_at': {'$lte': now}}).sort('next_poll_at', 1).limit(settings.HISTORY_POLL_BATCH)
+        users = [user async for user in cursor]
+
+        semaphore = asyncio.Semaphore(settings.HISTORY_POLL_CONCURRENCY)
+
+        async def poll(user):
+            async with semaphore:
+                try:
+                    await self.poll_user(db=db, user=user)
+                except Exception as e:
+                    print(f"Ocurrio un error al tratar de obtener el historial del usuario {user['_id']}: {e}")
+                    await self._schedule(db=db, user=user, interval=user.get('poll_interval', settings.HISTORY_POLL_MIN_INTERVAL))
+
+        await asyncio.gather(*[poll(user) for user in users])
+        return len(users)
+
+
+
+    async def poll_user(self, db, user: dict):
+        token = await self._access_token(db=db, user=user)
+        after = user.get('cursor_after')
+        plays = []
+
+        # Con el cursor after Spotify regresa lo reproducido despues de la ultima lectura, de 50 en 50.
+        for _ in range(settings.HISTORY_MAX_PAGES_PER_POLL):
+            data = await self.spotifyclient.get_recently_played(limit=50, after=after, before=None, token=token)
+            items = data.get('items', [])
+            plays.extend(items)
+
+            cursors = data.get('cursors') or {}
+            if cursors.get('after'):
+                after = cursors['after']
+            if len(items) < 50:
+                break
+
+        async with listening_stats_service.user_lock(user['_id']):
+            inserted = await self._store_plays(db=db, user_id=user['_id'], items=plays)
+            await listening_stats_service.record_plays(user_id=user['_id'], plays=inserted)
+
+        interval = self._next_interval(user=user, new_plays=len(inserted))
+        await self._schedule(db=db, user=user, interval=interval, cursor_after=after, new_plays=len(inserted))
+
+        return len(inserted)
+
+
+
+    async def _access_token(self, db, user: dict):
+        expires_at = user.get('access_token_expires_at')
+        if expires_at is not None and expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+
+        if user.get('access_token') and expires_at and expires_at > datetime.now(timezone.utc) + timedelta(seconds=60):
+            return user['access_token']
+
+        tokens = await self.auth_service.refresh_token(refresh_token=user['refresh_token'])
+        update = {
+            'access_token': tokens['access_token'],
+            'access_token_expires_at': datetime.now(timezone.utc) + timedelta(seconds=tokens.get('expires_in', 3600))
+        }
+        # Spotify puede rotar el refresh token, si llega uno nuevo se guarda.
+        if tokens.get('refresh_token'):
+            update['refresh_token'] = tokens['refresh_token']
+
+        await db.linked_users.update_one({'_id': user['_id']}, {'$set': update})
+        return tokens['access_token']
+
+
+
+    async def _store_plays(self, db, user_id: str, items: list):
+        plays = {}
+        for item in items:
+            track = item.get('track')
+            if not track or not track.get('id'):
+                continue
+
+            key = f"{user_id}:{item['played_at']}:{track['id']}"
+            plays[key] = {
+                'user_id': user_id,
+                'played_at': datetime.fromisoformat(item['played_at'].replace('Z', '+00:00')),
+                'trackID': track['id'],
+                'name': track['name'],
+                'duration_ms': track['duration_ms'],
+                'artists': [{'id': artist['id'], 'name': artist['name']} for artist in track.get('artists', [])],
+                'album_id': (track.get('album') or {}).get('id'),
+                'context_uri': (item.get('context') or {}).get('uri')
+            }
+
+        if not plays:
+            return []
+
+        # $setOnInsert hace que las reproducciones que ya estaban guardadas no se dupliquen ni se modifiquen.
+        inserted = []
+        keys = list(plays)
+        for start in range(0, len(keys), settings.LIBRARY_SYNC_BATCH_SIZE):
+            batch = keys[start:start + settings.LIBRARY_SYNC_BATCH_SIZE]
+            operations = [
+                UpdateOne({'_id': key}, {'$setOnInsert': plays[key]}, upsert=True)
+                for key in batch
+            ]
+            result = await db.play_history.bulk_write(operations, ordered=False)
+            inserted.extend(plays[batch[index]] for index in result.upserted_ids)
+
+        return inserted
+
+
+
+    # Usuarios activos se revisan seguido para no perder reproducciones (el buffer de Spotify es de 50), los
+    # inactivos se revisan cada vez menos.
+    def _next_interval(self, user: dict, new_plays: int):
+        current = user.get('poll_interval', settings.HISTORY_POLL_MIN_INTERVAL)
+
+        if new_plays == 0:
+            interval = current * 2
+        else:
+            last_polled_at = user.get('last_polled_at')
+            if last_polled_at is not None and last_polled_at.tzinfo is None:
+                last_polled_at = last_polled_at.replace(tzinfo=timezone.utc)
+            elapsed = (datetime.now(timezone.utc) - last_polled_at).total_seconds() if last_polled_at else current
+            plays_per_second = new_plays / max(elapsed, 1.0)
+            # Se busca volver antes de que se acumulen 25 reproducciones, la mitad del buffer.
+            interval = 25 / plays_per_second
+
+        return min(max(interval, settings.HISTORY_POLL_MIN_INTERVAL), settings.HISTORY_POLL_MAX_INTERVAL)
+
+
+
+    async def _schedule(self, db, user: dict, interval: float, cursor_after: str = None, new_plays: int = 0):
+        now = datetime.now(timezone.utc)
+        update = {
+            'poll_interval': interval,
+            'next_poll_at': now + timedelta(seconds=interval),
+            'last_polled_at': now
+        }
+        if cursor_after:
+            update['cursor_after'] = cursor_after
+        if new_plays:
+            update['last_play_ingested_at'] = now
+
+        await db.linked_users.update_one({'_id': user['_id']}, {'$set': update})
+
+
+
+    async def get_history(self, token: str, limit: int, before: datetime = None):
+        try:
+            db = await get_database()
+            user_id = await self.spotifyclient.resolve_user_id(token)
+            query = {'user_id': user_id}
+            if before is not None:
+                query['played_at'] = {'$lt': before}
+
+            cursor = db.play_history.find(query, {'_id': 0}).sort('played_at', -1).limit(limit)
+            plays = [play async for play in cursor]
+            total = await db.play_history.count_documents({'user_id': user_id})
+
+            return {'plays': plays, 'limit': limit, 'total': total}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Ocurrio un error al tratar de obtener el historial de reproducción: {e}")
+
+
+history_ingestion_service = HistoryIngestionService()
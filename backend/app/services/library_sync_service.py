@@ -0,0 +1,212 @@
+from app.clients.spotify_client import spotify_client
+from app.core.config import settings
+from app.db.connection import get_database
+from app.schemas.library import AlbumSaved, SavedAlbumsByUser
+from app.services.spotify_album_service import AlbumService
+from app.utils.parsers import parse_saved_albums_bulk
+from app.utils.singleflight import SingleFlight
+from fastapi import HTTPException
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from datetime import datetime, timedelta, timezone
+import uuid
+
+
+# Guarda en MongoDB una copia de los albumes guardados de cada usuario. Spotify regresa la biblioteca
+# ordenada por added_at descendente, asi que en cada sync basta con leer paginas hasta llegar al
+# ultimo album que ya teniamos (watermark) y hacer upsert de lo nuevo.
+class LibrarySyncService():
+    def __init__(self):
+        self.spotifyclient = spotify_client
+        self.album_service = AlbumService()
+        # Una sola sync a la vez por usuario: una sync completa borra lo que no lleva su sync_id, asi que dos
+        # al mismo tiempo se borrarian entre si. Quien llega mientras corre una espera ese mismo resultado.
+        self._flight = SingleFlight()
+
+
+    async def sync_saved_albums(self, token: str):
+        try:
+            db = await get_database()
+            user_id = await self.spotifyclient.resolve_user_id(token)
+            return await self._flight.do(user_id, lambda: self._sync(db=db, user_id=user_id, token=token))
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Ocurrio un error al tratar de sincronizar la biblioteca del usuario: {e}")
+            raise HTTPException(status_code=500, detail="Ocurrio un error al sincronizar la biblioteca.")
+
+
+
+    async def _sync(self, db, user_id: str, token: str):
+        state = await db.library_sync_state.find_one({'_id': user_id})
+
+        if state is None or not state.get('watermark') or self._older_than(state.get('full_synced_at'), settings.LIBRARY_FULL_SYNC_INTERVAL):
+            return await self._full_sync(db=db, user_id=user_id, token=token)
+
+        return await self._incremental_sync(db=db, user_id=user_id, state=state, token=token)
+
+
+
+    async def _incremental_sync(self, db, user_id: str, state: dict, token: str):
+        watermark = state['watermark']
+        page_size = settings.LIBRARY_PAGE_SIZE
+        offset = 0
+        pages = 0
+        new_items = []
+        first_page_ids = None
+
+        while True:
+            data = await self.spotifyclient.get_albums_save_user(limit=page_size, offset=offset, token=token)
+            pages += 1
+            total = data['total']
+            if first_page_ids is None:
+                first_page_ids = {item['album']['id'] for item in data['items']}
+
+            # Los que tienen el mismo added_at que el watermark se vuelven a escribir, el upsert es idempotente.
+            reached_watermark = False
+            for item in data['items']:
+                if item['added_at'] < watermark:
+                    reached_watermark = True
+                    break
+                new_items.append(item)
+
+            offset += page_size
+            if reached_watermark or offset >= total:
+                break
+
+        new_albums = self._parse_page(new_items)
+        sync_id = state.get('sync_id')
+        written = await self._bulk_upsert(db=db, user_id=user_id, albums=new_albums, sync_id=sync_id)
+
+        # Si el conteo no cuadra, el usuario quito albumes de su biblioteca y hace falta una sync completa. Quitar uno y
+        # agregar otro deja el mismo conteo, por eso tambien se compara la primera pagina con lo mas reciente guardado;
+        # lo que se quite mas abajo de la primera pagina lo corrige la sync completa de cada LIBRARY_FULL_SYNC_INTERVAL.
+        stored = await db.saved_albums.count_documents({'user_id': user_id})
+        cursor = db.saved_albums.find({'user_id': user_id}, {'album_id': 1}).sort('added_at', -1).limit(len(first_page_ids))
+        stored_first_page = {document['album_id'] async for document in cursor}
+        if stored != total or stored_first_page != first_page_ids:
+            return await self._full_sync(db=db, user_id=user_id, token=token)
+
+        watermark = max([album.added_at for album in new_albums] + [watermark])
+        await self._save_state(db=db, user_id=user_id, watermark=watermark, total=total, sync_id=sync_id)
+
+        return {'mode': 'incremental', 'pages': pages, 'upserted': written, 'removed': 0, 'total': total}
+
+
+
+    # Una pagina se valida de una sola vez; si algun album no pasa la validación se valida uno por uno y solo ese se omite.
+    def _parse_page(self, items: list):
+        try:
+            return parse_saved_albums_bulk(items)
+        except ValidationError:
+            albums = []
+            for item in items:
+                try:
+                    albums.extend(parse_saved_albums_bulk([item]))
+                except ValidationError as e:
+                    print(f"Se omitio el album {(item.get('album') or {}).get('id')} de la biblioteca por no ser valido: {e}")
+            return albums
+
+
+
+    async def _full_sync(self, db, user_id: str, token: str):
+        sync_id = uuid.uuid4().hex
+        albums = await self.album_service.stream_albums_saved_user(token=token)
+        batch = []
+        written = 0
+        watermark = None
+
+        async for album in albums:
+            batch.append(album)
+            if watermark is None or album.added_at > watermark:
+                watermark = album.added_at
+            if len(batch) >= settings.LIBRARY_SYNC_BATCH_SIZE:
+                written += await self._bulk_upsert(db=db, user_id=user_id, albums=batch, sync_id=sync_id)
+                batch = []
+
+        written += await self._bulk_upsert(db=db, user_id=user_id, albums=batch, sync_id=sync_id)
+
+        # Todo lo que no se toco en esta sync ya no esta en la biblioteca de Spotify.
+        deleted = await db.saved_albums.delete_many({'user_id': user_id, 'sync_id': {'$ne': sync_id}})
+        total = await db.saved_albums.count_documents({'user_id': user_id})
+        await self._save_state(db=db, user_id=user_id, watermark=watermark, total=total, sync_id=sync_id, full=True)
+
+        return {'mode': 'full', 'upserted': written, 'removed': deleted.deleted_count, 'total': total}
+
+
+
+    async def _bulk_upsert(self, db, user_id: str, albums: list, sync_id: str):
+        if not albums:
+            return 0
+
+        operations = [
+            UpdateOne(
+                {'_id': f'{user_id}:{album.album.id_album}'},
+                {'$set': {
+                    'user_id': user_id,
+                    'album_id': album.album.id_album,
+                    'added_at': album.added_at,
+                    'album': album.album.model_dump(),
+                    'sync_id': sync_id
+                }},
+                upsert=True
+            )
+            for album in albums
+        ]
+        result = await db.saved_albums.bulk_write(operations, ordered=False)
+        return result.upserted_count + result.modified_count
+
+
+
+    async def _save_state(self, db, user_id: str, watermark: str, total: int, sync_id: str, full: bool = False):
+        now = datetime.now(timezone.utc)
+        update = {
+            'watermark': watermark,
+            'total': total,
+            'sync_id': sync_id,
+            'synced_at': now
+        }
+        if full:
+            update['full_synced_at'] = now
+
+        await db.library_sync_state.update_one({'_id': user_id}, {'$set': update}, upsert=True)
+
+
+
+    def _older_than(self, synced_at: datetime, seconds: float):
+        if synced_at is None:
+            return True
+        if synced_at.tzinfo is None:
+            synced_at = synced_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - synced_at > timedelta(seconds=seconds)
+
+
+
+    async def get_saved_albums_snapshot(self, limit: int, offset: int, token: str):
+        try:
+            db = await get_database()
+            user_id = await self.spotifyclient.resolve_user_id(token)
+            state = await db.library_sync_state.find_one({'_id': user_id})
+            # Pasado LIBRARY_SNAPSHOT_MAX_AGE la copia se actualiza al leerla; casi siempre es una sync incremental de una pagina.
+            if state is None or self._older_than(state.get('synced_at'), settings.LIBRARY_SNAPSHOT_MAX_AGE):
+                await self.sync_saved_albums(token=token)
+                state = await db.library_sync_state.find_one({'_id': user_id})
+
+            cursor = db.saved_albums.find({'user_id': user_id}).sort('added_at', -1).skip(offset).limit(limit)
+            albums = [
+                AlbumSaved(added_at=document['added_at'], album=document['album'])
+                async for document in cursor
+            ]
+
+            return SavedAlbumsByUser(
+                AlbumsSaved=albums,
+                limit=limit,
+                offset=offset,
+                total=state['total']
+            )
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Ocurrio un error al tratar de leer la biblioteca guardada del usuario: {e}")
@@ -0,0 +1,219 @@
+from app.clients.spotify_client import spotify_client
+from app.core.config import settings
+from app.db.connection import get_database
+from app.schemas.stats import DailyListening, ListeningByDay, RankedItem, TopListened
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from datetime import date, datetime, timedelta, timezone
+from weakref import WeakValueDictionary
+import asyncio
+
+
+# Mantiene acumulados por dia, semana y mes (reproducciones y tiempo por canción, por artista y totales)
+# conforme llegan reproducciones nuevas. Un rango de fechas se responde uniendo los acumulados que lo
+# cubren en lugar de recorrer todo el historial.
+class ListeningStatsService():
+    def __init__(self):
+        self.spotifyclient = spotify_client
+        # rebuild y la ingesta del historial toman el lock del usuario, asi una reproducción que se guarda mientras
+        # se recalcula no termina sumada dos veces (una por el recalculo y otra por record_plays).
+        self._user_locks = WeakValueDictionary()
+
+
+    def user_lock(self, user_id: str):
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = self._user_locks[user_id] = asyncio.Lock()
+        return lock
+
+
+    def _period_starts(self, played_at: datetime):
+        day = played_at.date()
+        return {
+            'day': day,
+            'week': day - timedelta(days=day.weekday()),
+            'month': day.replace(day=1)
+        }
+
+
+    def _as_datetime(self, day: date):
+        return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+    async def record_plays(self, user_id: str, plays: list):
+        if not plays:
+            return 0
+
+        increments = {}
+        for play in plays:
+            entities = [('total', 'total', 'total'), ('track', play['trackID'], play['name'])]
+            entities += [('artist', artist['id'], artist['name']) for artist in play['artists']]
+
+            for period, start in self._period_starts(play['played_at']).items():
+                for kind, entity_id, name in entities:
+                    key = (period, start, kind, entity_id)
+                    if key not in increments:
+                        increments[key] = {'name': name, 'plays': 0, 'ms': 0}
+                    increments[key]['plays'] += 1
+                    increments[key]['ms'] += play['duration_ms']
+
+        operations = [
+            UpdateOne(
+                {'_id': f'{user_id}:{period}:{start.isoformat()}:{kind}:{entity_id}'},
+                {
+                    '$inc': {'plays': values['plays'], 'ms': values['ms']},
+                    '$set': {
+                        'user_id': user_id,
+                        'period': period,
+                        'period_start': self._as_datetime(start),
+                        'kind': kind,
+                        'entity_id': entity_id,
+                        'name': values['name']
+                    }
+                },
+                upsert=True
+            )
+            for (period, start, kind, entity_id), values in increments.items()
+        ]
+
+        db = await get_database()
+        await db.play_rollups.bulk_write(operations, ordered=False)
+        return len(operations)
+
+
+    # Cubre [start, end) con la menor cantidad de periodos: meses completos, luego semanas completas y dias sueltos.
+    def _cover_range(self, start: date, end: date):
+        segments = {'day': [], 'week': [], 'month': []}
+        cursor = start
+        while cursor < end:
+            next_month = (cursor.replace(day=28) + timedelta(days=4)).replace(day=1)
+            if cursor.day == 1 and next_month <= end:
+                segments['month'].append(self._as_datetime(cursor))
+                cursor = next_month
+            elif cursor.weekday() == 0 and cursor + timedelta(days=7) <= end:
+                segments['week'].append(self._as_datetime(cursor))
+                cursor = cursor + timedelta(days=7)
+            else:
+                segments['day'].append(self._as_datetime(cursor))
+                cursor = cursor + timedelta(days=1)
+        return segments
+
+
+    async def _merge_rollups(self, user_id: str, kind: str, start: date, end: date):
+        segments = self._cover_range(start, end)
+        periods = [
+            {'period': period, 'period_start': {'$in': starts}}
+            for period, starts in segments.items() if starts
+        ]
+        if not periods:
+            return {}
+
+        db = await get_database()
+        merged = {}
+        async for rollup in db.play_rollups.find({'user_id': user_id, 'kind': kind, '$or': periods}):
+            entity = merged.setdefault(rollup['entity_id'], {'name': rollup['name'], 'plays': 0, 'ms': 0})
+            entity['plays'] += rollup['plays']
+            entity['ms'] += rollup['ms']
+        return merged
+
+
+    def _validate_range(self, start: date, end: date):
+        if end is None:
+            end = datetime.now(timezone.utc).date() + timedelta(days=1)
+        if start is None:
+            start = end - timedelta(days=30)
+        if start >= end:
+            raise HTTPException(status_code=400, detail="La fecha de inicio debe ser anterior a la fecha final.")
+        if (end - start).days > settings.STATS_MAX_RANGE_DAYS:
+            raise HTTPException(status_code=400, detail=f"El rango no puede ser mayor a {settings.STATS_MAX_RANGE_DAYS} dias.")
+        return start, end
+
+
+    async def get_top_listened(self, kind: str, token: str, start: date = None, end: date = None, limit: int = 10):
+        try:
+            start, end = self._validate_range(start, end)
+            user_id = await self.spotifyclient.resolve_user_id(token)
+
+            merged = await self._merge_rollups(user_id=user_id, kind=kind, start=start, end=end)
+            totals = await self._merge_rollups(user_id=user_id, kind='total', start=start, end=end)
+            total = totals.get('total', {'plays': 0, 'ms': 0})
+
+            ranked = sorted(merged.items(), key=lambda entry: (entry[1]['plays'], entry[1]['ms']), reverse=True)[:limit]
+
+            return TopListened(
+                items=[
+                    RankedItem(id=entity_id, name=values['name'], plays=values['plays'], minutes=round(values['ms'] / 60000, 2))
+                    for entity_id, values in ranked
+                ],
+                start=start,
+                end=end,
+                total_plays=total['plays'],
+                total_minutes=round(total['ms'] / 60000, 2)
+            )
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Ocurrio un error al tratar de obtener las estadisticas de reproducción: {e}")
+
+
+    async def get_minutes_per_day(self, token: str, start: date = None, end: date = None):
+        try:
+            start, end = self._validate_range(start, end)
+            user_id = await self.spotifyclient.resolve_user_id(token)
+
+            db = await get_database()
+            query = {
+                'user_id': user_id,
+                'period': 'day',
+                'kind': 'total',
+                'period_start': {'$gte': self._as_datetime(start), '$lt': self._as_datetime(end)}
+            }
+            by_day = {}
+            async for rollup in db.play_rollups.find(query):
+                by_day[rollup['period_start'].date()] = rollup
+
+            days = []
+            cursor = start
+            while cursor < end:
+                rollup = by_day.get(cursor, {'plays': 0, 'ms': 0})
+                days.append(DailyListening(day=cursor, plays=rollup['plays'], minutes=round(rollup['ms'] / 60000, 2)))
+                cursor = cursor + timedelta(days=1)
+
+            return ListeningByDay(days=days, start=start, end=end)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Ocurrio un error al tratar de obtener los minutos escuchados por dia: {e}")
+
+
+    # Recalcula los acumulados de un usuario desde su historial, para lo que se guardo antes de tener acumulados.
+    async def rebuild(self, token: str):
+        try:
+            user_id = await self.spotifyclient.resolve_user_id(token)
+            db = await get_database()
+
+            async with self.user_lock(user_id):
+                await db.play_rollups.delete_many({'user_id': user_id})
+
+                batch = []
+                processed = 0
+                async for play in db.play_history.find({'user_id': user_id}):
+                    batch.append(play)
+                    if len(batch) >= 1000:
+                        await self.record_plays(user_id=user_id, plays=batch)
+                        processed += len(batch)
+                        batch = []
+                await self.record_plays(user_id=user_id, plays=batch)
+                processed += len(batch)
+
+            return {'message': 'Se recalcularon las estadisticas del usuario.', 'plays': processed}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Ocurrio un error al tratar de recalcular las estadisticas del usuario: {e}")
+
+
+listening_stats_service = ListeningStatsService()
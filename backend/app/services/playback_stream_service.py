@@ -0,0 +1,154 @@
+from app.clients.spotify_client import spotify_client
+from app.clients.rate_limiter import RateLimitExceeded
+from app.core.config import settings
+from app.services.spotify_player_service import PlayerService, add_command_listener
+from app.utils.metrics import registry
+from fastapi import HTTPException
+import asyncio
+
+
+# Un poller por usuario que consulta /me/player y reparte los cambios a todas las conexiones (pestañas) de ese
+# usuario. Asi las llamadas a Spotify dependen de cuantos usuarios estan escuchando y no de cuantas pestañas abiertas hay.
+class PlaybackPoller():
+    def __init__(self, service, user_id: str, token: str):
+        self.service = service
+        self.user_id = user_id
+        self.token = token
+        self.subscribers = set()
+        self.state = None
+        self.polled = False
+        self.wake = asyncio.Event()
+        self.task = None
+
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+
+    def publish(self, event: str, data):
+        for queue in self.subscribers:
+            # Una conexión lenta no detiene a las demás: se descarta lo pendiente y se le manda el estado completo.
+            if queue.full():
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait((event, data) if event == 'close' else ('snapshot', self.state))
+            else:
+                queue.put_nowait((event, data))
+
+
+    async def _run(self):
+        while self.subscribers:
+            interval = await self._poll()
+            if interval is None:
+                break
+            self.wake.clear()
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+    async def _poll(self):
+        try:
+            state = await self.service.player_service.playback_state(token=self.token)
+            state = state.model_dump(mode='json') if state is not None else None
+        except RateLimitExceeded as e:
+            return max(float(e.headers['Retry-After']), settings.PLAYBACK_POLL_MAX_INTERVAL)
+        except HTTPException as e:
+            # El token vencio o se revoco: se cierran las conexiones para que el navegador se reconecte pasando por
+            # AuthMiddleware, que refresca el token; la siguiente suscripción crea un poller nuevo con el token nuevo.
+            if e.status_code in (401, 403):
+                self.publish('close', {'status': e.status_code, 'detail': str(e.detail)})
+                return None
+            # Spotify responde 204 cuando no hay nada reproduciendose.
+            if e.status_code != 204:
+                self.publish('error', {'status': e.status_code, 'detail': str(e.detail)})
+                return settings.PLAYBACK_POLL_IDLE_INTERVAL
+            state = None
+
+        first = not self.polled
+        previous, self.state, self.polled = self.state, state, True
+        if first or (previous is None) != (state is None):
+            self.publish('snapshot', state)
+        elif state is not None:
+            changes = diff_state(previous, state)
+            if changes:
+                self.publish('diff', changes)
+
+        return next_interval(state)
+
+
+class PlaybackStreamService():
+    def __init__(self):
+        self.spotifyclient = spotify_client
+        self.player_service = PlayerService()
+        self.pollers = {}
+
+
+    def subscribe(self, user_id: str, token: str):
+        poller = self.pollers.get(user_id)
+        queue = asyncio.Queue(maxsize=16)
+
+        if poller is None or poller.task.done():
+            poller = PlaybackPoller(service=self, user_id=user_id, token=token)
+            poller.subscribers.add(queue)
+            poller.start()
+            self.pollers[user_id] = poller
+        else:
+            # El token de la conexión mas reciente es el que tiene mas tiempo de vida.
+            poller.token = token
+            poller.subscribers.add(queue)
+            if poller.polled:
+                queue.put_nowait(('snapshot', poller.state))
+
+        return poller, queue
+
+
+    def unsubscribe(self, poller: PlaybackPoller, queue):
+        poller.subscribers.discard(queue)
+        if not poller.subscribers:
+            poller.task.cancel()
+            if self.pollers.get(poller.user_id) is poller:
+                del self.pollers[poller.user_id]
+
+
+    # Despues de un comando (pausa, siguiente) el estado cambia, se adelanta la siguiente consulta.
+    def poke(self, token: str):
+        user_id = self.spotifyclient.known_user_id(token)
+        poller = self.pollers.get(user_id) if user_id is not None else None
+        if poller is not None:
+            poller.wake.set()
+
+
+    def stats(self):
+        return {
+            'users': len(self.pollers),
+            'connections': sum(len(poller.subscribers) for poller in self.pollers.values())
+        }
+
+
+    def collect_metrics(self):
+        stats = self.stats()
+        yield 'playback_stream_users', 'gauge', 'Usuarios con un poller del reproductor activo.', [({}, stats['users'])]
+        yield 'playback_stream_connections', 'gauge', 'Conexiones SSE abiertas al stream del reproductor.', [({}, stats['connections'])]
+
+
+# Solo los campos de primer nivel que cambiaron; device y track se mandan completos si cambio algo adentro.
+def diff_state(previous: dict, current: dict):
+    return {key: value for key, value in current.items() if previous.get(key) != value}
+
+
+def next_interval(state: dict):
+    if state is None:
+        return settings.PLAYBACK_POLL_IDLE_INTERVAL
+    if not state['is_playing']:
+        return settings.PLAYBACK_POLL_PAUSED_INTERVAL
+
+    # Se consulta justo despues de que deberia terminar la canción, sin pasar del maximo para notar pausas o saltos.
+    remaining = (state['track']['duration_ms'] - state['progress_ms']) / 1000
+    return min(max(remaining + 0.5, settings.PLAYBACK_POLL_MIN_INTERVAL), settings.PLAYBACK_POLL_MAX_INTERVAL)
+
+
+playback_stream_service = PlaybackStreamService()
+registry.register_collector(playback_stream_service.collect_metrics)
+add_command_listener(playback_stream_service.poke)
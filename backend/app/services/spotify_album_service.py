@@ -1,16 +1,19 @@
-from app.clients.spotify_client import SpotifyClient
-from app.schemas.library import AlbumSaved, SavedAlbumsByUser, AlbumTracks
+from app.clients.spotify_client import spotify_client
+from app.services.artist_enrichment_service import artist_enrichment_service
+from app.core.config import settings
+from app.schemas.library import SavedAlbumsByUser, AlbumTracks
 #from app.schemas.spotify_album import Image, Artist, Album, Track, AlbumTracks
-from app.utils.parsers import parse_album, parse_artist, parse_tracks
+from app.utils.parsers import parse_album, parse_tracks_bulk, parse_saved_albums_bulk
 from fastapi import HTTPException
+import asyncio
 
 
 class AlbumService():
     def __init__(self):
-        self.spotifyclient = SpotifyClient()
+        self.spotifyclient = spotify_client
 
 
-    async def get_albums_saved_user(self, limit: int, offset: int, token: str):
+    async def get_albums_saved_user(self, limit: int, offset: int, token: str, enrich_artists: bool = False):
         try:
 
             data = await self.spotifyclient.get_albums_save_user(
@@ -22,19 +25,10 @@ class AlbumService():
             total = data['total']
             items = data['items']
             offset = data['offset']
-            all_albums = []
-
-            for item in items:
-                added_at = item['added_at']
-                album = item['album']
-                album_data = parse_album(album)
-
-                album_added = AlbumSaved(
-                    added_at=added_at,
-                    album=album_data
-                )
-                all_albums.append(album_added)
+            all_albums = parse_saved_albums_bulk(items)
 
+            if enrich_artists:
+                await artist_enrichment_service.enrich([album.album for album in all_albums], token=token)
 
             response = SavedAlbumsByUser(
                 AlbumsSaved=all_albums,
@@ -55,7 +49,48 @@ class AlbumService():
 
 
 
-    async def get_album(self, albumID: str, token: str):
+    # Modo "todas las paginas": la primera pagina se pide antes de empezar a responder para poder regresar
+    # errores de Spotify con su status, el resto se pide en paralelo y se va entregando conforme llega.
+    async def stream_albums_saved_user(self, token: str):
+        page_size = settings.LIBRARY_PAGE_SIZE
+        first_page = await self.spotifyclient.get_albums_save_user(limit=page_size, offset=0, token=token)
+        return self._iter_albums_saved_user(first_page=first_page, page_size=page_size, token=token)
+
+
+
+    async def _iter_albums_saved_user(self, first_page: dict, page_size: int, token: str):
+        for album in parse_saved_albums_bulk(first_page['items']):
+            yield album
+
+        offsets = iter(range(page_size, first_page['total'], page_size))
+        pending = set()
+
+        def schedule():
+            offset = next(offsets, None)
+            if offset is not None:
+                pending.add(asyncio.create_task(
+                    self.spotifyclient.get_albums_save_user(limit=page_size, offset=offset, token=token)
+                ))
+
+        try:
+            for _ in range(settings.LIBRARY_PAGE_CONCURRENCY):
+                schedule()
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    schedule()
+                    for album in parse_saved_albums_bulk(task.result()['items']):
+                        yield album
+
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+
+
+    async def get_album(self, albumID: str, token: str, enrich_artists: bool = False):
         try:
 
             data = await self.spotifyclient.get_album(
@@ -65,6 +100,9 @@ class AlbumService():
 
             album_data = parse_album(data)
 
+            if enrich_artists:
+                await artist_enrichment_service.enrich([album_data], token=token)
+
             return album_data
 
 
@@ -77,21 +115,39 @@ class AlbumService():
 
 
 
-    async def get_tracks_album(self, albumID: str, offset: int, limit: int, token: str):
+    # /albums/{id} ya trae la primera pagina de canciones y queda en el cache de catalogo, normalmente porque la
+    # vista del album ya lo pidio. El rango que cabe en esa pagina se responde de ahi; solo lo que falta se pide a
+    # /albums/{id}/tracks, en paginas alineadas (para reutilizar sus entradas del cache) y en paralelo.
+    async def get_tracks_album(self, albumID: str, offset: int, limit: int, token: str, enrich_artists: bool = False):
         try:
 
-            data = await self.spotifyclient.get_tracks_album(offset=offset, albumID=albumID, limit=limit, token=token)
-            limit = data['limit']
-            offset = data['offset']
-            total = data['total']
-            items = data['items']
-
-            tracks_list = []
-
-            for item in items:
-                track_info = parse_tracks(item)
-                tracks_list.append(track_info)
-
+            album = await self.spotifyclient.get_album(albumID=albumID, token=token)
+            embedded = album.get('tracks') or {}
+            items = embedded.get('items', [])
+            total = embedded.get('total', len(items))
+            end = min(offset + limit, total)
+
+            # Posición absoluta en el album -> canción, las paginas pedidas no siempre empiezan donde termina la embebida.
+            positions = dict(enumerate(items, start=embedded.get('offset', 0)))
+
+            if any(position not in positions for position in range(offset, end)):
+                page_size = settings.ALBUM_TRACKS_PAGE_SIZE
+                first = offset // page_size * page_size
+                page_offsets = [
+                    page_offset for page_offset in range(first, end, page_size)
+                    if any(position not in positions for position in range(max(page_offset, offset), min(page_offset + page_size, end)))
+                ]
+                pages = await asyncio.gather(*[
+                    self.spotifyclient.get_tracks_album(offset=page_offset, albumID=albumID, limit=page_size, token=token)
+                    for page_offset in page_offsets
+                ])
+                for page_offset, page in zip(page_offsets, pages):
+                    positions.update(enumerate(page['items'], start=page_offset))
+
+            tracks_list = parse_tracks_bulk([positions[position] for position in range(offset, end) if position in positions])
+
+            if enrich_artists:
+                await artist_enrichment_service.enrich(tracks_list, token=token)
             response = AlbumTracks(
                 limit=limit,
                 offset=offset,
@@ -105,4 +161,4 @@ class AlbumService():
             raise
 
         except Exception as e:
-            print(f"Ocurrio un error al tratar de obtener el album: {e}")
\ No newline at end of file
+            print(f"Ocurrio un error al tratar de obtener el album: {e}")
@@ -1,41 +1,155 @@
 from fastapi import HTTPException
-from app.clients.spotify_client import SpotifyClient
+from app.clients.spotify_client import spotify_client
+from app.core.config import settings
+from app.services.artist_enrichment_service import artist_enrichment_service
 from app.schemas.base.cursors  import Cursors
 from app.schemas.player import PlaybackState
-from app.schemas.player import TrackPlayed, TracksRecentlyPlayed
-from app.utils.parsers import parse_album, parse_tracks, parse_device
+from app.schemas.player import TracksRecentlyPlayed
+from app.utils.parsers import parse_album, parse_tracks, parse_device, parse_tracks_played_bulk
 #from app.schemas.spotify_player import Album, Artist, Cursors, Image, Track, TrackPlayed, TracksRecentlyPlayed, Device, PlaybackActions, PlaybackState
+import asyncio
+import hashlib
+import time
+
+
+# Colas de comandos por (usuario, dispositivo), compartidas por todas las instancias de PlayerService.
+_command_queues = {}
+# Se llaman con el token despues de mandar cada lote de comandos a Spotify (p. ej. para actualizar el stream del reproductor).
+_command_listeners = []
+
+
+def add_command_listener(listener):
+    _command_listeners.append(listener)
+
+
+# Junta un comando con los que siguen pendientes. Los saltos se suman en un solo conteo neto (next=+1,
+# previous=-1) y una pausa seguida de reanudar (o al reves) se cancela: la UI solo manda pausa cuando esta
+# sonando y play cuando esta en pausa, asi que el par deja el reproductor como estaba.
+def coalesce_command(pending: list, command: dict):
+    last = pending[-1] if pending else None
+    kind = command['command']
+
+    if kind in ('next', 'previous'):
+        step = 1 if kind == 'next' else -1
+        if last is not None and last['command'] == 'skip':
+            last['count'] += step
+            if last['count'] == 0:
+                pending.pop()
+        else:
+            pending.append({'command': 'skip', 'count': step})
+        return
+
+    resume = kind == 'play' and not any(command.get(option) is not None for option in ('context_uri', 'position', 'position_ms'))
+    if last is not None:
+        last_resume = last['command'] == 'play' and not any(last.get(option) is not None for option in ('context_uri', 'position', 'position_ms'))
+        if (kind == 'pause' and last_resume) or (resume and last['command'] == 'pause'):
+            pending.pop()
+            return
+        if (kind == 'pause' and last['command'] == 'pause') or (resume and last_resume):
+            return
+        # Pausa y luego reproducir algo en especifico es lo mismo que solo reproducirlo.
+        if kind == 'play' and last['command'] == 'pause':
+            pending.pop()
+    pending.append(command)
+
+
+class PlayerCommandQueue():
+    def __init__(self, service, key: tuple, device_id: str):
+        self.service = service
+        self.key = key
+        self.device_id = device_id
+        self.pending = []
+        self.token = None
+        self.first_at = None
+        self.last_at = None
+        self.task = None
+
+
+    def add(self, command: dict, token: str):
+        now = time.monotonic()
+        self.token = token
+        coalesce_command(self.pending, command)
+        if self.first_at is None:
+            self.first_at = now
+        self.last_at = now
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        return [dict(pending) for pending in self.pending]
+
+
+    async def _run(self):
+        while self.first_at is not None:
+            # Debounce: se espera a que dejen de llegar comandos, pero nunca mas de MAX_DELAY desde el primero.
+            while True:
+                wait = min(self.last_at + settings.PLAYER_COMMAND_DEBOUNCE, self.first_at + settings.PLAYER_COMMAND_MAX_DELAY) - time.monotonic()
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            batch, token = self.pending, self.token
+            self.pending, self.first_at = [], None
+            if not batch:
+                continue
+
+            await self._execute(batch, token)
+            for listener in _command_listeners:
+                listener(token)
+
+        if _command_queues.get(self.key) is self:
+            del _command_queues[self.key]
+
+
+    # Los comandos de un dispositivo se mandan uno por uno y en orden.
+    async def _execute(self, batch: list, token: str):
+        for command in batch:
+            try:
+                if command['command'] == 'skip':
+                    skip = self.service.skip_to_next if command['count'] > 0 else self.service.skip_to_previous
+                    for _ in range(abs(command['count'])):
+                        await skip(device_id=self.device_id, token=token)
+                elif command['command'] == 'pause':
+                    await self.service.pause_playback(device_id=self.device_id, token=token)
+                else:
+                    await self.service.play_resume_playback(
+                        device_id=self.device_id,
+                        context_uri=command.get('context_uri'),
+                        position=command.get('position'),
+                        position_ms=command.get('position_ms'),
+                        token=token
+                    )
+            except HTTPException as e:
+                print(f"Ocurrio un error al tratar de mandar el comando {command['command']} al dispositivo {self.device_id}: {e.detail}")
+            # El cliente ya recibio su 202; un error de red no debe terminar la cola ni tirar el resto del lote.
+            except Exception as e:
+                print(f"Ocurrio un error al tratar de mandar el comando {command['command']} al dispositivo {self.device_id}: {e}")
 
 class PlayerService():
     def __init__(self):
-        self.spotifyclient = SpotifyClient()
+        self.spotifyclient = spotify_client
 
 
-    async def get_recently_player(self, limit: int, before: str, after: str, token: str):
+    # Encola el comando y regresa de inmediato con lo que queda pendiente para ese dispositivo (respuesta optimista).
+    def enqueue_command(self, command: str, device_id: str, token: str, **options):
+        user = self.spotifyclient.known_user_id(token) or hashlib.sha256(token.encode()).hexdigest()
+        key = (user, device_id)
+        queue = _command_queues.get(key)
+        if queue is None:
+            queue = _command_queues[key] = PlayerCommandQueue(service=self, key=key, device_id=device_id)
+        return queue.add({'command': command, **options}, token=token)
+
+
+    async def get_recently_player(self, limit: int, before: str, after: str, token: str, enrich_artists: bool = False):
         try:
             data = await self.spotifyclient.get_recently_played(limit, after, before, token)
             limit = data['limit']
             cursors = data['cursors']
 
             items = data['items']
-            tracks_recently_response = []
-            for item in items:
-                played_at = item['played_at']
-                track_in_response = item['track']
-                album_track = track_in_response['album']
-
-                album_data = parse_album(album_track)
-
-                track_data = parse_tracks(track_in_response)
-                track_data.album = album_data
-
-                track_response = TrackPlayed(
-                    played_at=played_at,
-                    track=track_data
-                )
-
-                tracks_recently_response.append(track_response)
+            tracks_recently_response = parse_tracks_played_bulk(items)
 
+            if enrich_artists:
+                await artist_enrichment_service.enrich([played.track for played in tracks_recently_response], token=token)
             cursors_response = Cursors(
                 after=cursors['after'],
                 before=cursors['before']
@@ -60,8 +174,7 @@ class PlayerService():
 
     async def pause_playback(self, device_id: str, token: str):
         try:
-            data = await self.spotifyclient.pause_playback(device_id=device_id, token=token)
-            print(data)
+            await self.spotifyclient.pause_playback(device_id=device_id, token=token)
             return 200
 
 
@@ -74,14 +187,13 @@ class PlayerService():
 
     async def play_resume_playback(self, device_id: str, context_uri: str, position: int, position_ms: int, token: str):
         try:
-            data = await self.spotifyclient.start_resume_playback(
+            await self.spotifyclient.start_resume_playback(
                 device_id=device_id, 
                 context_uri=context_uri,
                 position=position, 
                 position_ms=position_ms,
                 token=token
             )
-            print(data)
             return 200
 
 
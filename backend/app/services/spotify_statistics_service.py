@@ -1,15 +1,23 @@
-from app.clients.spotify_client import SpotifyClient
-from app.utils.parsers import parse_user, parse_artist, parse_album, parse_tracks
+from app.clients.spotify_client import spotify_client
+from app.core.config import settings
+from app.services.artist_enrichment_service import artist_enrichment_service
+from app.utils.output_cache import output_cache
+from app.utils.parsers import parse_user, parse_artists_bulk, parse_tracks_bulk
 from app.schemas.base.cursors import Cursors
-from app.schemas.top import TopArtist, TopTracks
+from app.schemas.top import TopArtist, TopTracks, TopMovement
 from app.schemas.library import ArtistsFollowByUser
 
 #from app.schemas.spotify_statistics import UserInfo, TopArtist, Artist, Image, TopTracks, Album, Track, Cursors, ArtistsFollowByUser
 from fastapi import HTTPException
+import asyncio
+
+
+# Del mas largo al mas corto, cada rango se compara con el anterior.
+TIME_RANGES = ("long_term", "medium_term", "short_term")
 
 class SpotifyService():
     def __init__(self):
-        self.spotifyclient = SpotifyClient()
+        self.spotifyclient = spotify_client
         
 
 
@@ -32,8 +40,7 @@ class SpotifyService():
 
     async def get_top_artist(self,time_range: str, limit: int, offset: int, token: str):
         try:
-            range_valids = ["long_term", "medium_term", "short_term"]
-            if time_range not in range_valids:
+            if time_range not in TIME_RANGES:
                 raise HTTPException(status_code=400, detail="Por favor ingrese un rango de tiempo válido.")
 
             data = await self.spotifyclient.get_user_top_items(
@@ -44,12 +51,7 @@ class SpotifyService():
                 token=token
             )
 
-            artist_in_data = data.get('items', [])
-            artist_list = []
-
-            for artist in artist_in_data:
-                artist_data = parse_artist(artist)
-                artist_list.append(artist_data)
+            artist_list = parse_artists_bulk(data.get('items', []))
 
 
             limit_data = data.get('limit', limit)
@@ -71,10 +73,9 @@ class SpotifyService():
 
 
 
-    async def get_top_tracks(self,time_range: str, limit: int, offset: int, token: str):
+    async def get_top_tracks(self,time_range: str, limit: int, offset: int, token: str, enrich_artists: bool = False):
         try:
-            range_valids = ["long_term", "medium_term", "short_term"]
-            if time_range not in range_valids:
+            if time_range not in TIME_RANGES:
                 raise HTTPException(status_code=400, detail="Por favor ingrese un rango de tiempo válido.")
 
             data = await self.spotifyclient.get_user_top_items(
@@ -85,17 +86,11 @@ class SpotifyService():
                 token=token
             )
 
-            tracks_in_data = data.get('items', [])
-            tracks_list = []
-
-            for track in tracks_in_data:
-                album = track['album']
-                album_data = parse_album(album)
-                track_data = parse_tracks(track)
-                track_data.album = album_data
-
+            # Cada canción trae su album, se valida junto con ella.
+            tracks_list = parse_tracks_bulk(data.get('items', []))
 
-                tracks_list.append(track_data)
+            if enrich_artists:
+                await artist_enrichment_service.enrich(tracks_list, token=token)
 
 
             limit_data = data.get('limit', limit)
@@ -117,6 +112,54 @@ class SpotifyService():
 
 
 
+    # Todas las paginas de los 3 rangos: primero la primera pagina de cada rango en paralelo (trae el total) y
+    # despues el resto de las paginas de todos los rangos juntas. Cada pagina pasa por el cache por usuario.
+    async def get_all_top_items(self, type: str, token: str):
+        page_size = settings.TOP_ITEMS_PAGE_SIZE
+
+        async def page(time_range: str, offset: int):
+            return await self.spotifyclient.get_user_top_items(
+                type=type,
+                time_range=time_range,
+                limit=page_size,
+                offset=offset,
+                token=token
+            )
+
+        first_pages = await asyncio.gather(*[page(time_range, 0) for time_range in TIME_RANGES])
+
+        items = {}
+        totals = {}
+        pending = []
+        for time_range, data in zip(TIME_RANGES, first_pages):
+            items[time_range] = list(data.get('items', []))
+            totals[time_range] = data.get('total', 0)
+            pending += [(time_range, offset) for offset in range(page_size, totals[time_range], page_size)]
+
+        pages = await asyncio.gather(*[page(time_range, offset) for time_range, offset in pending])
+        for (time_range, _), data in zip(pending, pages):
+            items[time_range] += data.get('items', [])
+
+        return items, totals
+
+
+
+    async def get_top_movement(self, type: str, token: str):
+        try:
+            if type not in ("artists", "tracks"):
+                raise HTTPException(status_code=400, detail="Por favor ingrese un tipo válido (artists o tracks).")
+
+            items, totals = await self.get_all_top_items(type=type, token=token)
+            return rank_movement(type, items, totals)
+
+        except HTTPException:
+            raise
+
+        except Exception as e:
+            print(f"Ocurrio un error al tratar de obtener el cambio del top entre rangos: {e}")
+
+
+
     async def get_followed_artists(self, token: str, after: str = None, limit: int = 10):
         try:
             data = await self.spotifyclient.get_followed_artists(after=after, limit=limit, token=token)
@@ -126,11 +169,7 @@ class SpotifyService():
             items = artists.get('items')
             total = artists.get('total')
 
-            artist_list = []
-            for item in items:
-                artist_data = parse_artist(item)
-                artist_list.append(artist_data)
-
+            artist_list = parse_artists_bulk(items)
 
 
             response = ArtistsFollowByUser(
@@ -145,4 +184,68 @@ class SpotifyService():
         except HTTPException:
             raise
         except Exception as e:
-            print(f"Ocurrio un error al tratar de obtener los artistas seguidos por el usuario: {e}")
\ No newline at end of file
+            print(f"Ocurrio un error al tratar de obtener los artistas seguidos por el usuario: {e}")
+
+
+    async def invalidate_cache(self, token: str):
+        try:
+            user_id = await self.spotifyclient.resolve_user_id(token)
+            removed = self.spotifyclient.invalidate_user_cache(user_id)
+            removed += output_cache.invalidate_user(user_id=user_id, token=token)
+
+            return {"message": "Se limpio el cache del usuario.", "removed": removed}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Ocurrio un error al tratar de limpiar el cache del usuario: {e}")
+
+
+
+    def get_cache_stats(self):
+        return {
+            **self.spotifyclient.get_user_cache_stats(),
+            'catalog': self.spotifyclient.get_catalog_cache_stats(),
+            'output': output_cache.stats(),
+            'coalesced': self.spotifyclient.get_coalesced_stats()
+        }
+
+
+
+# Un solo recorrido por rango llena un indice id -> posiciones; con el indice se calculan los deltas y quien entro o
+# salio de cada rango sin buscar en listas. Los items quedan ordenados por el rango mas corto en el que aparecen.
+def rank_movement(type: str, items: dict, totals: dict):
+    index = {}
+    for time_range in TIME_RANGES:
+        for rank, item in enumerate(items[time_range], start=1):
+            entry = index.get(item['id'])
+            if entry is None:
+                entry = index[item['id']] = {
+                    'id': item['id'],
+                    'name': item['name'],
+                    'artists': [artist['name'] for artist in item.get('artists', [])] if type == "tracks" else [],
+                    'ranks': dict.fromkeys(TIME_RANGES)
+                }
+            # Si Spotify repite un item entre paginas se queda la mejor posición.
+            if entry['ranks'][time_range] is None:
+                entry['ranks'][time_range] = rank
+
+    changes = {time_range: {'entered': [], 'dropped': []} for time_range in TIME_RANGES[1:]}
+    for entry in index.values():
+        ranks = entry['ranks']
+        entry['delta'] = dict.fromkeys(TIME_RANGES[1:])
+        for previous, current in zip(TIME_RANGES, TIME_RANGES[1:]):
+            before, now = ranks[previous], ranks[current]
+            if before is not None and now is not None:
+                entry['delta'][current] = before - now
+            elif now is not None:
+                changes[current]['entered'].append(entry['id'])
+            elif before is not None:
+                changes[current]['dropped'].append(entry['id'])
+
+    missing = len(index) + 1
+    ordered = sorted(index.values(), key=lambda entry: [
+        entry['ranks'][time_range] or missing for time_range in reversed(TIME_RANGES)
+    ])
+
+    return TopMovement(type=type, items=ordered, totals=totals, changes=changes)
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import itertools
+import time
+
+
+# Cada vez que se guarda un valor recibe una versión nueva (global entre caches). Quien construye algo a
+# partir de entradas de cache (p. ej. la respuesta ya serializada) guarda las versiones que uso y despues
+# puede saber si alguna cambio, se borro o vencio.
+_versions = itertools.count(1)
+_dependencies = ContextVar("cache_dependencies", default=None)
+
+
+@contextmanager
+def track_dependencies():
+    dependencies = []
+    token = _dependencies.set(dependencies)
+    try:
+        yield dependencies
+    finally:
+        _dependencies.reset(token)
+
+
+def record_dependency(cache, key):
+    dependencies = _dependencies.get()
+    if dependencies is not None:
+        version = cache.version(key)
+        if version is not None:
+            dependencies.append((cache, key, version))
+
+
+def dependencies_valid(dependencies):
+    return all(cache.version(key) == version for cache, key, version in dependencies)
+
+
+# Cache LRU con vencimiento por entrada. Opcionalmente se limita por el tamaño total (en bytes) de lo guardado.
+class TTLCache:
+    def __init__(self, ttl: float, maxsize: int = 1024, max_bytes: int = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at, _, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+
+    # Regresa (valor, vigente) sin descartar entradas vencidas, útil para revalidar contra el origen.
+    def peek(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at, _, _ = entry
+        self._data.move_to_end(key)
+        return value, expires_at > time.monotonic()
+
+
+    def version(self, key):
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[3]
+
+
+    def set(self, key, value, ttl: float = None, size: int = 0):
+        if key in self._data:
+            self._remove(key)
+
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at, size, next(_versions))
+        self._bytes += size
+
+        while len(self._data) > self.maxsize or (self.max_bytes is not None and self._bytes > self.max_bytes and len(self._data) > 1):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+
+    # Extiende la vigencia sin cambiar la versión, para cuando el origen confirma que el valor no cambio.
+    def touch(self, key, ttl: float = None):
+        entry = self._data.get(key)
+        if entry is not None:
+            value, _, size, version = entry
+            self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl), size, version)
+            self._data.move_to_end(key)
+
+
+    def delete(self, key):
+        if key in self._data:
+            self._remove(key)
+
+
+    def delete_where(self, predicate):
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+    def _remove(self, key):
+        _, _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+
+    def __len__(self):
+        return len(self._data)
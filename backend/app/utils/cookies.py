@@ -6,6 +6,13 @@ def get_tokens_from_cookies(request: Request):
         request.cookies.get("refresh_token")
     )
 
+# AuthMiddleware deja los tokens ya resueltos en el scope, si la petición no paso por el middleware se leen de las cookies.
+def get_tokens(request: Request):
+    tokens = request.scope.get('auth_tokens')
+    if tokens is None:
+        return get_tokens_from_cookies(request)
+    return tokens
+
 def set_tokens_in_cookies(response: Response, tokens: dict):
     access_token = tokens.get('access_token')
     expires_in = tokens.get('expires_in')
@@ -0,0 +1,34 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# Mapa de identidad por respuesta: dentro de interning() cada canción, artista, album o imagen se construye una sola
+# vez por su ID de Spotify y las demas apariciones reutilizan el mismo objeto. Fuera de interning() la
+# validación funciona igual que siempre.
+_interned = ContextVar("interned", default=None)
+
+
+@contextmanager
+def interning():
+    if _interned.get() is not None:
+        yield
+        return
+
+    token = _interned.set({})
+    try:
+        yield
+    finally:
+        _interned.reset(token)
+
+
+def intern_model(cls, key, data, handler):
+    table = _interned.get()
+    if table is None or key is None:
+        return handler(data)
+
+    key = (cls, key)
+    model = table.get(key)
+    if model is None:
+        model = handler(data)
+        table[key] = model
+    return model
@@ -0,0 +1,179 @@
+from bisect import bisect_left
+import math
+
+
+# Métricas en memoria con salida en formato de texto de Prometheus. En el camino caliente solo se suma a una
+# lista por combinación de labels; el texto se arma hasta que alguien consulta /metrics.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: tuple, values: tuple, extra: str = None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.values = {} if labels else {(): 0}
+
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield f'{self.name}{_labels(self.label_names, labels)} {_number(value)}'
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+    def set(self, *labels, value: float):
+        self.values[labels] = value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        # Por labels: [conteo por bucket (sin acumular) + el de +Inf, suma]
+        self.values = {}
+
+
+    def observe(self, value: float, *labels):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+
+    def samples(self):
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                bucket = 'le="%s"' % _number(bound)
+                yield f'{self.name}_bucket{_labels(self.label_names, labels, bucket)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.label_names, labels)} {cumulative}'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+
+    def counter(self, name: str, help: str, labels: tuple = ()):
+        return self._add(Counter(name, help, labels))
+
+
+    def gauge(self, name: str, help: str, labels: tuple = ()):
+        return self._add(Gauge(name, help, labels))
+
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+
+    # Para valores que ya se cuentan en otro lado (stats de los caches): la función se llama solo al consultar
+    # /metrics y regresa tuplas (nombre, tipo, ayuda, [(labels como dict, valor)]).
+    def register_collector(self, collector):
+        self.collectors.append(collector)
+
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+
+        families = {}
+        for collector in self.collectors:
+            try:
+                for name, kind, help, samples in collector():
+                    family = families.setdefault(name, (kind, help, []))
+                    family[2].extend(samples)
+            except Exception as e:
+                print(f"Ocurrio un error al tratar de obtener las métricas: {e}")
+
+        for name, (kind, help, samples) in families.items():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+# Collector para los TTLCache, sus contadores ya existen y solo se leen al consultar /metrics. En lugar del cache
+# se puede pasar una función con las mismas llaves que TTLCache.stats(), para los que llevan sus propios contadores
+# (el catalogo se lee con peek, que no cuenta hits ni misses en el TTLCache).
+def cache_collector(caches: dict):
+    def collect():
+        stats = {name: cache() if callable(cache) else cache.stats() for name, cache in caches.items()}
+        yield 'cache_hits_total', 'counter', 'Lecturas encontradas en cache.', [({'cache': name}, s['hits']) for name, s in stats.items()]
+        yield 'cache_misses_total', 'counter', 'Lecturas que no estaban en cache o ya habian vencido.', [({'cache': name}, s['misses']) for name, s in stats.items()]
+        yield 'cache_evictions_total', 'counter', 'Entradas sacadas por limite de tamaño.', [({'cache': name}, s['evictions']) for name, s in stats.items()]
+        yield 'cache_entries', 'gauge', 'Entradas guardadas.', [({'cache': name}, s['entries']) for name, s in stats.items()]
+        yield 'cache_bytes', 'gauge', 'Tamaño aproximado de lo guardado.', [({'cache': name}, s['bytes']) for name, s in stats.items()]
+    return collect
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Duración de las peticiones a la API por ruta.', labels=('method', 'route', 'status')
+)
+http_requests_in_flight = registry.gauge('http_requests_in_flight', 'Peticiones a la API en curso.')
+
+spotify_request_duration = registry.histogram(
+    'spotify_request_duration_seconds', 'Duración de cada llamada a la API de Spotify por endpoint y status.',
+    labels=('method', 'endpoint', 'status')
+)
+spotify_requests_in_flight = registry.gauge('spotify_requests_in_flight', 'Llamadas a la API de Spotify en curso.')
+spotify_rate_limit_wait = registry.histogram(
+    'spotify_rate_limit_wait_seconds', 'Tiempo esperando turno en el limitador antes de llamar a Spotify.', labels=('endpoint',)
+)
+spotify_retries = registry.counter(
+    'spotify_retries_total', 'Reintentos de llamadas a Spotify por endpoint y status que los causo.', labels=('endpoint', 'status')
+)
+
+auth_token_refreshes = registry.counter(
+    'auth_token_refreshes_total', 'Refresh de access tokens hechos por AuthMiddleware.', labels=('result',)
+)
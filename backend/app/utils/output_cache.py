@@ -0,0 +1,137 @@
+from app.clients.spotify_client import spotify_client
+from app.core.config import settings
+from app.utils.cache import TTLCache, track_dependencies, dependencies_valid
+from app.utils.cookies import get_tokens
+from app.utils.metrics import registry, cache_collector
+from app.utils.responses import conditional_response, etag_for
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+import functools
+import hashlib
+import orjson
+
+
+# Guarda los bytes finales de las respuestas JSON por usuario + ruta + query params. En un hit no se vuelve a
+# pasar por los parsers ni por pydantic. Cada entrada recuerda las versiones de las entradas de cache de Spotify
+# que se usaron para construirla, si alguna cambio, se invalido o vencio, la respuesta se vuelve a generar.
+class OutputCache():
+    def __init__(self):
+        self.cache = TTLCache(
+            ttl=settings.CATALOG_CACHE_TTL,
+            maxsize=settings.OUTPUT_CACHE_MAX_ENTRIES,
+            max_bytes=settings.OUTPUT_CACHE_MAX_BYTES
+        )
+        self.invalidated = 0
+
+
+    def key(self, request):
+        access_token,_ =get_tokens(request)
+        if not access_token:
+            return None
+
+        # Si ya se conoce el userID se comparte la entrada entre tokens del mismo usuario.
+        user = spotify_client.known_user_id(access_token) or hashlib.sha256(access_token.encode()).hexdigest()
+        return (user, request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+
+        body, etag, dependencies = entry
+        if not dependencies_valid(dependencies):
+            self.cache.delete(key)
+            self.invalidated += 1
+            return None
+        return body, etag
+
+
+    # Las entradas de un usuario pueden estar bajo su userID o bajo el hash del token (si aun no se conocia).
+    def invalidate_user(self, user_id: str, token: str):
+        owners = {user_id, hashlib.sha256(token.encode()).hexdigest()}
+        return self.cache.delete_where(lambda key: key[0] in owners)
+
+
+    def set(self, key, body: bytes, dependencies: list, ttl: float):
+        etag = etag_for(body)
+        self.cache.set(key, (body, etag, dependencies), ttl=ttl, size=len(body))
+        return etag
+
+
+    def encode(self, result):
+        if isinstance(result, StreamingResponse):
+            return None
+        if isinstance(result, Response):
+            if result.status_code != 200 or result.media_type != "application/json":
+                return None
+            return result.body
+        if isinstance(result, BaseModel):
+            return result.model_dump_json().encode()
+        return orjson.dumps(result, default=to_jsonable_python)
+
+
+    def stats(self):
+        return {**self.cache.stats(), 'invalidated': self.invalidated}
+
+
+    def collect_metrics(self):
+        yield from cache_collector({'output': self.cache})()
+        yield 'output_cache_invalidated_total', 'counter', 'Respuestas descartadas porque cambio alguna entrada de la que dependian.', [({}, self.invalidated)]
+
+
+output_cache = OutputCache()
+registry.register_collector(output_cache.collect_metrics)
+
+
+# Decorador para las rutas GET de app/routers. La ruta debe recibir request: Request. Las respuestas llevan ETag
+# (se calcula una vez al guardar) y el Cache-Control de la ruta; si el cliente ya tiene esa versión se responde 304.
+def cached_response(ttl: float, cache_control: str = None):
+    def decorator(route):
+        @functools.wraps(route)
+        async def wrapper(*args, **kwargs):
+            request = kwargs.get('request')
+            key = output_cache.key(request) if settings.OUTPUT_CACHE_ENABLED and request is not None else None
+            if key is None:
+                return with_etag(request, await route(*args, **kwargs), cache_control=cache_control)
+
+            cached = output_cache.get(key)
+            if cached is not None:
+                body, etag = cached
+                return conditional_response(request, body=body, etag=etag, cache_control=cache_control)
+
+            with track_dependencies() as dependencies:
+                result = await route(*args, **kwargs)
+
+            if result is None:
+                return result
+            body = output_cache.encode(result)
+            if body is None:
+                return result
+
+            etag = output_cache.set(key, body=body, dependencies=dependencies, ttl=ttl)
+            return conditional_response(request, body=body, etag=etag, cache_control=cache_control)
+        return wrapper
+    return decorator
+
+
+# Para rutas cuyo resultado no conviene guardar (cambia con cada acción del usuario): se serializa y se calcula el
+# ETag en cada petición, pero si el cliente ya tiene esa versión no se manda el body.
+def etag_response(cache_control: str):
+    def decorator(route):
+        @functools.wraps(route)
+        async def wrapper(*args, **kwargs):
+            return with_etag(kwargs.get('request'), await route(*args, **kwargs), cache_control=cache_control)
+        return wrapper
+    return decorator
+
+
+def with_etag(request, result, cache_control: str = None):
+    if request is None or result is None:
+        return result
+    body = output_cache.encode(result)
+    if body is None:
+        return result
+    return conditional_response(request, body=body, etag=etag_for(body), cache_control=cache_control)
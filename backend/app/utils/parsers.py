@@ -4,6 +4,11 @@ from app.schemas.base.album import Album
 from app.schemas.base.track import Track
 from app.schemas.base.user import User
 from app.schemas.base.device import Device
+from app.schemas.library import AlbumSaved
+from app.schemas.player import TrackPlayed
+from app.utils.interning import interning
+from pydantic import TypeAdapter
+from typing import List
 
 
 def parse_artist(artist):
@@ -122,4 +127,35 @@ def parse_device(device):
         )
         return device_response
     except Exception as e:
-        print(f"Ocurrio un error al tratar de obtener la información dl dispositivo: {e}")
\ No newline at end of file
+        print(f"Ocurrio un error al tratar de obtener la información dl dispositivo: {e}")
+
+
+# Validación en bloque de listas completas de items de Spotify. Los esquemas base tienen validation_alias
+# con los nombres de Spotify, asi que pydantic arma todo el arbol (canciones, albumes, artistas, imagenes)
+# en una sola llamada sin copiar campo por campo en Python.
+artists_adapter = TypeAdapter(List[Artist])
+tracks_adapter = TypeAdapter(List[Track])
+saved_albums_adapter = TypeAdapter(List[AlbumSaved])
+tracks_played_adapter = TypeAdapter(List[TrackPlayed])
+
+
+# Cada lista se valida dentro de interning(): las canciones, artistas, albumes e imagenes repetidos (las canciones de un
+# mismo album, una canción que se repite en recently-played) se construyen una sola vez.
+def parse_artists_bulk(items):
+    with interning():
+        return artists_adapter.validate_python(items)
+
+
+def parse_tracks_bulk(items):
+    with interning():
+        return tracks_adapter.validate_python(items)
+
+
+def parse_saved_albums_bulk(items):
+    with interning():
+        return saved_albums_adapter.validate_python(items)
+
+
+def parse_tracks_played_bulk(items):
+    with interning():
+        return tracks_played_adapter.validate_python(items)
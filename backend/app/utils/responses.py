@@ -0,0 +1,37 @@
+from fastapi import Response
+import hashlib
+
+
+# FastAPI vuelve a validar contra el response_model todo lo que regresa una ruta (model_dump + validación +
+# serialización). Si el modelo ya se construyo validado en el servicio, regresar la respuesta ya serializada
+# se salta esa segunda pasada; el response_model se deja en la ruta solo para la documentación.
+def model_response(model, status_code: int = 200):
+    if model is None:
+        return None
+    return Response(content=model.model_dump_json(), media_type="application/json", status_code=status_code)
+
+
+# ETag fuerte a partir de un hash barato del body ya serializado.
+def etag_for(body: bytes):
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(request, etag: str):
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # If-None-Match usa comparación débil: W/"x" coincide con "x".
+    return any(tag.strip().removeprefix('W/') == etag for tag in header.split(','))
+
+
+# Regresa 304 sin body si el cliente ya tiene esta versión, si no el JSON con su ETag.
+def conditional_response(request, body: bytes, etag: str, cache_control: str = None):
+    headers = {'ETag': etag}
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
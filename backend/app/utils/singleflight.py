@@ -0,0 +1,33 @@
+import asyncio
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self.coalesced = 0
+
+
+    # Las llamadas concurrentes con la misma llave comparten una sola tarea. Si quien espera se cancela,
+    # la tarea compartida sigue corriendo para los demás gracias a asyncio.shield.
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Evita el aviso de "exception was never retrieved" cuando todos los que esperaban se cancelaron.
+        if not task.cancelled():
+            task.exception()
+
+
+    def in_flight(self):
+        return len(self._calls)
@@ -0,0 +1,7 @@
+import os
+
+# Los benchmarks importan app.*, que necesita estas variables aunque no se hable con Spotify.
+os.environ.setdefault("JWT_KEY", "benchmark")
+os.environ.setdefault("SPOTIFY_CLIENT_ID", "benchmark")
+os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "benchmark")
+os.environ.setdefault("SPOTIFY_REDIRECT_URI", "http://localhost:8000/api/auth/callback")
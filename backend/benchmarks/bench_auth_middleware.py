@@ -0,0 +1,124 @@
+# Costo por petición de la capa de autenticación: el AuthMiddleware anterior (BaseHTTPMiddleware) contra el
+# middleware ASGI actual, sobre una app minima para que solo se mida el middleware. Tambien compara una
+# respuesta con streaming de 200 partes, que BaseHTTPMiddleware vuelve a envolver en otro stream.
+#
+#   cd backend && python -m benchmarks.bench_auth_middleware
+import benchmarks  # noqa: F401
+from app.middlewares.auth_middleware import AuthMiddleware
+from app.utils.cookies import get_tokens, get_tokens_from_cookies, set_tokens_in_cookies
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+import asyncio
+import httpx
+import time
+
+
+# Copia del AuthMiddleware anterior, solo para comparar.
+class LegacyAuthMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, auth_service):
+        super().__init__(app)
+        self.auth_service = auth_service
+
+
+    async def dispatch(self, request: Request, call_next):
+        try:
+            access_token, refresh_token = get_tokens_from_cookies(request)
+
+            if not access_token:
+                if refresh_token:
+                    tokens = await self.auth_service.refresh_token(refresh_token=refresh_token)
+                    response = await call_next(request)
+                    set_tokens_in_cookies(response=response, tokens=tokens)
+                    return response
+                else:
+                    raise HTTPException(status_code=403, detail="Por favor vuelve a iniciar sesión.")
+
+            response = await call_next(request)
+            return response
+
+        except HTTPException:
+            raise
+        except Exception:
+            print("Ocurrio un error tratando de validar la autenticación del usuario.")
+
+
+# Refresh sin red, como si el token ya estuviera en el cache de tokens refrescados.
+class StubAuthService:
+    async def refresh_token(self, refresh_token: str):
+        return {'access_token': 'refreshed', 'expires_in': 3600}
+
+
+def build_app(middleware: str = None):
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping(request: Request):
+        access_token, _ = get_tokens(request)
+        return {'token': access_token}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for index in range(200):
+                yield b'{"n": %d}\n' % index
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    if middleware == "legacy":
+        app.add_middleware(LegacyAuthMiddleware, auth_service=StubAuthService())
+    elif middleware == "asgi":
+        app.add_middleware(AuthMiddleware)
+    return app
+
+
+def stub_auth(app):
+    # El AuthService real necesita Spotify para refrescar, se cambia por el stub en la instancia ya construida.
+    layer = app.middleware_stack
+    while layer is not None and not isinstance(layer, AuthMiddleware):
+        layer = getattr(layer, 'app', None)
+    if layer is not None:
+        layer.auth_service = StubAuthService()
+
+
+async def measure(app, path: str, cookies: str, number: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {'Cookie': cookies}
+        for _ in range(50):
+            await client.get(path, headers=headers)
+
+        best = None
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(number):
+                response = await client.get(path, headers=headers)
+            elapsed = (time.perf_counter() - start) / number
+            best = elapsed if best is None else min(best, elapsed)
+        assert response.status_code == 200, response.text
+        return best * 1e6
+
+
+async def main():
+    apps = {name: build_app(name) for name in ("none", "legacy", "asgi")}
+    for app in apps.values():
+        app.middleware_stack = app.build_middleware_stack()
+        stub_auth(app)
+
+    cases = [
+        ("cookie con access_token", "/ping", "access_token=abc; refresh_token=def", 2000),
+        ("refresh (solo refresh_token)", "/ping", "refresh_token=def", 2000),
+        ("streaming 200 partes", "/stream", "access_token=abc", 300)
+    ]
+
+    for label, path, cookies, number in cases:
+        baseline = await measure(apps["none"], path, cookies, number)
+        legacy = await measure(apps["legacy"], path, cookies, number)
+        asgi = await measure(apps["asgi"], path, cookies, number)
+        print(label)
+        print(f"  {'sin middleware':<28}{baseline:9.1f} us/petición")
+        print(f"  {'BaseHTTPMiddleware':<28}{legacy:9.1f} us/petición  ({legacy - baseline:+.1f} us)")
+        print(f"  {'ASGI':<28}{asgi:9.1f} us/petición  ({asgi - baseline:+.1f} us)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
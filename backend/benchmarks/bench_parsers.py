@@ -0,0 +1,76 @@
+# Compara el camino anterior (parse_* objeto por objeto + segunda validación de FastAPI con response_model)
+# contra la validación en bloque con TypeAdapter y la respuesta ya serializada.
+#
+#   cd backend && python -m benchmarks.bench_parsers
+import benchmarks  # noqa: F401
+from benchmarks import payloads
+from app.schemas.top import TopTracks
+from app.utils.parsers import parse_album, parse_tracks, parse_tracks_bulk, parse_tracks_played_bulk, tracks_played_adapter
+import timeit
+import tracemalloc
+
+
+def legacy_page(data):
+    tracks = []
+    for item in data['items']:
+        track = parse_tracks(item)
+        track.album = parse_album(item['album'])
+        tracks.append(track)
+    model = TopTracks(tracks=tracks, limit=data['limit'], offset=data['offset'], total=data['total'])
+    # Lo que hace FastAPI con response_model: model_dump, validar de nuevo y serializar.
+    return TopTracks.model_validate(model.model_dump()).model_dump_json()
+
+
+def bulk_page(data):
+    model = TopTracks(tracks=parse_tracks_bulk(data['items']), limit=data['limit'], offset=data['offset'], total=data['total'])
+    return model.model_dump_json()
+
+
+def distinct_objects(plays):
+    tracks = {id(play.track) for play in plays}
+    albums = {id(play.track.album) for play in plays}
+    artists = {id(artist) for play in plays for artist in play.track.artists + play.track.album.artist}
+    return len(tracks), len(albums), len(artists)
+
+
+def peak_memory(function, data):
+    tracemalloc.start()
+    result = function(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak / 1024
+
+
+def measure(function, data, number: int):
+    best = min(timeit.repeat(lambda: function(data), number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main():
+    data = payloads.top_tracks(limit=50)
+    assert legacy_page(data) == bulk_page(data), "Los dos caminos deben generar el mismo JSON"
+
+    legacy = measure(legacy_page, data, number=200)
+    bulk = measure(bulk_page, data, number=200)
+    print("Pagina de 50 canciones (top tracks con album y artistas)")
+    print(f"  {'parse_* + response_model':<30}{legacy:9.1f} us/pagina")
+    print(f"  {'TypeAdapter + model_response':<30}{bulk:9.1f} us/pagina")
+    print(f"  {'mejora':<30}{legacy / bulk:9.2f}x")
+
+    # Sin interning(), validar con el adapter directo construye un objeto por cada aparición.
+    played = payloads.recently_played(limit=50)
+    items = played['items']
+    plain = tracks_played_adapter.validate_python(items)
+    interned = parse_tracks_played_bulk(items)
+    assert [play.model_dump() for play in plain] == [play.model_dump() for play in interned]
+
+    print("\nRecently played (50 reproducciones de 15 canciones distintas)")
+    print(f"  {'objetos sin interning':<30}{'canciones=%d albumes=%d artistas=%d' % distinct_objects(plain)}")
+    print(f"  {'objetos con interning':<30}{'canciones=%d albumes=%d artistas=%d' % distinct_objects(interned)}")
+    print(f"  {'sin interning':<30}{measure(tracks_played_adapter.validate_python, items, number=200):9.1f} us  {peak_memory(tracks_played_adapter.validate_python, items):7.1f} KiB pico")
+    print(f"  {'con interning':<30}{measure(parse_tracks_played_bulk, items, number=200):9.1f} us  {peak_memory(parse_tracks_played_bulk, items):7.1f} KiB pico")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# Servidor local que imita la API de Spotify (api.spotify.com/v1 y accounts.spotify.com/api/token) para pruebas
+# de carga. Las respuestas salen de benchmarks.payloads y cada petición puede tardar segun una distribución de
+# latencia y fallar con 429 o 5xx con cierta probabilidad.
+#
+#   cd backend && python -m benchmarks.fake_spotify --port 9100 --latency lognormal:80,0.5 --rate-429 0.01 --rate-5xx 0.005
+#
+# y la app apuntando a el:
+#
+#   SPOTIFY_API_BASE_URL=http://127.0.0.1:9100/v1 SPOTIFY_ACCOUNTS_BASE_URL=http://127.0.0.1:9100 uvicorn app.main:app
+#
+# GET /__stats regresa las llamadas recibidas por endpoint y POST /__reset las reinicia.
+import benchmarks  # noqa: F401
+from benchmarks import payloads
+from fastapi import FastAPI, Request, Response
+from collections import Counter
+import argparse
+import asyncio
+import functools
+import hashlib
+import math
+import orjson
+import random
+import re
+import uvicorn
+
+
+# Distribución de latencia en milisegundos: none, fixed:MS, uniform:MIN,MAX o lognormal:MEDIANA,SIGMA.
+class Latency:
+    def __init__(self, spec: str = "none"):
+        self.spec = spec
+        kind, _, values = spec.partition(":")
+        self.kind = kind
+        self.values = [float(value) for value in values.split(",")] if values else []
+        if kind not in ("none", "fixed", "uniform", "lognormal"):
+            raise ValueError(f"Distribución de latencia desconocida: {spec}")
+
+
+    def sample(self):
+        if self.kind == "fixed":
+            return self.values[0] / 1000
+        if self.kind == "uniform":
+            return random.uniform(self.values[0], self.values[1]) / 1000
+        if self.kind == "lognormal":
+            return random.lognormvariate(math.log(self.values[0]), self.values[1]) / 1000
+        return 0.0
+
+
+class FakeConfig:
+    def __init__(self):
+        self.latency = Latency()
+        self.latency_by_endpoint = {}
+        self.rate_429 = 0.0
+        self.rate_5xx = 0.0
+        self.retry_after = 1
+        self.library_size = 1000
+        self.album_tracks = 20
+
+
+config = FakeConfig()
+calls = Counter()
+statuses = Counter()
+app = FastAPI(title="Fake Spotify", docs_url=None, redoc_url=None, openapi_url=None)
+
+ENDPOINTS = [
+    ("GET", re.compile(r"^/v1/me$"), "me"),
+    ("GET", re.compile(r"^/v1/me/top/\w+$"), "top"),
+    ("GET", re.compile(r"^/v1/me/following$"), "following"),
+    ("GET", re.compile(r"^/v1/me/albums$"), "saved_albums"),
+    ("GET", re.compile(r"^/v1/albums/[^/]+/tracks$"), "album_tracks"),
+    ("GET", re.compile(r"^/v1/albums/[^/]+$"), "album"),
+    ("GET", re.compile(r"^/v1/artists$"), "artists"),
+    ("GET", re.compile(r"^/v1/me/player/recently-played$"), "recently_played"),
+    ("GET", re.compile(r"^/v1/me/player$"), "playback_state"),
+    ("PUT", re.compile(r"^/v1/me/player/(pause|play)$"), "player_command"),
+    ("POST", re.compile(r"^/v1/me/player/(next|previous)$"), "player_command"),
+    ("POST", re.compile(r"^/api/token$"), "token")
+]
+
+
+def endpoint_name(method: str, path: str):
+    for endpoint_method, pattern, name in ENDPOINTS:
+        if method == endpoint_method and pattern.match(path):
+            return name
+    return None
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    name = endpoint_name(request.method, request.url.path)
+    if name is None:
+        return await call_next(request)
+
+    calls[name] += 1
+    delay = config.latency_by_endpoint.get(name, config.latency).sample()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+    roll = random.random()
+    if roll < config.rate_429:
+        response = Response(status_code=429, headers={'Retry-After': str(config.retry_after)})
+    elif roll < config.rate_429 + config.rate_5xx:
+        response = Response(status_code=random.choice((500, 502, 503)))
+    else:
+        response = await call_next(request)
+
+    statuses[f"{name}:{response.status_code}"] += 1
+    return response
+
+
+def json_response(body: bytes, headers: dict = None):
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def user_id(request: Request):
+    token = request.headers.get('authorization', '').removeprefix('Bearer ')
+    return "user" + hashlib.sha1(token.encode()).hexdigest()[:10]
+
+
+# Los payloads se generan una vez por combinación de parametros para que el servidor falso no sea el cuello de botella.
+@functools.lru_cache(maxsize=4096)
+def encoded(kind: str, *args):
+    if kind == "top_tracks":
+        return orjson.dumps(payloads.top_tracks(limit=args[0], offset=args[1], total=200))
+    if kind == "top_artists":
+        return orjson.dumps(payloads.top_artists(limit=args[0], offset=args[1], total=200))
+    if kind == "saved_albums":
+        return orjson.dumps(payloads.saved_albums(limit=args[0], offset=args[1], total=config.library_size))
+    if kind == "album":
+        return orjson.dumps(payloads.full_album(args[0], total_tracks=config.album_tracks))
+    if kind == "album_tracks":
+        return orjson.dumps(payloads.album_tracks(args[0], limit=args[1], offset=args[2], total=config.album_tracks))
+    if kind == "recently_played":
+        return orjson.dumps(payloads.recently_played(limit=args[0]))
+    if kind == "playback_state":
+        return orjson.dumps(payloads.playback_state())
+    if kind == "following":
+        return orjson.dumps({'artists': {
+            'href': 'https://api.spotify.com/v1/me/following', 'limit': args[0], 'next': None, 'total': args[0],
+            'cursors': {'after': None}, 'items': [payloads.full_artist(index) for index in range(args[0])]
+        }})
+    if kind == "artists":
+        return orjson.dumps({'artists': [payloads.full_artist(int(artist_id)) for artist_id in args[0].split(',')]})
+    raise KeyError(kind)
+
+
+def page(request: Request, default_limit: int = 20):
+    return int(request.query_params.get('limit', default_limit)), int(request.query_params.get('offset', 0))
+
+
+def seed(spotify_id: str):
+    return int(spotify_id) if spotify_id.isdigit() else int(hashlib.sha1(spotify_id.encode()).hexdigest()[:6], 16)
+
+
+@app.get("/v1/me")
+async def me(request: Request):
+    user = payloads.user()
+    user['id'] = user_id(request)
+    return json_response(orjson.dumps(user))
+
+
+@app.get("/v1/me/top/{type}")
+async def top(request: Request, type: str):
+    limit, offset = page(request)
+    return json_response(encoded("top_tracks" if type == "tracks" else "top_artists", limit, offset))
+
+
+@app.get("/v1/me/following")
+async def following(request: Request):
+    return json_response(encoded("following", int(request.query_params.get('limit', 20))))
+
+
+@app.get("/v1/me/albums")
+async def saved_albums(request: Request):
+    limit, offset = page(request)
+    return json_response(encoded("saved_albums", limit, offset))
+
+
+@app.get("/v1/albums/{album_id}")
+async def album(request: Request, album_id: str):
+    etag = f'"{album_id}-v1"'
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers={'ETag': etag})
+    return json_response(encoded("album", seed(album_id)), headers={'ETag': etag})
+
+
+@app.get("/v1/albums/{album_id}/tracks")
+async def album_tracks(request: Request, album_id: str):
+    limit, offset = page(request)
+    return json_response(encoded("album_tracks", seed(album_id), limit, offset))
+
+
+@app.get("/v1/artists")
+async def artists(request: Request):
+    return json_response(encoded("artists", request.query_params.get('ids', '')))
+
+
+@app.get("/v1/me/player/recently-played")
+async def recently_played(request: Request):
+    return json_response(encoded("recently_played", int(request.query_params.get('limit', 20))))
+
+
+@app.get("/v1/me/player")
+async def playback_state():
+    return json_response(encoded("playback_state"))
+
+
+@app.put("/v1/me/player/{command}")
+@app.post("/v1/me/player/{command}")
+async def player_command(command: str):
+    return Response(status_code=204)
+
+
+@app.post("/api/token")
+async def token():
+    return json_response(orjson.dumps({
+        'access_token': 'fake-' + hashlib.sha1(str(random.random()).encode()).hexdigest(),
+        'token_type': 'Bearer',
+        'expires_in': 3600,
+        'scope': 'user-read-private user-top-read user-library-read user-read-recently-played user-read-playback-state'
+    }))
+
+
+@app.get("/__stats")
+async def stats():
+    return {'calls': dict(calls), 'total': sum(calls.values()), 'statuses': dict(statuses)}
+
+
+@app.post("/__reset")
+async def reset():
+    calls.clear()
+    statuses.clear()
+    return {'reset': True}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API de Spotify falsa para pruebas de carga.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", default="lognormal:80,0.5", help="none, fixed:MS, uniform:MIN,MAX o lognormal:MEDIANA,SIGMA")
+    parser.add_argument("--latency-for", action="append", default=[], metavar="ENDPOINT=DISTRIBUCION",
+                        help="Latencia para un endpoint en particular, p. ej. saved_albums=fixed:250")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probabilidad de responder 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Probabilidad de responder 500/502/503")
+    parser.add_argument("--retry-after", type=int, default=1, help="Segundos en el Retry-After de los 429")
+    parser.add_argument("--library-size", type=int, default=1000, help="Albumes guardados por usuario")
+    args = parser.parse_args()
+
+    config.latency = Latency(args.latency)
+    for override in args.latency_for:
+        name, _, spec = override.partition("=")
+        config.latency_by_endpoint[name] = Latency(spec)
+    config.rate_429 = args.rate_429
+    config.rate_5xx = args.rate_5xx
+    config.retry_after = args.retry_after
+    config.library_size = args.library_size
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
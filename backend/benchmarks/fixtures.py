@@ -0,0 +1,89 @@
+# Payloads para el suite de benchmarks. Si existe benchmarks/fixtures/<nombre>.json se usa esa respuesta
+# grabada de Spotify, si no se genera una equivalente con benchmarks.payloads.
+#
+# Para grabar respuestas reales de una cuenta (el token necesita user-top-read, user-library-read,
+# user-read-recently-played y user-read-playback-state):
+#
+#   cd backend && SPOTIFY_ACCESS_TOKEN=... python -m benchmarks.fixtures
+import benchmarks  # noqa: F401
+from benchmarks import payloads
+import httpx
+import json
+import os
+import pathlib
+
+
+FIXTURES_DIR = pathlib.Path(__file__).parent / "fixtures"
+
+
+# La biblioteca se guarda completa ({total, items}) y el cliente stub la regresa en paginas.
+def _library(total: int = 1000):
+    items = []
+    for offset in range(0, total, 50):
+        items.extend(payloads.saved_albums(limit=50, offset=offset, total=total)['items'])
+    return {'total': total, 'items': items}
+
+
+BUILDERS = {
+    'user': payloads.user,
+    'top_tracks': lambda: payloads.top_tracks(limit=50),
+    'top_artists': lambda: payloads.top_artists(limit=50),
+    'library': _library,
+    'full_album': lambda: payloads.full_album(7, total_tracks=20),
+    'recently_played': lambda: payloads.recently_played(limit=50),
+    'playback_state': payloads.playback_state
+}
+
+
+def load(name: str):
+    path = FIXTURES_DIR / f"{name}.json"
+    if path.exists():
+        return json.loads(path.read_text())
+    return BUILDERS[name]()
+
+
+def source(name: str):
+    return "grabado" if (FIXTURES_DIR / f"{name}.json").exists() else "generado"
+
+
+def record(token: str, library_size: int = 1000):
+    headers = {'Authorization': f'Bearer {token}'}
+    with httpx.Client(base_url="https://api.spotify.com/v1", headers=headers, timeout=30) as client:
+        def get(path, **params):
+            response = client.get(path, params=params)
+            response.raise_for_status()
+            return response.json()
+
+        recorded = {
+            'user': get('/me'),
+            'top_tracks': get('/me/top/tracks', limit=50),
+            'top_artists': get('/me/top/artists', limit=50),
+            'recently_played': get('/me/player/recently-played', limit=50)
+        }
+
+        library = {'total': 0, 'items': []}
+        offset = 0
+        while offset < library_size:
+            page = get('/me/albums', limit=50, offset=offset)
+            library['items'].extend(page['items'])
+            offset += 50
+            if offset >= page['total']:
+                break
+        library['total'] = len(library['items'])
+        recorded['library'] = library
+
+        if library['items']:
+            recorded['full_album'] = get(f"/albums/{library['items'][0]['album']['id']}")
+
+        response = client.get('/me/player')
+        if response.status_code == 200:
+            recorded['playback_state'] = response.json()
+
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    for name, data in recorded.items():
+        (FIXTURES_DIR / f"{name}.json").write_text(json.dumps(data))
+        print(f"  {name:<20}{FIXTURES_DIR / f'{name}.json'}")
+
+
+if __name__ == "__main__":
+    record(os.environ["SPOTIFY_ACCESS_TOKEN"])
@@ -0,0 +1,277 @@
+# Prueba de carga de punta a punta: levanta benchmarks.fake_spotify y la app con uvicorn apuntando a el, y
+# para cada endpoint manda peticiones con la concurrencia indicada. Reporta peticiones por segundo, percentiles
+# de latencia, llamadas que llegaron a Spotify (falso) y CPU/memoria de los workers de la app.
+#
+#   cd backend && python -m benchmarks.load_test --concurrency 50 --requests 2000 --users 20
+#   cd backend && python -m benchmarks.load_test --endpoints top_tracks,dashboard --latency uniform:50,300 --rate-429 0.02
+#
+# La CPU y memoria se leen de /proc, asi que solo se reportan en Linux.
+import benchmarks  # noqa: F401
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import httpx
+import json
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import time
+
+
+BACKEND_DIR = pathlib.Path(__file__).parent.parent
+ALBUM_ID = "0000000000000000000007"
+
+ENDPOINTS = {
+    'me': "/api/spotify/me",
+    'top_tracks': "/api/spotify/top-tracks-user?limit=50",
+    'top_artists': "/api/spotify/top-artist-user?limit=50",
+    'followed_artists': "/api/spotify/artist-follow-user?limit=20",
+    'saved_albums': "/api/album/saved_by_user?limit=50",
+    'album': f"/api/album/{ALBUM_ID}",
+    'album_tracks': f"/api/album/{ALBUM_ID}/tracks?limit=50",
+    'recently_played': "/api/player/recently_played?limit=50",
+    'playback_state': "/api/player/playback_state",
+    'dashboard': "/api/dashboard"
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"El proceso para {url} termino con código {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} no respondio en {timeout} segundos")
+
+
+# El proceso de uvicorn y, si se usa --workers, sus hijos.
+def process_tree(pid: int):
+    pids = [pid]
+    try:
+        children = pathlib.Path(f"/proc/{pid}/task/{pid}/children").read_text().split()
+    except OSError:
+        return pids
+    for child in children:
+        pids.extend(process_tree(int(child)))
+    return pids
+
+
+def cpu_seconds(pids: list):
+    total = 0.0
+    ticks = os.sysconf("SC_CLK_TCK")
+    for pid in pids:
+        try:
+            fields = pathlib.Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # utime y stime son los campos 14 y 15 de /proc/<pid>/stat (11 y 12 despues del nombre).
+        total += (int(fields[11]) + int(fields[12])) / ticks
+    return total
+
+
+def rss_mb(pids: list):
+    total = 0
+    for pid in pids:
+        try:
+            for line in pathlib.Path(f"/proc/{pid}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1])
+        except OSError:
+            continue
+    return total / 1024
+
+
+def percentile(values: list, fraction: float):
+    if not values:
+        return None
+    index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+async def drive(app_url: str, path: str, requests: int, concurrency: int, users: int):
+    latencies = []
+    statuses = {}
+    counter = iter(range(requests))
+
+    async with httpx.AsyncClient(base_url=app_url, timeout=60, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            for index in counter:
+                headers = {'Cookie': f'access_token=load-test-user-{index % users}'}
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path, headers=headers)
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    return sorted(latencies), statuses
+
+
+async def sample_memory(pids: list, peak: list, stop: asyncio.Event):
+    while not stop.is_set():
+        peak[0] = max(peak[0], rss_mb(pids))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.1)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_endpoint(name: str, args, app_url: str, fake_url: str, app_pid: int):
+    path = ENDPOINTS[name]
+    pids = process_tree(app_pid)
+
+    async with httpx.AsyncClient() as client:
+        # Calentamiento: cada usuario resuelve su token y se llenan los caches, como en un servidor que ya esta corriendo.
+        if args.warmup:
+            await drive(app_url, path, requests=args.users, concurrency=min(args.concurrency, args.users), users=args.users)
+        await client.post(f"{fake_url}/__reset")
+
+        cpu_before = cpu_seconds(pids)
+        peak, stop = [rss_mb(pids)], asyncio.Event()
+        sampler = asyncio.create_task(sample_memory(pids, peak, stop))
+
+        start = time.perf_counter()
+        latencies, statuses = await drive(app_url, path, requests=args.requests, concurrency=args.concurrency, users=args.users)
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await sampler
+        cpu = cpu_seconds(pids) - cpu_before
+        upstream = (await client.get(f"{fake_url}/__stats")).json()
+
+    return {
+        'path': path,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(args.requests / elapsed, 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 2),
+            'p90': round(percentile(latencies, 0.90) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+            'max': round(latencies[-1] * 1000, 2)
+        },
+        'statuses': statuses,
+        'upstream_calls': upstream['total'],
+        'upstream_calls_per_request': round(upstream['total'] / args.requests, 3),
+        'upstream': upstream['calls'],
+        'upstream_statuses': upstream['statuses'],
+        'worker_cpu_percent': round(cpu / elapsed * 100, 1),
+        'worker_rss_mb': round(peak[0], 1)
+    }
+
+
+def print_report(results: dict):
+    print(f"\n{'endpoint':<18}{'req/s':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{'upstream/req':>14}{'cpu %':>8}{'rss MB':>8}  status")
+    for name, result in results.items():
+        latency = result['latency_ms']
+        statuses = " ".join(f"{status}={count}" for status, count in sorted(result['statuses'].items()))
+        print(f"{name:<18}{result['rps']:>9.1f}{latency['p50']:>9.1f}{latency['p90']:>9.1f}{latency['p99']:>9.1f}{latency['max']:>9.1f}"
+              f"{result['upstream_calls_per_request']:>14.3f}{result['worker_cpu_percent']:>8.1f}{result['worker_rss_mb']:>8.1f}  {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la app contra un Spotify falso.")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"Separados por coma: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--requests", type=int, default=1000, help="Peticiones por endpoint")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=20, help="Usuarios distintos (un access_token por usuario)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn para la app")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="No calentar caches antes de medir")
+    parser.add_argument("--latency", default="lognormal:80,0.5", help="Latencia del Spotify falso, ver benchmarks.fake_spotify")
+    parser.add_argument("--latency-for", action="append", default=[], metavar="ENDPOINT=DISTRIBUCION")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--keep-rate-limit", action="store_true",
+                        help="Usa el limite de peticiones configurado; por defecto se quita y los 429 los inyecta el servidor falso")
+    parser.add_argument("--app-env", action="append", default=[], metavar="VARIABLE=VALOR", help="Variables de entorno extra para la app")
+    parser.add_argument("--output", type=pathlib.Path, default=None, help="Archivo JSON para los resultados")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = [name for name in names if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"Endpoints desconocidos: {', '.join(unknown)}")
+
+    fake_port, app_port = free_port(), free_port()
+    fake_url, app_url = f"http://127.0.0.1:{fake_port}", f"http://127.0.0.1:{app_port}"
+
+    fake_command = [sys.executable, "-m", "benchmarks.fake_spotify", "--port", str(fake_port), "--latency", args.latency,
+                    "--rate-429", str(args.rate_429), "--rate-5xx", str(args.rate_5xx)]
+    for override in args.latency_for:
+        fake_command += ["--latency-for", override]
+
+    app_env = {
+        **os.environ,
+        'SPOTIFY_API_BASE_URL': f"{fake_url}/v1",
+        'SPOTIFY_ACCOUNTS_BASE_URL': fake_url,
+        'HISTORY_INGESTION_ENABLED': 'false'
+    }
+    if not args.keep_rate_limit:
+        app_env.update({'SPOTIFY_RATE_LIMIT_PER_SECOND': '100000', 'SPOTIFY_RATE_LIMIT_BURST': '100000'})
+    for variable in args.app_env:
+        key, _, value = variable.partition("=")
+        app_env[key] = value
+    app_command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port), "--workers", str(args.workers),
+                   "--log-level", "warning", "--no-access-log"]
+
+    fake = subprocess.Popen(fake_command, cwd=BACKEND_DIR)
+    app = None
+    try:
+        wait_until_ready(f"{fake_url}/__stats", fake)
+        app = subprocess.Popen(app_command, cwd=BACKEND_DIR, env=app_env)
+        wait_until_ready(f"{app_url}/", app)
+
+        results = {}
+        for name in names:
+            results[name] = asyncio.run(run_endpoint(name, args, app_url=app_url, fake_url=fake_url, app_pid=app.pid))
+            print(f"  {name:<18}{results[name]['rps']:>9.1f} req/s  p99 {results[name]['latency_ms']['p99']:.1f} ms")
+
+        print_report(results)
+
+        if args.output:
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            args.output.write_text(json.dumps({
+                'meta': {
+                    'created_at': datetime.now(timezone.utc).isoformat(),
+                    'requests': args.requests,
+                    'concurrency': args.concurrency,
+                    'users': args.users,
+                    'workers': args.workers,
+                    'latency': args.latency,
+                    'latency_for': args.latency_for,
+                    'rate_429': args.rate_429,
+                    'rate_5xx': args.rate_5xx
+                },
+                'results': results
+            }, indent=2))
+            print(f"\nResultados guardados en {args.output}")
+
+    finally:
+        for process in (app, fake):
+            if process is not None and process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+if __name__ == "__main__":
+    main()
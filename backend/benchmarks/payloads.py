@@ -0,0 +1,181 @@
+# Respuestas con la misma forma que las de la API de Spotify (incluyendo los campos que no usamos, como
+# available_markets), generadas de forma determinista para que las corridas sean comparables.
+
+MARKETS = ["AD", "AR", "AT", "AU", "BE", "BG", "BO", "BR", "CA", "CH", "CL", "CO", "CR", "CY", "CZ", "DE", "DK", "DO",
+           "EC", "EE", "ES", "FI", "FR", "GB", "GR", "GT", "HK", "HN", "HU", "ID", "IE", "IL", "IS", "IT", "JP", "LI",
+           "LT", "LU", "LV", "MC", "MT", "MX", "MY", "NI", "NL", "NO", "NZ", "PA", "PE", "PH", "PL", "PT", "PY", "RO",
+           "SE", "SG", "SK", "SV", "TH", "TR", "TW", "US", "UY", "VN", "ZA"]
+
+
+def image(seed: int, size: int = 640):
+    return {"url": f"https://i.scdn.co/image/ab67616d0000b273{seed:024x}", "height": size, "width": size}
+
+
+def simple_artist(seed: int):
+    return {
+        "external_urls": {"spotify": f"https://open.spotify.com/artist/{seed:022d}"},
+        "href": f"https://api.spotify.com/v1/artists/{seed:022d}",
+        "id": f"{seed:022d}",
+        "name": f"Artist {seed}",
+        "type": "artist",
+        "uri": f"spotify:artist:{seed:022d}"
+    }
+
+
+def full_artist(seed: int):
+    return {
+        **simple_artist(seed),
+        "followers": {"href": None, "total": 1000 + seed * 37},
+        "genres": [f"genre {seed % 11}", f"genre {seed % 7 + 11}", "pop"][: 1 + seed % 3],
+        "images": [image(seed, 640), image(seed, 320), image(seed, 160)],
+        "popularity": 30 + seed % 70
+    }
+
+
+def simple_album(seed: int, artists: int = 1):
+    return {
+        "album_type": "album",
+        "total_tracks": 10 + seed % 8,
+        "available_markets": MARKETS,
+        "external_urls": {"spotify": f"https://open.spotify.com/album/{seed:022d}"},
+        "href": f"https://api.spotify.com/v1/albums/{seed:022d}",
+        "id": f"{seed:022d}",
+        "images": [image(seed, 640), image(seed, 300), image(seed, 64)],
+        "name": f"Album {seed}",
+        "release_date": f"{2000 + seed % 24}-0{1 + seed % 9}-1{seed % 10}",
+        "release_date_precision": "day",
+        "type": "album",
+        "uri": f"spotify:album:{seed:022d}",
+        "artists": [simple_artist(seed % 40 + index) for index in range(artists)]
+    }
+
+
+def simple_track(seed: int, album_seed: int = None, with_album: bool = True):
+    track = {
+        "artists": [simple_artist(seed % 40), simple_artist((seed * 7) % 40)][: 1 + seed % 2],
+        "available_markets": MARKETS,
+        "disc_number": 1,
+        "duration_ms": 150000 + (seed * 7919) % 150000,
+        "explicit": seed % 5 == 0,
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{seed:022d}"},
+        "href": f"https://api.spotify.com/v1/tracks/{seed:022d}",
+        "id": f"{seed:022d}",
+        "is_local": False,
+        "name": f"Track {seed}",
+        "preview_url": None,
+        "track_number": 1 + seed % 14,
+        "type": "track",
+        "uri": f"spotify:track:{seed:022d}"
+    }
+    if with_album:
+        track["album"] = simple_album(seed // 3 if album_seed is None else album_seed)
+        track["external_ids"] = {"isrc": f"USRC1{seed:07d}"}
+        track["popularity"] = 20 + seed % 80
+    return track
+
+
+def top_tracks(limit: int = 50, offset: int = 0, total: int = 50):
+    return {
+        "href": "https://api.spotify.com/v1/me/top/tracks",
+        "limit": limit,
+        "next": None,
+        "offset": offset,
+        "previous": None,
+        "total": total,
+        "items": [simple_track(offset + index) for index in range(min(limit, total - offset))]
+    }
+
+
+def top_artists(limit: int = 50, offset: int = 0, total: int = 50):
+    return {
+        "href": "https://api.spotify.com/v1/me/top/artists",
+        "limit": limit,
+        "next": None,
+        "offset": offset,
+        "previous": None,
+        "total": total,
+        "items": [full_artist(offset + index) for index in range(min(limit, total - offset))]
+    }
+
+
+def full_album(seed: int, total_tracks: int = 20):
+    album = simple_album(seed)
+    album["total_tracks"] = total_tracks
+    album["genres"] = []
+    album["label"] = f"Label {seed % 13}"
+    album["popularity"] = 40 + seed % 60
+    album["tracks"] = album_tracks(seed, limit=50, offset=0, total=total_tracks)
+    return album
+
+
+def album_tracks(seed: int, limit: int = 50, offset: int = 0, total: int = 20):
+    return {
+        "href": f"https://api.spotify.com/v1/albums/{seed:022d}/tracks",
+        "limit": limit,
+        "next": None,
+        "offset": offset,
+        "previous": None,
+        "total": total,
+        "items": [simple_track(seed * 100 + index, with_album=False) for index in range(offset, min(offset + limit, total))]
+    }
+
+
+def saved_albums(limit: int = 50, offset: int = 0, total: int = 1000):
+    return {
+        "href": "https://api.spotify.com/v1/me/albums",
+        "limit": limit,
+        "next": None,
+        "offset": offset,
+        "previous": None,
+        "total": total,
+        "items": [
+            {"added_at": f"2024-{1 + (total - index) % 12:02d}-{1 + (total - index) % 28:02d}T12:00:00Z", "album": full_album(index, 12)}
+            for index in range(offset, min(offset + limit, total))
+        ]
+    }
+
+
+def recently_played(limit: int = 50):
+    return {
+        "href": "https://api.spotify.com/v1/me/player/recently-played",
+        "limit": limit,
+        "next": None,
+        "cursors": {"after": "1714557600000", "before": "1714550000000"},
+        "items": [
+            {
+                "played_at": f"2024-05-01T{10 + index // 60:02d}:{index % 60:02d}:00.000Z",
+                "context": {"type": "album", "uri": f"spotify:album:{index % 4:022d}"},
+                "track": simple_track(index % 15)
+            }
+            for index in range(limit)
+        ]
+    }
+
+
+def user():
+    return {
+        "country": "MX",
+        "display_name": "Benchmark",
+        "email": "benchmark@example.com",
+        "followers": {"href": None, "total": 12},
+        "id": "benchmarkuser",
+        "images": [image(1, 300)],
+        "product": "premium",
+        "type": "user",
+        "uri": "spotify:user:benchmarkuser"
+    }
+
+
+def playback_state():
+    return {
+        "device": {
+            "id": "device0", "is_active": True, "is_private_session": False, "is_restricted": False,
+            "name": "Benchmark", "type": "Computer", "volume_percent": 60, "supports_volume": True
+        },
+        "repeat_state": "off",
+        "shuffle_state": False,
+        "progress_ms": 42000,
+        "is_playing": True,
+        "currently_playing_type": "track",
+        "item": simple_track(3)
+    }
@@ -0,0 +1,243 @@
+# Suite de micro-benchmarks sin red: parsers, servicios contra un cliente stub y serialización de respuestas.
+# Cada corrida se guarda en JSON y se compara contra la linea base; si algo es mas lento que el umbral
+# se marca como regresión y el proceso termina con código 1.
+#
+#   cd backend && python -m benchmarks.suite                    # corre y compara contra benchmarks/baseline.json
+#   cd backend && python -m benchmarks.suite --save-baseline    # guarda la corrida como nueva linea base
+#   cd backend && python -m benchmarks.suite --filter services  # solo los que contienen "services"
+#
+# La linea base no se guarda en el repo: los tiempos dependen de la maquina, asi que cada quien la genera en la
+# suya con --save-baseline (p. ej. sobre main antes de empezar un cambio) y la vuelve a generar cuando cambia de
+# maquina, de versión de Python o acepta un cambio de rendimiento. Sin linea base la comparación termina con
+# código 2 en lugar de pasar sin comparar nada.
+import benchmarks  # noqa: F401
+from benchmarks import fixtures
+from app.schemas.library import SavedAlbumsByUser
+from app.services.spotify_album_service import AlbumService
+from app.services.spotify_player_service import PlayerService
+from app.services.spotify_statistics_service import SpotifyService
+from app.utils.parsers import parse_album, parse_artists_bulk, parse_saved_albums_bulk, parse_tracks_bulk, parse_tracks_played_bulk
+from fastapi.encoders import jsonable_encoder
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import gc
+import json
+import orjson
+import pathlib
+import platform
+import subprocess
+import sys
+import time
+
+
+BENCHMARKS_DIR = pathlib.Path(__file__).parent
+DEFAULT_BASELINE = BENCHMARKS_DIR / "baseline.json"
+RESULTS_DIR = BENCHMARKS_DIR / "results"
+REPEAT = 7
+
+
+# Mismos métodos que SpotifyClient pero regresando los payloads en memoria, asi se mide solo nuestro código.
+class StubSpotifyClient:
+    def __init__(self, data: dict):
+        self.data = data
+
+
+    async def get_user_info(self, token: str):
+        return self.data['user']
+
+
+    async def get_user_top_items(self, type: str, time_range: str, limit: int, offset: int, token: str):
+        return self.data['top_tracks'] if type == 'tracks' else self.data['top_artists']
+
+
+    async def get_albums_save_user(self, limit: int, offset: int, token: str):
+        library = self.data['library']
+        return {'total': library['total'], 'limit': limit, 'offset': offset, 'items': library['items'][offset:offset + limit]}
+
+
+    async def get_album(self, albumID: str, token: str):
+        return self.data['full_album']
+
+
+    async def get_tracks_album(self, albumID: str, offset: int, limit: int, token: str):
+        return self.data['full_album']['tracks']
+
+
+    async def get_recently_played(self, limit: int, after: str, before: str, token: str):
+        return self.data['recently_played']
+
+
+    async def get_playback_state(self, token: str):
+        return self.data['playback_state']
+
+
+def build_benchmarks(data: dict):
+    stub = StubSpotifyClient(data)
+    spotify_service, album_service, player_service = SpotifyService(), AlbumService(), PlayerService()
+    for service in (spotify_service, album_service, player_service):
+        service.spotifyclient = stub
+
+    async def stream_library():
+        albums = await album_service.stream_albums_saved_user(token="benchmark")
+        return [album async for album in albums]
+
+    library = SavedAlbumsByUser(
+        AlbumsSaved=parse_saved_albums_bulk(data['library']['items']),
+        limit=len(data['library']['items']),
+        offset=0,
+        total=data['library']['total']
+    )
+    top_tracks = asyncio.run(spotify_service.get_top_tracks(time_range="medium_term", limit=50, offset=0, token="benchmark"))
+
+    # (nombre, función, es async, repeticiones por medición)
+    return [
+        ("parsers.top_tracks_50", lambda: parse_tracks_bulk(data['top_tracks']['items']), False, 200),
+        ("parsers.top_artists_50", lambda: parse_artists_bulk(data['top_artists']['items']), False, 200),
+        ("parsers.library_1000", lambda: parse_saved_albums_bulk(data['library']['items']), False, 5),
+        ("parsers.full_album", lambda: parse_album(data['full_album']), False, 500),
+        ("parsers.recently_played_50", lambda: parse_tracks_played_bulk(data['recently_played']['items']), False, 200),
+
+        ("services.spotify.user_info", lambda: spotify_service.get_user_info(token="benchmark"), True, 500),
+        ("services.spotify.top_tracks_50", lambda: spotify_service.get_top_tracks(time_range="medium_term", limit=50, offset=0, token="benchmark"), True, 200),
+        ("services.spotify.top_artists_50", lambda: spotify_service.get_top_artist(time_range="medium_term", limit=50, offset=0, token="benchmark"), True, 200),
+        ("services.album.saved_page_50", lambda: album_service.get_albums_saved_user(limit=50, offset=0, token="benchmark"), True, 100),
+        ("services.album.stream_library_1000", stream_library, True, 5),
+        ("services.album.full_album", lambda: album_service.get_album(albumID="benchmark", token="benchmark"), True, 500),
+        ("services.album.album_tracks", lambda: album_service.get_tracks_album(albumID="benchmark", offset=0, limit=50, token="benchmark"), True, 500),
+        ("services.player.recently_played_50", lambda: player_service.get_recently_player(limit=50, before=None, after=None, token="benchmark"), True, 200),
+        ("services.player.playback_state", lambda: player_service.playback_state(token="benchmark"), True, 500),
+
+        # model_response usa model_dump_json, JSONResponse (el default de FastAPI) usa jsonable_encoder + json.dumps.
+        ("serialization.top_tracks_50.model_dump_json", lambda: top_tracks.model_dump_json(), False, 500),
+        ("serialization.top_tracks_50.orjson", lambda: orjson.dumps(top_tracks.model_dump(mode="json")), False, 200),
+        ("serialization.top_tracks_50.jsonable_encoder", lambda: json.dumps(jsonable_encoder(top_tracks)).encode(), False, 50),
+        ("serialization.library_1000.model_dump_json", lambda: library.model_dump_json(), False, 10),
+        ("serialization.library_1000.jsonable_encoder", lambda: json.dumps(jsonable_encoder(library)).encode(), False, 2)
+    ]
+
+
+# Igual que timeit, sin el recolector de basura durante la medición para que los objetos que siguen vivos
+# de otros benchmarks no cambien los tiempos.
+def measure(function, is_async: bool, number: int):
+    enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        best = _best_time(function, is_async, number)
+    finally:
+        if enabled:
+            gc.enable()
+    return {'us_per_op': round(best * 1e6, 2), 'ops_per_sec': round(1 / best, 1), 'number': number, 'repeat': REPEAT}
+
+
+def _best_time(function, is_async: bool, number: int):
+    if is_async:
+        async def run():
+            start = time.perf_counter()
+            for _ in range(number):
+                await function()
+            return time.perf_counter() - start
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+            timings = [loop.run_until_complete(run()) for _ in range(REPEAT)]
+        finally:
+            loop.close()
+    else:
+        function()
+        timings = []
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            timings.append(time.perf_counter() - start)
+
+    return min(timings) / number
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BENCHMARKS_DIR).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    regressions = []
+    print(f"\n{'benchmark':<48}{'base us':>12}{'actual us':>12}{'cambio':>10}")
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            print(f"{name:<48}{'-':>12}{result['us_per_op']:>12.1f}{'nuevo':>10}")
+            continue
+        change = result['us_per_op'] / base['us_per_op'] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESION"
+        print(f"{name:<48}{base['us_per_op']:>12.1f}{result['us_per_op']:>12.1f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks sin red de parsers, servicios y serialización.")
+    parser.add_argument("--filter", default=None, help="Solo corre los benchmarks cuyo nombre contiene este texto")
+    parser.add_argument("--output", type=pathlib.Path, default=None, help="Archivo JSON para los resultados")
+    parser.add_argument("--baseline", type=pathlib.Path, default=DEFAULT_BASELINE, help="Linea base para comparar")
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda esta corrida como linea base")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Cambio relativo a partir del cual se marca regresión")
+    args = parser.parse_args()
+
+    names = list(fixtures.BUILDERS)
+    data = {name: fixtures.load(name) for name in names}
+    print("Payloads: " + ", ".join(f"{name} ({fixtures.source(name)})" for name in names))
+
+    results = {}
+    for name, function, is_async, number in build_benchmarks(data):
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(function, is_async, number)
+        print(f"  {name:<48}{results[name]['us_per_op']:>12.1f} us/op")
+
+    run = {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'payloads': {name: fixtures.source(name) for name in names}
+        },
+        'results': results
+    }
+
+    output = args.output or RESULTS_DIR / f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(run, indent=2))
+    print(f"\nResultados guardados en {output}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(run, indent=2))
+        print(f"Linea base guardada en {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"\nERROR: no hay linea base en {args.baseline}, no se comparo nada. Generala con --save-baseline.", file=sys.stderr)
+        return 2
+
+    baseline = json.loads(args.baseline.read_text())
+    for field in ('python', 'platform'):
+        if baseline.get('meta', {}).get(field) != run['meta'][field]:
+            print(f"\nAviso: la linea base es de otro {field} ({baseline.get('meta', {}).get(field)}), los tiempos pueden no ser comparables.")
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regresiones mayores a {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print("\nSin regresiones.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
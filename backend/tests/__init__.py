@@ -0,0 +1,2 @@
+# unittest no carga conftest.py, se importa aqui para que discover con -t . tambien tenga las variables de entorno.
+from tests import conftest  # noqa: F401
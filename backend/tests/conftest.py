@@ -0,0 +1,4 @@
+# Settings requiere estas variables; para las pruebas basta con valores falsos (un .env o el entorno tienen prioridad).
+import os
+for name, value in (("JWT_KEY", "test"), ("SPOTIFY_CLIENT_ID", "test"), ("SPOTIFY_CLIENT_SECRET", "test"), ("SPOTIFY_REDIRECT_URI", "http://localhost/callback")):
+    os.environ.setdefault(name, value)
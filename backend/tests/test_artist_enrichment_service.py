@@ -0,0 +1,74 @@
+# python -m unittest discover -s tests -t .   (desde backend/, o python -m pytest tests)
+from app.services.artist_enrichment_service import ArtistEnrichmentService
+from fastapi import HTTPException
+import asyncio
+import unittest
+
+
+def artist(artist_id: str):
+    return {'id': artist_id, 'name': f'Artist {artist_id}', 'uri': f'spotify:artist:{artist_id}', 'genres': ['rock'], 'popularity': 50, 'followers': {'total': 10}, 'images': []}
+
+
+# /artists?ids= falso: los tokens en revoked responden 401.
+class StubSpotifyClient:
+    def __init__(self, revoked=()):
+        self.revoked = set(revoked)
+        self.calls = []
+
+
+    async def get_several_artists(self, ids: list, token: str):
+        self.calls.append((token, list(ids)))
+        if token in self.revoked:
+            raise HTTPException(status_code=401, detail="The access token expired")
+        return {'artists': [artist(artist_id) for artist_id in ids]}
+
+
+class LoadManyTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.service = ArtistEnrichmentService()
+        self.service.spotifyclient = StubSpotifyClient(revoked={'expired'})
+
+
+    async def test_concurrent_callers_share_one_batch(self):
+        self.service.spotifyclient = StubSpotifyClient()
+        first, second = await asyncio.gather(
+            self.service.load_many(['a1', 'a2'], token='alice'),
+            self.service.load_many(['a2', 'a3'], token='bob')
+        )
+
+        self.assertEqual(set(first), {'a1', 'a2'})
+        self.assertEqual(set(second), {'a2', 'a3'})
+        self.assertEqual(self.service.spotifyclient.calls, [('alice', ['a1', 'a2', 'a3'])])
+
+
+    async def test_expired_batch_token_falls_back_to_each_callers_token(self):
+        first, second = await asyncio.gather(
+            self.service.load_many(['a1', 'a2'], token='expired'),
+            self.service.load_many(['a2', 'a3'], token='bob')
+        )
+
+        # a1 solo lo pedia el token vencido; a2 tambien lo esperaba bob y se resuelve con el suyo.
+        self.assertEqual(set(first), {'a2'})
+        self.assertEqual(set(second), {'a2', 'a3'})
+        self.assertEqual(self.service.spotifyclient.calls, [('expired', ['a1', 'a2', 'a3']), ('bob', ['a2', 'a3'])])
+        self.assertEqual(self.service._pending, {})
+        self.assertEqual(self.service._tokens, {})
+
+
+    async def test_other_errors_are_not_retried(self):
+        async def unavailable(ids: list, token: str):
+            self.service.spotifyclient.calls.append((token, list(ids)))
+            raise HTTPException(status_code=503, detail="Service unavailable")
+        self.service.spotifyclient.get_several_artists = unavailable
+
+        first, second = await asyncio.gather(
+            self.service.load_many(['a1'], token='alice'),
+            self.service.load_many(['a1'], token='bob')
+        )
+
+        self.assertEqual((first, second), ({}, {}))
+        self.assertEqual(len(self.service.spotifyclient.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
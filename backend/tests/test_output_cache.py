@@ -0,0 +1,85 @@
+# python -m unittest discover -s tests -t .   (desde backend/, o python -m pytest tests)
+from app.clients.spotify_client import spotify_client
+from app.utils.cache import TTLCache, record_dependency
+from app.utils.output_cache import cached_response, output_cache
+from fastapi import Request
+import orjson
+import unittest
+
+
+def request(token: str, path: str = '/api/spotify/me', query: bytes = b''):
+    # Como la deja AuthMiddleware: los tokens ya resueltos en el scope.
+    return Request({'type': 'http', 'method': 'GET', 'path': path, 'query_string': query, 'headers': [], 'auth_tokens': (token, None)})
+
+
+class CachedResponseTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        output_cache.cache.clear()
+        spotify_client._token_users.clear()
+        self.upstream = TTLCache(ttl=60)
+        self.calls = []
+
+        # Ruta falsa que arma su respuesta desde una entrada de cache "de Spotify" por token.
+        @cached_response(ttl=60)
+        async def route(request: Request):
+            token = request.scope['auth_tokens'][0]
+            self.calls.append(token)
+            if self.upstream.get(token) is None:
+                self.upstream.set(token, {'owner': token, 'version': len(self.calls)})
+            record_dependency(self.upstream, token)
+            return self.upstream.get(token)
+
+        self.route = route
+
+
+    async def body(self, token: str, **kwargs):
+        response = await self.route(request=request(token, **kwargs))
+        return orjson.loads(response.body)
+
+
+    async def test_hit_skips_the_route(self):
+        first = await self.body('alice')
+        second = await self.body('alice')
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, ['alice'])
+
+
+    async def test_invalidated_dependency_makes_next_request_miss(self):
+        await self.body('alice')
+        self.upstream.delete('alice')
+
+        self.assertEqual(await self.body('alice'), {'owner': 'alice', 'version': 2})
+        self.assertEqual(self.calls, ['alice', 'alice'])
+        self.assertEqual(output_cache.stats()['invalidated'], 1)
+
+
+    async def test_replaced_dependency_makes_next_request_miss(self):
+        await self.body('alice')
+        self.upstream.set('alice', {'owner': 'alice', 'version': 'new'})
+
+        self.assertEqual(await self.body('alice'), {'owner': 'alice', 'version': 'new'})
+
+
+    async def test_entries_are_not_shared_between_users(self):
+        self.assertEqual((await self.body('alice'))['owner'], 'alice')
+        self.assertEqual((await self.body('bob'))['owner'], 'bob')
+        self.assertEqual(self.calls, ['alice', 'bob'])
+
+
+    async def test_tokens_of_the_same_user_share_entries(self):
+        spotify_client._token_users.set(spotify_client._token_key('alice-1'), 'u1')
+        spotify_client._token_users.set(spotify_client._token_key('alice-2'), 'u1')
+
+        await self.body('alice-1')
+        self.assertEqual((await self.body('alice-2'))['owner'], 'alice-1')
+        self.assertEqual(self.calls, ['alice-1'])
+
+
+    async def test_query_params_are_part_of_the_key(self):
+        await self.body('alice', query=b'limit=10')
+        await self.body('alice', query=b'limit=20')
+        self.assertEqual(self.calls, ['alice', 'alice'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+# python -m unittest discover -s tests -t .   (desde backend/, o python -m pytest tests)
+from app.utils.parsers import parse_tracks_bulk, parse_saved_albums_bulk
+import unittest
+
+
+def album(album_id: str, images: list = None):
+    return {
+        'id': album_id,
+        'name': f'Album {album_id}',
+        'album_type': 'album',
+        'total_tracks': 10,
+        'release_date': '2020-01-01',
+        'images': [{'url': f'https://i.scdn.co/{album_id}', 'height': 640, 'width': 640}] if images is None else images,
+        'artists': [{'id': 'ar1', 'name': 'Artist', 'uri': 'spotify:artist:ar1'}]
+    }
+
+
+def track(position: int, album_data: dict):
+    return {
+        'id': f't{position}',
+        'name': f'Track {position}',
+        'duration_ms': 1000,
+        'explicit': False,
+        'artists': [{'id': 'ar1', 'name': 'Artist', 'uri': 'spotify:artist:ar1'}],
+        'disc_number': 1,
+        'track_number': position + 1,
+        'album': album_data
+    }
+
+
+# El album sin portada tiene un ID distinto a los demas: con el mismo ID el interning reutilizaria el primero.
+class BulkParserTest(unittest.TestCase):
+    def test_imageless_album_only_affects_its_track(self):
+        tracks = parse_tracks_bulk([track(0, album('al1')), track(1, album('al2', images=[])), track(2, album('al1'))])
+
+        self.assertEqual([parsed.trackID for parsed in tracks], ['t0', 't1', 't2'])
+        self.assertIsNone(tracks[1].album.cover)
+        self.assertEqual(tracks[0].album.cover.url, 'https://i.scdn.co/al1')
+        self.assertIs(tracks[0].album, tracks[2].album)
+
+
+    def test_imageless_saved_album_keeps_the_page(self):
+        albums = parse_saved_albums_bulk([
+            {'added_at': '2024-01-02T00:00:00Z', 'album': album('al1')},
+            {'added_at': '2024-01-01T00:00:00Z', 'album': album('al2', images=[])}
+        ])
+
+        self.assertEqual([saved.album.id_album for saved in albums], ['al1', 'al2'])
+        self.assertIsNone(albums[1].album.cover)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# python -m unittest discover -s tests -t .   (desde backend/, o python -m pytest tests)
+from app.clients.rate_limiter import RateLimiter, RateLimitExceeded
+from app.clients.spotify_client import SpotifyClient
+from app.core.config import settings
+import httpx
+import time
+import unittest
+
+
+class RateLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_burst_then_throttled_to_rate(self):
+        limiter = RateLimiter(rate=50, burst=2)
+        started = time.monotonic()
+        for _ in range(4):
+            await limiter.acquire(deadline=time.monotonic() + 1)
+        # Las 2 primeras salen del burst, las otras 2 esperan 1/50 s cada una.
+        self.assertGreaterEqual(time.monotonic() - started, 0.035)
+
+
+    async def test_rejects_when_deadline_cannot_be_met(self):
+        limiter = RateLimiter(rate=1, burst=1)
+        await limiter.acquire(deadline=time.monotonic() + 1)
+
+        with self.assertRaises(RateLimitExceeded) as raised:
+            await limiter.acquire(deadline=time.monotonic() + 0.1)
+        self.assertEqual(raised.exception.status_code, 429)
+        self.assertEqual(raised.exception.headers['Retry-After'], '1')
+        self.assertEqual(limiter.stats()['rejected'], 1)
+
+
+    async def test_throttle_blocks_until_retry_after(self):
+        limiter = RateLimiter(rate=100, burst=10)
+        limiter.throttle(retry_after=5)
+
+        with self.assertRaises(RateLimitExceeded) as raised:
+            await limiter.acquire(deadline=time.monotonic() + 1)
+        self.assertEqual(raised.exception.headers['Retry-After'], '5')
+        self.assertEqual(limiter.stats()['throttled'], 1)
+
+
+    async def test_waiters_are_served_once_block_ends(self):
+        limiter = RateLimiter(rate=100, burst=10)
+        limiter.throttle(retry_after=0.05)
+        started = time.monotonic()
+        await limiter.acquire(deadline=time.monotonic() + 1)
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+
+# Spotify falso: cada respuesta sale de la lista en orden.
+class RetryAfterTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.backoff_base = settings.SPOTIFY_RETRY_BACKOFF_BASE
+        settings.SPOTIFY_RETRY_BACKOFF_BASE = 0.001
+        self.requests = []
+        self.client = SpotifyClient()
+
+
+    async def asyncTearDown(self):
+        settings.SPOTIFY_RETRY_BACKOFF_BASE = self.backoff_base
+        await self.client.close()
+
+
+    def respond(self, *responses):
+        responses = list(responses)
+
+        def handler(request):
+            self.requests.append(request)
+            return responses.pop(0)
+
+        self.client._client = httpx.AsyncClient(base_url=self.client.base_url, transport=httpx.MockTransport(handler))
+
+
+    async def test_get_retries_after_short_retry_after(self):
+        self.respond(httpx.Response(429, headers={'Retry-After': '0'}), httpx.Response(200, json={'id': 'al1'}))
+
+        response = await self.client._request('GET', '/albums/al1', 'tok')
+        self.assertEqual(response.json(), {'id': 'al1'})
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(self.client.rate_limiter.stats()['throttled'], 1)
+
+
+    async def test_get_propagates_long_retry_after(self):
+        self.respond(httpx.Response(429, headers={'Retry-After': '30'}))
+
+        with self.assertRaises(RateLimitExceeded) as raised:
+            await self.client._request('GET', '/albums/al1', 'tok')
+        # Esperar 30 s no cabe en SPOTIFY_QUEUE_DEADLINE, el cliente recibe el Retry-After en lugar de quedarse en fila.
+        self.assertEqual(raised.exception.headers['Retry-After'], '30')
+        self.assertEqual(len(self.requests), 1)
+        self.assertGreater(self.client.rate_limiter.stats()['blocked_for'], 25)
+
+
+    async def test_commands_are_not_retried(self):
+        self.respond(httpx.Response(429, headers={'Retry-After': '2'}))
+
+        with self.assertRaises(RateLimitExceeded) as raised:
+            await self.client._request('PUT', '/me/player/pause', 'tok', allowed_status=(204,))
+        self.assertEqual(raised.exception.headers['Retry-After'], '2')
+        self.assertEqual(len(self.requests), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
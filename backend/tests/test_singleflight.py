@@ -0,0 +1,61 @@
+# python -m unittest discover -s tests -t .   (desde backend/, o python -m pytest tests)
+from app.utils.singleflight import SingleFlight
+import asyncio
+import unittest
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.calls = 0
+        self.release = asyncio.Event()
+
+
+    async def slow(self):
+        self.calls += 1
+        await self.release.wait()
+        return 'album'
+
+
+    async def test_concurrent_calls_share_one_task(self):
+        waiters = [asyncio.create_task(self.flight.do('key', self.slow)) for _ in range(3)]
+        await asyncio.sleep(0)
+        self.release.set()
+
+        self.assertEqual(await asyncio.gather(*waiters), ['album'] * 3)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.coalesced, 2)
+        self.assertEqual(self.flight.in_flight(), 0)
+
+
+    async def test_cancelled_leader_does_not_cancel_followers(self):
+        leader = asyncio.create_task(self.flight.do('key', self.slow))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(self.flight.do('key', self.slow))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        self.release.set()
+
+        self.assertEqual(await follower, 'album')
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(self.calls, 1)
+
+
+    async def test_errors_reach_every_waiter(self):
+        async def failing():
+            await self.release.wait()
+            raise ValueError('upstream')
+
+        waiters = [asyncio.create_task(self.flight.do('key', failing)) for _ in range(2)]
+        await asyncio.sleep(0)
+        self.release.set()
+
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(self.flight.in_flight(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
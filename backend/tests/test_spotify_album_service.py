@@ -0,0 +1,67 @@
+# python -m unittest discover -s tests -t .   (desde backend/, o python -m pytest tests)
+from app.services.spotify_album_service import AlbumService
+import unittest
+
+
+def track(position: int):
+    return {
+        'id': f't{position}',
+        'name': f'Track {position}',
+        'duration_ms': 1000,
+        'explicit': False,
+        'artists': [{'id': 'ar1', 'name': 'Artist'}],
+        'disc_number': 1,
+        'track_number': position + 1
+    }
+
+
+# Album de 300 canciones con las primeras 50 embebidas en /albums/{id}, como lo regresa Spotify.
+class StubSpotifyClient:
+    def __init__(self, total: int = 300, embedded: int = 50):
+        self.total = total
+        self.embedded = embedded
+        self.pages = []
+
+
+    async def get_album(self, albumID: str, token: str):
+        return {'id': albumID, 'tracks': {'items': [track(i) for i in range(self.embedded)], 'offset': 0, 'limit': 50, 'total': self.total}}
+
+
+    async def get_tracks_album(self, albumID: str, offset: int, limit: int, token: str):
+        self.pages.append(offset)
+        items = [track(i) for i in range(offset, min(offset + limit, self.total))]
+        return {'items': items, 'offset': offset, 'limit': limit, 'total': self.total}
+
+
+class GetTracksAlbumTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.service = AlbumService()
+        self.service.spotifyclient = StubSpotifyClient()
+
+
+    async def tracks(self, offset: int, limit: int):
+        response = await self.service.get_tracks_album(albumID='al1', offset=offset, limit=limit, token='tok')
+        return [track.trackID for track in response.tracks]
+
+
+    async def test_embedded_page_needs_no_extra_call(self):
+        self.assertEqual(await self.tracks(0, 50), [f't{i}' for i in range(50)])
+        self.assertEqual(self.service.spotifyclient.pages, [])
+
+
+    async def test_range_across_embedded_page(self):
+        self.assertEqual(await self.tracks(40, 30), [f't{i}' for i in range(40, 70)])
+        self.assertEqual(self.service.spotifyclient.pages, [50])
+
+
+    async def test_offset_beyond_embedded_page(self):
+        self.assertEqual(await self.tracks(120, 50), [f't{i}' for i in range(120, 170)])
+        self.assertEqual(await self.tracks(200, 10), [f't{i}' for i in range(200, 210)])
+
+
+    async def test_last_page_is_truncated_to_total(self):
+        self.assertEqual(await self.tracks(290, 50), [f't{i}' for i in range(290, 300)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# python -m unittest discover -s tests -t .   (desde backend/, o python -m pytest tests)
+from app.clients.spotify_client import SpotifyClient
+from fastapi import HTTPException
+import asyncio
+import httpx
+import unittest
+
+
+# Spotify falso que detiene las respuestas hasta release, para que las llamadas concurrentes alcancen a juntarse.
+class CoalescedRequestTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.requests = []
+        self.release = asyncio.Event()
+        self.client = SpotifyClient()
+
+        async def handler(request):
+            token = request.headers['Authorization'].removeprefix('Bearer ')
+            self.requests.append((request.url.path, token))
+            await self.release.wait()
+            if token == 'expired':
+                return httpx.Response(401, json={'error': {'status': 401, 'message': 'The access token expired'}})
+            return httpx.Response(200, json={'path': request.url.path, 'token': token})
+
+        self.client._client = httpx.AsyncClient(base_url=self.client.base_url, transport=httpx.MockTransport(handler))
+
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+
+    async def concurrently(self, path: str, *tokens):
+        calls = [asyncio.create_task(self.client._request('GET', path, token)) for token in tokens]
+        await asyncio.sleep(0.01)
+        self.release.set()
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+
+    async def test_catalog_gets_are_shared_across_tokens(self):
+        first, second = await self.concurrently('/albums/al1', 'alice', 'bob')
+
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(len(self.requests), 1)
+
+
+    async def test_follower_retries_with_its_own_token_after_leader_401(self):
+        leader, follower = await self.concurrently('/albums/al1', 'expired', 'bob')
+
+        self.assertIsInstance(leader, HTTPException)
+        self.assertEqual(leader.status_code, 401)
+        self.assertEqual(follower.json()['token'], 'bob')
+        self.assertEqual(self.requests, [('/v1/albums/al1', 'expired'), ('/v1/albums/al1', 'bob')])
+
+
+    async def test_me_responses_are_never_shared_across_tokens(self):
+        alice, bob = await self.concurrently('/me', 'alice', 'bob')
+
+        self.assertEqual(alice.json()['token'], 'alice')
+        self.assertEqual(bob.json()['token'], 'bob')
+        self.assertEqual(sorted(token for _, token in self.requests), ['alice', 'bob'])
+
+
+    async def test_me_subpaths_are_scoped_to_the_token(self):
+        alice, bob, alice_again = await self.concurrently('/me/top/artists', 'alice', 'bob', 'alice')
+
+        self.assertEqual([response.json()['token'] for response in (alice, bob, alice_again)], ['alice', 'bob', 'alice'])
+        self.assertEqual(len(self.requests), 2)
+
+
+
+class CatalogMetricsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = SpotifyClient()
+        self.client._client = httpx.AsyncClient(
+            base_url=self.client.base_url,
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json={'id': 'al1'}, headers={'ETag': '"v1"'}))
+        )
+
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+
+    def samples(self, name: str):
+        for metric, _, _, samples in self.client.collect_metrics():
+            if metric == name:
+                return {labels['cache']: value for labels, value in samples}
+
+
+    async def test_catalog_hits_and_misses_are_exported(self):
+        await self.client.get_album('al1', token='tok')
+        await self.client.get_album('al1', token='tok')
+        await self.client.get_album('al1', token='tok')
+
+        self.assertEqual(self.samples('cache_hits_total')['catalog'], 2)
+        self.assertEqual(self.samples('cache_misses_total')['catalog'], 1)
+        self.assertEqual(self.samples('cache_entries')['catalog'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+# python -m unittest discover -s tests -t .   (desde backend/, o python -m pytest tests)
+from app.core.config import settings
+from app.services.spotify_player_service import PlayerCommandQueue, coalesce_command
+import asyncio
+import httpx
+import unittest
+
+
+def coalesce(*commands):
+    pending = []
+    for command in commands:
+        coalesce_command(pending, dict(command))
+    return pending
+
+
+PAUSE = {'command': 'pause'}
+RESUME = {'command': 'play'}
+NEXT = {'command': 'next'}
+PREVIOUS = {'command': 'previous'}
+
+
+class CoalesceCommandTest(unittest.TestCase):
+    def test_skips_are_summed_into_a_net_count(self):
+        self.assertEqual(coalesce(NEXT, NEXT, NEXT), [{'command': 'skip', 'count': 3}])
+        self.assertEqual(coalesce(NEXT, NEXT, PREVIOUS), [{'command': 'skip', 'count': 1}])
+        self.assertEqual(coalesce(PREVIOUS, PREVIOUS), [{'command': 'skip', 'count': -2}])
+
+
+    def test_skips_that_cancel_out_leave_nothing(self):
+        self.assertEqual(coalesce(NEXT, PREVIOUS), [])
+
+
+    def test_pause_then_resume_cancel_out(self):
+        self.assertEqual(coalesce(PAUSE, RESUME), [])
+        self.assertEqual(coalesce(RESUME, PAUSE), [])
+        self.assertEqual(coalesce(PAUSE, RESUME, PAUSE), [PAUSE])
+
+
+    def test_repeated_pause_or_resume_is_sent_once(self):
+        self.assertEqual(coalesce(PAUSE, PAUSE), [PAUSE])
+        self.assertEqual(coalesce(RESUME, RESUME), [RESUME])
+
+
+    def test_pause_before_specific_play_is_dropped(self):
+        play = {'command': 'play', 'context_uri': 'spotify:album:al1', 'position': 2}
+        self.assertEqual(coalesce(PAUSE, play), [play])
+
+
+    def test_specific_play_is_not_cancelled_by_pause(self):
+        play = {'command': 'play', 'context_uri': 'spotify:album:al1'}
+        self.assertEqual(coalesce(play, PAUSE), [play, PAUSE])
+
+
+    def test_order_is_kept_across_command_kinds(self):
+        self.assertEqual(
+            coalesce(NEXT, NEXT, PAUSE, NEXT),
+            [{'command': 'skip', 'count': 2}, PAUSE, {'command': 'skip', 'count': 1}]
+        )
+
+
+# Registra lo que se mandaria a Spotify en lugar de llamarlo.
+class StubPlayerService:
+    def __init__(self):
+        self.sent = []
+
+
+    async def skip_to_next(self, device_id: str, token: str):
+        self.sent.append(('next', device_id, token))
+
+
+    async def skip_to_previous(self, device_id: str, token: str):
+        self.sent.append(('previous', device_id, token))
+
+
+    async def pause_playback(self, device_id: str, token: str):
+        self.sent.append(('pause', device_id, token))
+
+
+    async def play_resume_playback(self, device_id: str, context_uri: str, position: int, position_ms: int, token: str):
+        self.sent.append(('play', device_id, token))
+
+
+class PlayerCommandQueueTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.debounce, self.max_delay = settings.PLAYER_COMMAND_DEBOUNCE, settings.PLAYER_COMMAND_MAX_DELAY
+        settings.PLAYER_COMMAND_DEBOUNCE, settings.PLAYER_COMMAND_MAX_DELAY = 0.02, 0.1
+        self.service = StubPlayerService()
+        self.queue = PlayerCommandQueue(service=self.service, key=('u1', 'd1'), device_id='d1')
+
+
+    def tearDown(self):
+        settings.PLAYER_COMMAND_DEBOUNCE, settings.PLAYER_COMMAND_MAX_DELAY = self.debounce, self.max_delay
+
+
+    async def test_burst_is_sent_once_in_order(self):
+        self.queue.add(dict(NEXT), token='tok')
+        self.queue.add(dict(NEXT), token='tok')
+        pending = self.queue.add(dict(PAUSE), token='tok')
+        self.assertEqual(pending, [{'command': 'skip', 'count': 2}, PAUSE])
+        self.assertEqual(self.service.sent, [])
+
+        await self.queue.task
+        self.assertEqual(self.service.sent, [('next', 'd1', 'tok'), ('next', 'd1', 'tok'), ('pause', 'd1', 'tok')])
+
+
+    async def test_cancelled_pair_sends_nothing(self):
+        self.queue.add(dict(PAUSE), token='tok')
+        self.assertEqual(self.queue.add(dict(RESUME), token='tok'), [])
+
+        await self.queue.task
+        self.assertEqual(self.service.sent, [])
+
+
+    async def test_latest_token_is_used(self):
+        self.queue.add(dict(PREVIOUS), token='old')
+        self.queue.add(dict(PREVIOUS), token='new')
+
+        await self.queue.task
+        self.assertEqual(self.service.sent, [('previous', 'd1', 'new'), ('previous', 'd1', 'new')])
+
+
+    async def test_network_error_does_not_drop_the_rest_of_the_batch(self):
+        async def unreachable(device_id: str, token: str):
+            raise httpx.ConnectError("connection refused")
+        self.service.pause_playback = unreachable
+
+        self.queue.add(dict(NEXT), token='tok')
+        self.queue.add(dict(PAUSE), token='tok')
+        self.queue.add(dict(NEXT), token='tok')
+
+        await self.queue.task
+        self.assertEqual(self.service.sent, [('next', 'd1', 'tok'), ('next', 'd1', 'tok')])
+
+
+    async def test_max_delay_flushes_a_steady_stream(self):
+        for _ in range(10):
+            self.queue.add(dict(NEXT), token='tok')
+            await asyncio.sleep(0.015)
+        # Con clics cada 15 ms el debounce nunca vence, MAX_DELAY obliga a mandar el primer lote antes de terminar.
+        self.assertGreater(len(self.service.sent), 0)
+
+        await self.queue.task
+        self.assertEqual(len(self.service.sent), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()